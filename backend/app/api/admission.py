@@ -0,0 +1,82 @@
+"""
+Upload admission - ASGI middleware putting upload requests under admission control.
+Bodies over UPLOAD_MAX_REQUEST_MB are refused with 413: up front from
+Content-Length, or as soon as the streamed body crosses the cap. Requests
+that find the in-flight budget spent get 503 with Retry-After before any of
+their body is read.
+"""
+import re
+
+from fastapi import HTTPException
+from fastapi.responses import JSONResponse
+
+from app.config import settings
+from app.services.admission_service import MB, upload_admission
+from app.services.metrics import UPLOAD_REJECTIONS
+
+# Routes that receive photo bytes in the request body
+_UPLOAD_ROUTES = re.compile(
+    rf"^{re.escape(settings.API_V1_PREFIX)}/("
+    r"photos/upload|photos/uploads/[^/]+|sessions/with-photos|sessions/[^/]+/photos:batch"
+    r")$"
+)
+
+
+def _content_length(scope) -> int | None:
+    for name, value in scope["headers"]:
+        if name == b"content-length":
+            try:
+                return int(value)
+            except ValueError:
+                return None
+    return None
+
+
+class UploadAdmissionMiddleware:
+    """Size caps and the in-flight upload budget for upload routes; other requests pass through."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if (
+            scope["type"] != "http"
+            or scope["method"] not in ("POST", "PATCH")
+            or not _UPLOAD_ROUTES.match(scope["path"])
+        ):
+            await self.app(scope, receive, send)
+            return
+        limit = settings.UPLOAD_MAX_REQUEST_MB * MB
+        length = _content_length(scope)
+        if length is not None and length > limit:
+            UPLOAD_REJECTIONS.inc(reason="too_large")
+            await JSONResponse({"detail": "Upload too large"}, status_code=413)(scope, receive, send)
+            return
+        reserved = length if length is not None else limit
+        refused = await upload_admission.acquire(reserved)
+        if refused:
+            UPLOAD_REJECTIONS.inc(reason=refused)
+            response = JSONResponse(
+                {"detail": "Too many uploads in progress, retry shortly"},
+                status_code=503,
+                headers={"Retry-After": str(settings.UPLOAD_RETRY_AFTER_SECONDS)},
+            )
+            await response(scope, receive, send)
+            return
+        received = 0
+
+        async def limited_receive():
+            nonlocal received
+            message = await receive()
+            if message["type"] == "http.request":
+                received += len(message.get("body", b""))
+                if received > limit:
+                    UPLOAD_REJECTIONS.inc(reason="too_large")
+                    # Raised inside body parsing, so the route answers 413 and stops reading
+                    raise HTTPException(status_code=413, detail="Upload too large")
+            return message
+
+        try:
+            await self.app(scope, limited_receive, send)
+        finally:
+            upload_admission.release(reserved)
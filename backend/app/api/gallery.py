@@ -1,36 +1,168 @@
 """
 Gallery - serves shareable gallery page for a session.
+Rendered pages are cached per session and token with gzip/brotli bodies and
+an ETag, so repeat scans of the same QR code are answered with 304 or from memory.
+Open pages receive photos that land later, and the session's photo strip or
+collage once it is rendered, over Server-Sent Events (/gallery/{session_id}/events)
+instead of being refreshed.
 """
-from fastapi import APIRouter, HTTPException
-from fastapi.responses import HTMLResponse
+import json
+from datetime import datetime
+from typing import Optional
+
+from fastapi import APIRouter, HTTPException, Request
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import HTMLResponse, Response, StreamingResponse
 
 from app.services import session_service
+from app.services.gallery_cache import GalleryPage, gallery_cache
+from app.services.session_events import Subscription, session_events
 from app.config import settings
 
 router = APIRouter(tags=["gallery"])
 
 
+def _page_response(request: Request, page: GalleryPage) -> Response:
+    coding = page.negotiate(request.headers.get("accept-encoding", ""))
+    headers = {
+        "ETag": page.etag_for(coding),
+        "Cache-Control": "private, no-cache",
+        "Vary": "Accept-Encoding",
+    }
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match and page.matches(if_none_match):
+        return Response(status_code=304, headers=headers)
+    if coding != "identity":
+        headers["Content-Encoding"] = coding
+    return HTMLResponse(page.bodies[coding], headers=headers)
+
+
 @router.get("/gallery/{session_id}", response_class=HTMLResponse)
-async def gallery_page(session_id: str, token: str):
+async def gallery_page(request: Request, session_id: str, token: str):
     """
     Serve the gallery page for a session. Requires valid token.
     Returns 404 if expired or invalid.
     """
-    session = session_service.get_session(session_id, token)
+    page = gallery_cache.get(session_id, token)
+    if page is None:
+        epoch = gallery_cache.epoch
+        session = await run_in_threadpool(session_service.get_session, session_id, token)
+        if not session:
+            raise HTTPException(status_code=404, detail="Gallery not found or expired")
+
+        # Use relative URLs - images resolve from same origin as the gallery page
+        photo_urls = session["photo_urls"]
+        html = _gallery_html(photo_urls, session["composite_url"], session["expires_at"])
+        # Compressing the page is CPU work; keep it off the event loop
+        page = await run_in_threadpool(gallery_cache.put, session_id, token, html, session["expires_at"], epoch)
+    return _page_response(request, page)
+
+
+# Idle streams send a comment this often so proxies and phones keep them open
+SSE_HEARTBEAT_SECONDS = 20
+
+
+def _sse(event: dict) -> str:
+    return f"event: {event['type']}\ndata: {json.dumps(event)}\n\n"
+
+
+async def _event_stream(subscription: Subscription, session: dict, until: Optional[datetime]):
+    try:
+        # Snapshot first, so photos committed before the subscription aren't missed
+        yield "retry: 5000\n\n" + _sse({"type": "photos", "photo_urls": session["photo_urls"]})
+        if session["composite_url"]:
+            yield _sse({"type": "composite", "composite_url": session["composite_url"]})
+        while until is None or datetime.utcnow() < until:
+            event = await subscription.get(SSE_HEARTBEAT_SECONDS)
+            if event is None:
+                yield ": keep-alive\n\n"
+                continue
+            yield _sse(event)
+            if event["type"] == "deleted":
+                return
+        yield _sse({"type": "expired"})
+    finally:
+        session_events.unsubscribe(subscription)
+
+
+async def session_event_response(session_id: str, token: Optional[str], expire: bool = True) -> StreamingResponse:
+    """
+    Server-Sent Events stream of a session's photo list. Each event holds the full list.
+    An idle stream is one parked coroutine, so hundreds of open galleries are cheap.
+    """
+    # Subscribe before reading the snapshot so nothing lands in between unseen
+    subscription = session_events.subscribe(session_id)
+    session = await run_in_threadpool(session_service.get_session, session_id, token)
     if not session:
+        session_events.unsubscribe(subscription)
         raise HTTPException(status_code=404, detail="Gallery not found or expired")
+    until = session["expires_at"] if expire else None
+    return StreamingResponse(
+        _event_stream(subscription, session, until),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+@router.get("/gallery/{session_id}/events")
+async def gallery_events(session_id: str, token: str):
+    """Live photo updates for an open gallery page. Requires valid token."""
+    return await session_event_response(session_id, token)
+
 
-    # Use relative URLs - images resolve from same origin as the gallery page
-    photo_urls = session["photo_urls"]
-    html = _gallery_html(photo_urls, session["expires_at"])
-    return HTMLResponse(html)
+def _photo_html(url: str, i: int) -> str:
+    # Phones pick thumb/medium from srcset; tapping opens the full-resolution original
+    return (
+        f'<a href="{url}" target="_blank">'
+        f'<img src="{url}?size=medium" '
+        f'srcset="{url}?size=thumb 320w, {url}?size=medium 1024w" '
+        f'sizes="(max-width: 320px) 100vw, 280px" '
+        f'alt="Photo {i+1}" class="gallery-photo" loading="lazy" /></a>'
+    )
 
 
-def _gallery_html(photo_urls: list, expires_at) -> str:
-    imgs = "".join(
-        f'<img src="{url}" alt="Photo {i+1}" class="gallery-photo" />'
-        for i, url in enumerate(photo_urls)
+def _composite_html(url: str) -> str:
+    return (
+        f'<a href="{url}" download>'
+        f'<img src="{url}" alt="Your photo strip" class="composite-photo" /></a>'
     )
+
+
+# Appends photos that land after the page was rendered (mirrors _photo_html and _composite_html)
+_LIVE_SCRIPT = """
+(function () {
+  if (!window.EventSource) return;
+  var gallery = document.querySelector('.gallery');
+  var composite = document.querySelector('.composite');
+  var shown = gallery.children.length;
+  var source = new EventSource(location.pathname + '/events' + location.search);
+  function photoHtml(url, i) {
+    return '<a href="' + url + '" target="_blank"><img src="' + url + '?size=medium" ' +
+      'srcset="' + url + '?size=thumb 320w, ' + url + '?size=medium 1024w" ' +
+      'sizes="(max-width: 320px) 100vw, 280px" alt="Photo ' + (i + 1) + '" ' +
+      'class="gallery-photo" loading="lazy" /></a>';
+  }
+  source.addEventListener('photos', function (e) {
+    var urls = JSON.parse(e.data).photo_urls;
+    for (; shown < urls.length; shown++) gallery.insertAdjacentHTML('beforeend', photoHtml(urls[shown], shown));
+  });
+  source.addEventListener('composite', function (e) {
+    var url = JSON.parse(e.data).composite_url;
+    if (composite.children.length) return;
+    composite.innerHTML = '<a href="' + url + '" download><img src="' + url + '" ' +
+      'alt="Your photo strip" class="composite-photo" /></a>';
+  });
+  source.addEventListener('deleted', function () {
+    source.close(); gallery.innerHTML = ''; composite.innerHTML = '';
+  });
+  source.addEventListener('expired', function () { source.close(); });
+})();
+"""
+
+
+def _gallery_html(photo_urls: list, composite_url: Optional[str], expires_at) -> str:
+    imgs = "".join(_photo_html(url, i) for i, url in enumerate(photo_urls))
+    composite = _composite_html(composite_url) if composite_url else ""
     return f"""<!DOCTYPE html>
 <html lang="en">
 <head>
@@ -42,13 +174,17 @@ def _gallery_html(photo_urls: list, expires_at) -> str:
     body {{ margin: 0; padding: 1rem; font-family: system-ui, sans-serif; background: #1a1a1a; color: #fff; min-height: 100vh; display: flex; flex-direction: column; align-items: center; }}
     h1 {{ margin: 0 0 1rem; font-size: 1.5rem; }}
     .gallery {{ display: flex; gap: 1rem; flex-wrap: wrap; justify-content: center; max-width: 900px; }}
+    .composite {{ margin-bottom: 1rem; }}
+    .composite-photo {{ display: block; max-width: min(100%, 600px); max-height: 80vh; border-radius: 12px; }}
     .gallery-photo {{ width: 100%; max-width: 280px; aspect-ratio: 3/4; object-fit: cover; border-radius: 12px; }}
     .expires {{ margin-top: 1rem; font-size: 0.9rem; color: #888; }}
   </style>
 </head>
 <body>
   <h1>Your Photobooth Photos</h1>
+  <div class="composite">{composite}</div>
   <div class="gallery">{imgs}</div>
   <p class="expires">Available for 1 hour</p>
+  <script>{_LIVE_SCRIPT}</script>
 </body>
 </html>"""
@@ -1,23 +1,121 @@
 """
 Dynamic media serving - serves files from configured media_root.
+Pass ?size=thumb or ?size=medium to get a resized derivative when one exists.
+Dot-files and dot-directories (resumable upload state, temp files) are never served.
+Responses carry strong ETags and support conditional GET and single byte ranges;
+hot files are answered from the in-memory media cache.
 """
+import mimetypes
+import re
+from functools import lru_cache
 from pathlib import Path
+from typing import Optional
 
-from fastapi import APIRouter, HTTPException
-from fastapi.responses import FileResponse
+from fastapi import APIRouter, HTTPException, Request
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import FileResponse, Response, StreamingResponse
 
+from app.services import derivative_service
+from app.services.media_cache import MediaEntry, media_cache
 from app.services.settings_store import get_settings
+from app.utils.http_cache import is_not_modified, parse_range
 
 router = APIRouter(tags=["media"])
 
+# Upload names end in a random suffix ({booth}_{timestamp}_{8 hex}.ext) or are the
+# content hash ({sha256}.ext) and are never rewritten, so their bytes can be cached
+# by the browser indefinitely.
+IMMUTABLE_NAME = re.compile(r"(_\d{8}_\d{6}_\d{6}_[0-9a-f]{8}|(^|/)[0-9a-f]{64})\.\w+$")
+IMMUTABLE_CACHE_CONTROL = "private, max-age=31536000, immutable"
+REVALIDATE_CACHE_CONTROL = "no-cache"
+RANGE_CHUNK_SIZE = 64 * 1024
 
-@router.get("/media/{path:path}")
-async def serve_media(path: str):
-    """Serve a file from the configured media root."""
-    media_root = Path(get_settings()["media_root"]).resolve()
-    file_path = (media_root / path).resolve()
-    if not str(file_path).startswith(str(media_root)):
+
+@lru_cache(maxsize=8)
+def _resolve_root(media_root: str) -> Path:
+    return Path(media_root).resolve()
+
+
+async def _lookup(media_root: Path, rel_path: str) -> Optional[MediaEntry]:
+    entry = media_cache.get(media_root, rel_path)
+    if entry is not None:
+        return entry
+    try:
+        return await run_in_threadpool(media_cache.load, media_root, rel_path)
+    except PermissionError:
         raise HTTPException(status_code=403, detail="Invalid path")
-    if not file_path.exists() or not file_path.is_file():
+
+
+def _iter_file_range(path: Path, start: int, end: int):
+    with open(path, "rb") as f:
+        f.seek(start)
+        remaining = end - start + 1
+        while remaining > 0:
+            chunk = f.read(min(RANGE_CHUNK_SIZE, remaining))
+            if not chunk:
+                break
+            remaining -= len(chunk)
+            yield chunk
+
+
+def _respond(request: Request, entry: MediaEntry, cache_control: str) -> Response:
+    headers = {
+        "ETag": entry.etag,
+        "Last-Modified": entry.last_modified,
+        "Cache-Control": cache_control,
+        "Accept-Ranges": "bytes",
+    }
+    if is_not_modified(request.headers, entry.etag, entry.stat.st_mtime):
+        return Response(status_code=304, headers=headers)
+
+    media_type = mimetypes.guess_type(entry.path.name)[0] or "application/octet-stream"
+    size = entry.stat.st_size
+    if_range = request.headers.get("if-range")
+    byte_range = None
+    if if_range is None or if_range.strip() == entry.etag:
+        try:
+            byte_range = parse_range(request.headers.get("range"), size)
+        except ValueError:
+            return Response(status_code=416, headers={**headers, "Content-Range": f"bytes */{size}"})
+
+    if byte_range is not None:
+        start, end = byte_range
+        headers["Content-Range"] = f"bytes {start}-{end}/{size}"
+        headers["Content-Length"] = str(end - start + 1)
+        if entry.body is not None:
+            return Response(entry.body[start:end + 1], status_code=206, headers=headers, media_type=media_type)
+        return StreamingResponse(
+            _iter_file_range(entry.path, start, end), status_code=206, headers=headers, media_type=media_type
+        )
+    if entry.body is not None:
+        return Response(entry.body, headers=headers, media_type=media_type)
+    return FileResponse(entry.path, headers=headers, media_type=media_type, stat_result=entry.stat)
+
+
+@router.get("/media/{path:path}")
+async def serve_media(request: Request, path: str, size: Optional[str] = None):
+    """Serve a file from the configured media root, optionally as a resized derivative."""
+    # Dot-entries are internal state (resumable uploads, temp files); ".." is left to the traversal check
+    if any(part.startswith(".") and part != ".." for part in path.split("/")):
+        raise HTTPException(status_code=404, detail="Not found")
+    media_root = _resolve_root(get_settings()["media_root"])
+    immutable = IMMUTABLE_NAME.search(path) is not None
+    cache_control = IMMUTABLE_CACHE_CONTROL if immutable else REVALIDATE_CACHE_CONTROL
+    if size and size != "full":
+        if size not in derivative_service.SIZES:
+            raise HTTPException(status_code=400, detail="Invalid size")
+        derivative = derivative_service.derivative_path(Path(), path, size).as_posix()
+        entry = await _lookup(media_root, derivative)
+        if entry is not None:
+            return _respond(request, entry, cache_control)
+        # Uploads from before derivatives existed: render now, serve the original meanwhile.
+        # The same URL will later return the derivative, so it must not be cached as immutable.
+        cache_control = REVALIDATE_CACHE_CONTROL
+        entry = await _lookup(media_root, path)
+        if entry is not None:
+            derivative_service.schedule(str(entry.path), str(media_root))
+            return _respond(request, entry, cache_control)
+    entry = await _lookup(media_root, path)
+    if entry is None:
         raise HTTPException(status_code=404, detail="Not found")
-    return FileResponse(file_path)
+    return _respond(request, entry, cache_control)
@@ -0,0 +1,118 @@
+"""
+Metrics - request instrumentation middleware and the Prometheus /metrics endpoint.
+"""
+import shutil
+import time
+
+from fastapi import APIRouter
+from fastapi.responses import PlainTextResponse
+
+from app.services.admission_service import upload_admission
+from app.services.gallery_cache import gallery_cache
+from app.services.media_cache import media_cache
+from app.services.metrics import (
+    Counter,
+    Gauge,
+    HTTP_IN_FLIGHT,
+    HTTP_REQUEST_SECONDS,
+    REGISTRY,
+)
+from app.services.retention_service import reaper
+from app.services.session_events import session_events
+from app.services.settings_store import get_settings
+
+router = APIRouter(tags=["metrics"])
+
+
+class MetricsMiddleware:
+    """ASGI middleware recording latency per route template, method and status."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        start = time.perf_counter()
+        status = [500]
+
+        async def send_with_status(message):
+            if message["type"] == "http.response.start":
+                status[0] = message["status"]
+            await send(message)
+
+        HTTP_IN_FLIGHT.inc()
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            HTTP_IN_FLIGHT.dec()
+            # Route templates (not raw paths) keep label cardinality bounded
+            route = getattr(scope.get("route"), "path", "unmatched")
+            HTTP_REQUEST_SECONDS.observe(
+                time.perf_counter() - start, route=route, method=scope["method"], status=status[0]
+            )
+
+
+def _cache_samples():
+    for name, cache in (("media", media_cache), ("gallery", gallery_cache)):
+        yield (name, "hit"), cache.hits
+        yield (name, "miss"), cache.misses
+
+
+def _disk_samples():
+    try:
+        usage = shutil.disk_usage(get_settings()["media_root"])
+    except OSError:
+        return
+    yield ("free",), usage.free
+    yield ("total",), usage.total
+
+
+def _reaper_samples():
+    for key in ("runs", "sessions_orphaned", "sessions_purged", "files_deleted", "bytes_deleted"):
+        yield (key,), reaper.stats[key]
+
+
+REGISTRY.register(Counter(
+    "photobooth_cache_requests_total",
+    "Lookups in the in-memory media and gallery caches.",
+    ("cache", "result"),
+    callback=_cache_samples,
+))
+REGISTRY.register(Gauge(
+    "photobooth_media_root_bytes",
+    "Filesystem capacity of the media root.",
+    ("kind",),
+    callback=_disk_samples,
+))
+REGISTRY.register(Counter(
+    "photobooth_retention_total",
+    "Cumulative work done by the retention reaper.",
+    ("kind",),
+    callback=_reaper_samples,
+))
+REGISTRY.register(Gauge(
+    "photobooth_session_event_subscribers",
+    "Open live-update (SSE) streams for galleries and admin views.",
+    callback=lambda: [((), session_events.subscriber_count)],
+))
+
+REGISTRY.register(Gauge(
+    "photobooth_upload_inflight",
+    "Upload requests admitted and the body bytes reserved for them, in this worker.",
+    ("resource",),
+    callback=lambda: [(("requests",), upload_admission.in_flight), (("bytes",), upload_admission.bytes_in_flight)],
+))
+REGISTRY.register(Gauge(
+    "photobooth_upload_queue_depth",
+    "Upload requests waiting for the in-flight upload budget.",
+    callback=lambda: [((), upload_admission.queued)],
+))
+
+
+@router.get("/metrics", response_class=PlainTextResponse)
+def metrics():
+    """Prometheus text exposition of all registered metrics."""
+    return PlainTextResponse(REGISTRY.render(), media_type="text/plain; version=0.0.4")
+
@@ -3,13 +3,23 @@ Photo upload and storage API.
 Accepts photos from the frontend (browser capture) and stores them locally.
 Organizes by event: media_root/events/{event_slug}/uploads/
 """
+import asyncio
+import base64
+import binascii
+import errno
+import os
 from pathlib import Path
+from typing import List, Optional
 
-from fastapi import APIRouter, File, UploadFile, HTTPException, Form
+from fastapi import APIRouter, File, UploadFile, HTTPException, Form, Request
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import Response
+from starlette.requests import ClientDisconnect
 
 from app.config import settings
-from app.services.storage_service import StorageService
-from app.services import session_service
+from app.services.storage_service import StorageService, release_blob
+from app.services import composite_service, photo_index, quota_service, session_service, upload_service
+from app.services.upload_journal import journal
 from app.services.settings_store import get_settings
 
 router = APIRouter(prefix="/photos", tags=["photos"])
@@ -17,11 +27,14 @@ router = APIRouter(prefix="/photos", tags=["photos"])
 ALLOWED_CONTENT_TYPES = {"image/jpeg", "image/png", "image/webp"}
 
 
-def _get_storage() -> StorageService:
-    cfg = get_settings()
+def _get_storage(cfg: dict = None) -> StorageService:
+    cfg = cfg or get_settings()
     return StorageService(
         media_root=cfg["media_root"],
         retention_days=settings.DATA_RETENTION_DAYS,
+        content_addressed=settings.CONTENT_ADDRESSED_STORAGE,
+        normalize=settings.NORMALIZE_UPLOADS,
+        journaled=True,
     )
 
 
@@ -42,47 +55,306 @@ def _saved_path_to_url(saved_path: str, media_root: str) -> str:
     return f"/media/{rel.as_posix()}"
 
 
-@router.post("/upload")
-async def upload_photo(
-    file: UploadFile = File(...),
-    session_id: str = Form(None),
-):
-    """
-    Upload a photo (from browser capture). Saves to local storage.
-    If session_id provided, associates the photo with that session and uses its event.
-    """
+def _upload_filename(file: UploadFile) -> str:
+    """Validate an upload's content type and return a filename with an image extension."""
     content_type = (file.content_type or "").split(";")[0].strip()
     if content_type and content_type not in ALLOWED_CONTENT_TYPES:
         raise HTTPException(
             status_code=400,
             detail=f"Invalid file type. Allowed: {', '.join(ALLOWED_CONTENT_TYPES)}",
         )
-    data = await file.read()
-    if not data:
-        raise HTTPException(status_code=400, detail="Empty file")
     filename = file.filename or "photo.jpg"
     if not filename.lower().endswith((".jpg", ".jpeg", ".png", ".webp")):
         filename = filename + ".jpg"
+    return filename
+
+
+async def store_uploads(
+    files: List[UploadFile],
+    cfg: dict,
+    event_slug: str,
+    session_id: Optional[str] = None,
+    upload_id: Optional[str] = None,
+) -> List[dict]:
+    """
+    Validate and write uploads concurrently. upload_id marks a single upload as
+    the completion of that resumable upload (see photo_index.find_upload).
+
+    Returns:
+        One dict per file, in request order, shaped for
+        session_service.add_photos_to_session ("url", "path", "file_size",
+        "checksum", "index"); "original_size" is the upload's size before
+        normalization, None when it was stored as received. The uploads stay
+        open in the upload journal until passed to commit_uploads().
+    """
+    filenames = [_upload_filename(f) for f in files]
+    storage = _get_storage(cfg)
+    media_root = Path(cfg["media_root"])
+    try:
+        await run_in_threadpool(
+            quota_service.check_upload, media_root, event_slug, cfg["booth_id"], sum(f.size or 0 for f in files)
+        )
+    except quota_service.QuotaExceeded as e:
+        raise HTTPException(status_code=507, detail=str(e))
+
+    async def store(file: UploadFile, filename: str) -> dict:
+        saved = await storage.save_upload_stream(
+            file.file,
+            filename,
+            event_slug=event_slug,
+            booth_id=cfg["booth_id"],
+            session_id=session_id,
+            upload_id=upload_id,
+        )
+        index = await run_in_threadpool(photo_index.describe_photo, media_root, Path(saved["path"]))
+        index["original_size"] = saved.get("original_size")
+        index["upload_id"] = upload_id
+        return {
+            "url": _saved_path_to_url(saved["path"], cfg["media_root"]),
+            "path": saved["path"],
+            "file_size": saved["size"],
+            "checksum": saved["checksum"],
+            "original_size": saved.get("original_size"),
+            "journal_id": saved["journal_id"],
+            "index": index,
+        }
+
+    results = await asyncio.gather(
+        *(store(f, name) for f, name in zip(files, filenames)), return_exceptions=True
+    )
+    failed = [r for r in results if isinstance(r, BaseException)]
+    if failed:
+        # Don't leave half a batch on disk
+        await discard_uploads([r for r in results if isinstance(r, dict)], media_root)
+        if any(isinstance(e, OSError) and e.errno == errno.ENOSPC for e in failed):
+            quota_service.watchdog.wake()
+            raise HTTPException(status_code=507, detail="Storage full")
+        if all(isinstance(e, ValueError) for e in failed):
+            raise HTTPException(status_code=400, detail="Empty file")
+        raise failed[0]
+    return results
 
-    cfg = get_settings()
-    booth_id = cfg["booth_id"]
+
+async def discard_uploads(saved: List[dict], media_root: Path) -> None:
+    """Remove store_uploads() results that won't be committed (content that was already stored stays)."""
+    for s in saved:
+        if not s.get("deduplicated"):
+            Path(s["path"]).unlink(missing_ok=True)
+            release_blob(media_root, Path(s["path"]))
+    await run_in_threadpool(journal.close, [s["journal_id"] for s in saved])
+
+
+async def commit_uploads(saved: List[dict], commit, *args):
+    """
+    Run commit(*args) (the database write that records store_uploads() results)
+    off the event loop, then close the uploads' journal records.
+    """
+    try:
+        return await run_in_threadpool(commit, *args)
+    finally:
+        await run_in_threadpool(journal.close, [s["journal_id"] for s in saved])
+
+
+async def _save_photo(file: UploadFile, session_id: Optional[str], upload_id: Optional[str] = None) -> dict:
+    """Store one photo and attach it to its session (if any). Returns {"url", "path"}."""
+    # Settings, session lookups and file writes all block; keep them off the event loop
+    cfg = await run_in_threadpool(get_settings)
     event_slug = cfg["default_event_slug"]
     if session_id:
-        sess = session_service.get_session(session_id, token=None)
+        sess = await run_in_threadpool(session_service.get_session, session_id, None)
         if sess:
             event_slug = sess["event_slug"]
 
-    storage = _get_storage()
-    saved_path = await storage.save_upload(
-        data,
-        filename,
-        event_slug=event_slug,
-        booth_id=booth_id,
-        session_id=session_id,
-    )
-    url = _saved_path_to_url(saved_path, cfg["media_root"])
+    [saved] = await store_uploads([file], cfg, event_slug, session_id, upload_id)
+    session = await commit_uploads([saved], _record_photo, cfg, saved, event_slug, session_id)
+    if session:
+        composite_service.schedule(session)
+    return {"url": saved["url"], "path": saved["path"]}
 
+
+def _record_photo(cfg: dict, saved: dict, event_slug: str, session_id: Optional[str]) -> Optional[dict]:
+    """
+    Attach a stored photo to its session, or index it on its own if there is none.
+    Returns the updated session, or None for a photo without one.
+    """
     if session_id:
-        session_service.add_photo_to_session(session_id, url)
+        session = session_service.add_photos_to_session(session_id, [saved])
+        if session is not None:
+            return session
+    photo_index.record_photo(
+        Path(cfg["media_root"]),
+        Path(saved["path"]),
+        event_slug,
+        session_id,
+        saved["original_size"],
+        saved["index"]["upload_id"],
+    )
+    return None
+
+
+@router.post("/upload")
+async def upload_photo(
+    file: UploadFile = File(...),
+    session_id: str = Form(None),
+):
+    """
+    Upload a photo (from browser capture). Saves to local storage.
+    If session_id provided, associates the photo with that session and uses its event.
+    """
+    return await _save_photo(file, session_id)
+
+
+# Resumable uploads (tus-like): POST creates, HEAD reports the offset, PATCH appends
+# at that offset, POST .../complete stores the photo. Lost chunks are resumed by
+# HEAD + PATCH instead of re-sending the whole file.
+
+TUS_HEADERS = {"Tus-Resumable": "1.0.0", "Cache-Control": "no-store"}
+PATCH_CONTENT_TYPE = "application/offset+octet-stream"
+PATCH_BUFFER_SIZE = 1024 * 1024
+
+
+def _parse_metadata(header: str) -> dict:
+    """Parse tus Upload-Metadata: comma-separated "key base64value" pairs."""
+    metadata = {}
+    for pair in filter(None, (p.strip() for p in header.split(","))):
+        key, _, value = pair.partition(" ")
+        try:
+            metadata[key] = base64.b64decode(value).decode("utf-8") if value else ""
+        except (binascii.Error, UnicodeDecodeError):
+            raise HTTPException(status_code=400, detail="Invalid Upload-Metadata")
+    return metadata
+
+
+def _media_root() -> Path:
+    return Path(get_settings()["media_root"])
+
+
+def _int_header(request: Request, name: str) -> int:
+    try:
+        value = int(request.headers[name])
+    except (KeyError, ValueError):
+        raise HTTPException(status_code=400, detail=f"{name} header is required")
+    if value < 0:
+        raise HTTPException(status_code=400, detail=f"Invalid {name}")
+    return value
+
+
+@router.post("/uploads", status_code=201)
+async def create_resumable_upload(request: Request):
+    """
+    Start a resumable upload. Headers: Upload-Length (bytes) and optional
+    Upload-Metadata with base64 "filename", "filetype" and "session_id".
+    """
+    length = _int_header(request, "upload-length")
+    if length == 0:
+        raise HTTPException(status_code=400, detail="Empty file")
+    if length > settings.RESUMABLE_UPLOAD_MAX_MB * 1024 * 1024:
+        raise HTTPException(status_code=413, detail="Upload too large")
+    metadata = _parse_metadata(request.headers.get("upload-metadata", ""))
+    filetype = metadata.get("filetype", "")
+    if filetype and filetype.split(";")[0].strip() not in ALLOWED_CONTENT_TYPES:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Invalid file type. Allowed: {', '.join(ALLOWED_CONTENT_TYPES)}",
+        )
+    upload = await run_in_threadpool(
+        upload_service.create_upload,
+        _media_root(),
+        length,
+        metadata.get("filename") or "photo.jpg",
+        metadata.get("session_id") or None,
+    )
+    location = str(request.url_for("resumable_upload_status", upload_id=upload["id"]).path)
+    headers = {**TUS_HEADERS, "Location": location, "Upload-Offset": "0"}
+    return Response(status_code=201, headers=headers)
+
+
+@router.head("/uploads/{upload_id}", name="resumable_upload_status")
+async def resumable_upload_status(upload_id: str):
+    """Report how many bytes of an upload have been received."""
+    upload = await run_in_threadpool(upload_service.get_upload, _media_root(), upload_id)
+    if upload is None:
+        return Response(status_code=404, headers=TUS_HEADERS)
+    headers = {**TUS_HEADERS, "Upload-Offset": str(upload["offset"]), "Upload-Length": str(upload["length"])}
+    return Response(status_code=200, headers=headers)
+
+
+@router.patch("/uploads/{upload_id}")
+async def append_resumable_upload(request: Request, upload_id: str):
+    """
+    Append the request body at Upload-Offset. Whatever arrives before a dropped
+    connection is kept; the client resumes from the offset HEAD reports.
+    """
+    if request.headers.get("content-type", "").split(";")[0].strip() != PATCH_CONTENT_TYPE:
+        raise HTTPException(status_code=415, detail=f"Content-Type must be {PATCH_CONTENT_TYPE}")
+    offset = _int_header(request, "upload-offset")
+    media_root = _media_root()
+    buffer = bytearray()
+
+    async def flush():
+        nonlocal offset
+        try:
+            offset = await run_in_threadpool(upload_service.append, media_root, upload_id, offset, bytes(buffer))
+        except upload_service.OffsetMismatch:
+            raise HTTPException(status_code=409, detail="Upload-Offset does not match", headers=TUS_HEADERS)
+        except KeyError:
+            raise HTTPException(status_code=404, detail="Upload not found", headers=TUS_HEADERS)
+        except ValueError:
+            raise HTTPException(status_code=413, detail="Chunk exceeds Upload-Length", headers=TUS_HEADERS)
+        buffer.clear()
+
+    try:
+        async for chunk in request.stream():
+            buffer.extend(chunk)
+            if len(buffer) >= PATCH_BUFFER_SIZE:
+                await flush()
+    except ClientDisconnect:
+        pass  # keep what arrived; HEAD tells the client where to resume
+    # Also runs for an empty body, which still validates the upload and offset
+    await flush()
+    return Response(status_code=204, headers={**TUS_HEADERS, "Upload-Offset": str(offset)})
+
+
+@router.post("/uploads/{upload_id}/complete")
+async def complete_resumable_upload(upload_id: str):
+    """
+    Store a fully received upload as a photo (and attach it to its session).
+    Idempotent: completing again returns the same photo, also when the first
+    attempt committed the photo but was cut off before recording its result.
+    """
+    media_root = _media_root()
+    upload = await run_in_threadpool(upload_service.get_upload, media_root, upload_id)
+    if upload is None:
+        raise HTTPException(status_code=404, detail="Upload not found")
+    if upload["result"] is not None:
+        return upload["result"]
+    rel_path = await run_in_threadpool(photo_index.find_upload, upload_id)
+    if rel_path is not None:
+        path = media_root.resolve() / rel_path
+        result = {"url": _saved_path_to_url(str(path), str(media_root)), "path": str(path)}
+        await run_in_threadpool(upload_service.mark_finished, media_root, upload_id, result)
+        return result
+    if upload["offset"] != upload["length"]:
+        raise HTTPException(
+            status_code=409,
+            detail=f"Upload incomplete: {upload['offset']} of {upload['length']} bytes received",
+        )
+    data = await run_in_threadpool(upload_service.open_data, media_root, upload_id)
+    try:
+        # size lets the quota check see the assembled upload
+        size = os.fstat(data.fileno()).st_size
+        result = await _save_photo(
+            UploadFile(data, size=size, filename=upload["filename"]), upload["session_id"], upload_id
+        )
+    finally:
+        data.close()
+    await run_in_threadpool(upload_service.mark_finished, media_root, upload_id, result)
+    return result
+
 
-    return {"url": url, "path": saved_path}
+@router.delete("/uploads/{upload_id}", status_code=204)
+async def abort_resumable_upload(upload_id: str):
+    """Abort an upload and discard the bytes received so far."""
+    if not await run_in_threadpool(upload_service.delete_upload, _media_root(), upload_id):
+        raise HTTPException(status_code=404, detail="Upload not found")
+    return Response(status_code=204, headers=TUS_HEADERS)
@@ -1,36 +1,123 @@
 """
 Session API - create and retrieve photobooth sessions.
 """
-from typing import Optional
+from pathlib import Path
+from typing import List, Optional
 
-from fastapi import APIRouter, HTTPException, Body
+from fastapi import APIRouter, HTTPException, Body, File, Form, Header, UploadFile
+from fastapi.concurrency import run_in_threadpool
 
-from app.services import session_service
+from app.api.v1.photos import commit_uploads, discard_uploads, store_uploads
+from app.services import composite_service, session_service
+from app.services.settings_store import get_settings
 from app.models.session import SessionCreate, SessionResponse
 
 router = APIRouter(prefix="/sessions", tags=["sessions"])
 
+# One guest's capture is a handful of frames; anything far beyond that is a misuse
+MAX_BATCH_PHOTOS = 20
+MAX_IDEMPOTENCY_KEY_LENGTH = 128
 
-@router.post("", response_model=SessionResponse)
-async def create_session(body: Optional[SessionCreate] = Body(default=None)):
-    body = body or SessionCreate()
-    """
-    Create a new session for a photobooth capture.
-    Default event is 'onlocation'.
-    """
-    body = body or SessionCreate()
-    session = session_service.create_session(body.event_slug)
+
+def _session_response(session: dict) -> SessionResponse:
     return SessionResponse(
         id=session["id"],
         event_slug=session["event_slug"],
         created_at=session["created_at"],
         expires_at=session["expires_at"],
         photo_urls=session["photo_urls"],
+        composite_url=session["composite_url"],
         gallery_url=session["gallery_url"],
         token=session["token"],
     )
 
 
+def _check_batch(files: List[UploadFile]) -> None:
+    if len(files) > MAX_BATCH_PHOTOS:
+        raise HTTPException(status_code=400, detail=f"At most {MAX_BATCH_PHOTOS} photos per request")
+
+
+def _check_idempotency_key(key: Optional[str]) -> None:
+    if key is not None and not 0 < len(key) <= MAX_IDEMPOTENCY_KEY_LENGTH:
+        raise HTTPException(status_code=400, detail="Invalid Idempotency-Key")
+
+
+def _key_reused_by_deleted_session() -> HTTPException:
+    return HTTPException(status_code=409, detail="Idempotency-Key belongs to a deleted session")
+
+
+@router.post("", response_model=SessionResponse)
+async def create_session(
+    body: Optional[SessionCreate] = Body(default=None),
+    idempotency_key: Optional[str] = Header(None),
+):
+    """
+    Create a new session for a photobooth capture.
+    Default event is 'onlocation'. Retrying with the same Idempotency-Key
+    returns the session the first attempt created.
+    """
+    _check_idempotency_key(idempotency_key)
+    body = body or SessionCreate()
+    session = await run_in_threadpool(session_service.create_session, body.event_slug, idempotency_key)
+    if session is None:
+        raise _key_reused_by_deleted_session()
+    return _session_response(session)
+
+
+@router.post("/with-photos", response_model=SessionResponse)
+async def create_session_with_photos(
+    files: List[UploadFile] = File(...),
+    event_slug: str = Form(None),
+    idempotency_key: Optional[str] = Header(None),
+):
+    """
+    Create a session and attach its photos in one request.
+    Event defaults to the configured default event. The session is only stored
+    once every photo is written, so a failed upload leaves no empty session.
+    Retrying with the same Idempotency-Key returns the session (and photos) the
+    first attempt stored instead of storing them again.
+    """
+    _check_batch(files)
+    _check_idempotency_key(idempotency_key)
+    if idempotency_key:
+        existing = await run_in_threadpool(session_service.find_session_by_key, idempotency_key)
+        if existing is not None:
+            return _session_response(existing)
+    cfg = await run_in_threadpool(get_settings)
+    session = await run_in_threadpool(session_service.new_session, event_slug)
+    saved = await store_uploads(files, cfg, session["event_slug"], session["id"])
+    stored = await commit_uploads(
+        saved, session_service.create_session_with_photos, session, saved, idempotency_key
+    )
+    if stored is None or stored["id"] != session["id"]:
+        # A concurrent attempt with the same key won; these copies were never attached
+        await discard_uploads(saved, Path(cfg["media_root"]))
+        if stored is None:
+            raise _key_reused_by_deleted_session()
+        return _session_response(stored)
+    composite_service.schedule(stored)
+    return _session_response(stored)
+
+
+@router.post("/{session_id}/photos:batch", response_model=SessionResponse)
+async def add_photos_batch(session_id: str, files: List[UploadFile] = File(...)):
+    """
+    Upload several photos to an existing session in one request.
+    Files are written concurrently and attached in a single transaction, in request order.
+    """
+    _check_batch(files)
+    cfg = await run_in_threadpool(get_settings)
+    session = await run_in_threadpool(session_service.get_session, session_id, None)
+    if not session:
+        raise HTTPException(status_code=404, detail="Session not found or expired")
+    saved = await store_uploads(files, cfg, session["event_slug"], session_id)
+    session = await commit_uploads(saved, session_service.add_photos_to_session, session_id, saved)
+    if not session:
+        raise HTTPException(status_code=404, detail="Session not found or expired")
+    composite_service.schedule(session)
+    return _session_response(session)
+
+
 @router.get("/{session_id}", response_model=SessionResponse)
 async def get_session(session_id: str, token: str = None):
     """
@@ -40,12 +127,4 @@ async def get_session(session_id: str, token: str = None):
     session = session_service.get_session(session_id, token)
     if not session:
         raise HTTPException(status_code=404, detail="Session not found or expired")
-    return SessionResponse(
-        id=session["id"],
-        event_slug=session["event_slug"],
-        created_at=session["created_at"],
-        expires_at=session["expires_at"],
-        photo_urls=session["photo_urls"],
-        gallery_url=session["gallery_url"],
-        token=session["token"],
-    )
+    return _session_response(session)
@@ -1,13 +1,18 @@
 """
 Settings and events API - for the customization menu.
 """
+from datetime import date, datetime
 from pathlib import Path
 from typing import Optional
 
-from fastapi import APIRouter, HTTPException, Body
+from fastapi import APIRouter, HTTPException, Body, Request
+from fastapi.responses import Response, StreamingResponse
 
+from app.api.gallery import session_event_response
 from app.services.settings_store import get_settings, save_settings, verify_password, change_password
-from app.services import event_service, session_service
+from app.services import event_service, export_service, photo_index, quota_service, session_service
+from app.services.retention_service import reaper
+from app.utils.http_cache import parse_range
 
 router = APIRouter(prefix="/settings", tags=["settings"])
 
@@ -83,16 +88,31 @@ def browse_folder():
 
 
 @router.get("/events")
-def list_events():
-    """List all events."""
-    return event_service.list_events()
+def list_events(cursor: Optional[str] = None, limit: int = event_service.DEFAULT_PAGE_SIZE):
+    """List events by name. Pass next_cursor back to get the next page."""
+    try:
+        return event_service.list_events(cursor=cursor, limit=limit)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
 
 
 @router.get("/events/{slug}/sessions")
-def list_event_sessions(slug: str):
-    """List sessions for an event (grouped photo sets)."""
-    sessions = session_service.list_sessions_for_event(slug)
-    return {"sessions": sessions}
+def list_event_sessions(
+    slug: str,
+    cursor: Optional[str] = None,
+    limit: int = session_service.DEFAULT_PAGE_SIZE,
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
+):
+    """
+    Session summaries (id, time, photo count, cover thumbnail) for an event, newest
+    first, optionally created between since and until. Pass next_cursor back to get
+    the next page; the full session comes from regenerate or the live stream.
+    """
+    try:
+        return session_service.list_session_summaries(slug, cursor=cursor, limit=limit, since=since, until=until)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
 
 
 @router.post("/sessions/{session_id}/regenerate")
@@ -112,25 +132,78 @@ def delete_session(session_id: str):
     return {"success": True}
 
 
+@router.get("/sessions/{session_id}/events")
+async def session_events_stream(session_id: str):
+    """Live photo updates for a session (admin view), as Server-Sent Events."""
+    return await session_event_response(session_id, None, expire=False)
+
+
+@router.get("/retention")
+def retention_status():
+    """Progress and totals of the background retention reaper."""
+    return reaper.stats
+
+
+@router.get("/storage")
+def storage_usage():
+    """Free disk space, quotas and stored bytes per event and booth."""
+    return quota_service.get_usage(Path(get_settings()["media_root"]))
+
+
 @router.get("/events/{slug}/photos")
-def list_event_photos(slug: str):
-    """List photo URLs for an event. Scans recursively under events/{slug}/."""
-    cfg = get_settings()
-    media_root = Path(cfg["media_root"])
-    event_dir = media_root / "events" / slug
-    if not event_dir.exists():
-        return {"photos": []}
-    extensions = {".jpg", ".jpeg", ".png", ".webp"}
-    media_resolved = media_root.resolve()
-    photos = []
-    for f in sorted(event_dir.rglob("*"), key=lambda p: p.stat().st_mtime, reverse=True):
-        if f.is_file() and f.suffix.lower() in extensions:
-            try:
-                rel = f.resolve().relative_to(media_resolved)
-            except ValueError:
-                rel = f.relative_to(media_root)
-            photos.append(f"/media/{rel.as_posix()}")
-    return {"photos": photos}
+def list_event_photos(slug: str, cursor: Optional[str] = None, limit: int = photo_index.DEFAULT_PAGE_SIZE):
+    """List photo URLs for an event, newest first. Pass next_cursor back to get the next page."""
+    try:
+        return photo_index.list_event_photos(slug, cursor=cursor, limit=limit)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+
+@router.post("/events/{slug}/photos/reconcile")
+def reconcile_event_photos(slug: str):
+    """Re-sync the photo index with events/{slug}/ on disk (picks up files added by hand)."""
+    return photo_index.reconcile_event(Path(get_settings()["media_root"]), slug)
+
+
+@router.get("/events/{slug}/export.zip")
+def export_event_photos(
+    request: Request,
+    slug: str,
+    since: Optional[date] = None,
+    until: Optional[date] = None,
+):
+    """
+    Download an event's photos as a ZIP (with manifest.json), optionally limited
+    to photos taken between since and until (inclusive). Streamed from disk;
+    supports Range/If-Range so interrupted downloads can resume.
+    """
+    try:
+        archive = export_service.build_event_archive(get_settings()["media_root"], slug, since, until)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid event slug")
+    suffix = "".join(f"_{d.isoformat()}" for d in (since, until) if d)
+    headers = {
+        "ETag": archive.etag,
+        "Accept-Ranges": "bytes",
+        "Cache-Control": "no-cache",
+        "Content-Disposition": f'attachment; filename="{slug}{suffix}.zip"',
+    }
+    if_range = request.headers.get("if-range")
+    byte_range = None
+    if if_range is None or if_range.strip() == archive.etag:
+        try:
+            byte_range = parse_range(request.headers.get("range"), archive.size)
+        except ValueError:
+            return Response(status_code=416, headers={**headers, "Content-Range": f"bytes */{archive.size}"})
+    if byte_range is None:
+        headers["Content-Length"] = str(archive.size)
+        return StreamingResponse(archive.iter_bytes(), headers=headers, media_type="application/zip")
+    start, end = byte_range
+    headers["Content-Range"] = f"bytes {start}-{end}/{archive.size}"
+    headers["Content-Length"] = str(end - start + 1)
+    return StreamingResponse(
+        archive.iter_bytes(start, end), status_code=206, headers=headers, media_type="application/zip"
+    )
 
 
 @router.post("/events")
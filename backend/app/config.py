@@ -18,17 +18,69 @@ class Settings(BaseSettings):
         "http://localhost:3000",  # Alternative React dev server
     ]
     
+    # Workers
+    CACHE_SYNC_INTERVAL_SECONDS: float = 0.5  # How often each worker picks up other workers' changes
+    
     # Media Storage
     MEDIA_ROOT: str = "./media"
+    CONTENT_ADDRESSED_STORAGE: bool = False  # Store identical uploads once (needs hardlink support)
+    RESUMABLE_UPLOAD_MAX_MB: int = 50
+    RESUMABLE_UPLOAD_EXPIRY_HOURS: int = 24  # Unfinished resumable uploads are discarded after this
+    UPLOAD_FSYNC: str = "group"  # always, group (uploads within the window share a flush) or off
+    UPLOAD_FSYNC_WINDOW_MS: float = 2.0
+    
+    # Upload admission control (per worker): size cap, in-flight budget, then 503 + Retry-After
+    UPLOAD_MAX_REQUEST_MB: int = 50  # Per request body, batches included
+    UPLOAD_MAX_CONCURRENT: int = 8
+    UPLOAD_MAX_INFLIGHT_MB: int = 200  # Declared body bytes of admitted uploads
+    UPLOAD_QUEUE_MAX: int = 16  # Uploads allowed to wait for the budget...
+    UPLOAD_QUEUE_TIMEOUT_SECONDS: float = 2.0  # ...for at most this long
+    UPLOAD_RETRY_AFTER_SECONDS: int = 2
     
     # Events & Sessions
     DEFAULT_EVENT: str = "onlocation"
     GALLERY_EXPIRY_HOURS: int = 1
     GALLERY_BASE_URL: str = "http://localhost:8000"  # Base URL for gallery links (QR codes)
+    GALLERY_TOKEN_SECRET: str = ""  # HMAC key for gallery links; generated into settings.json if empty
+    
+    # Storage quotas and free-space watchdog (0 MB quota = unlimited)
+    STORAGE_EVENT_QUOTA_MB: int = 0
+    STORAGE_BOOTH_QUOTA_MB: int = 0  # Per booth within an event
+    STORAGE_MIN_FREE_MB: int = 200  # Uploads are refused (507) rather than filling the disk
+    STORAGE_LOW_WATERMARK_MB: int = 1024  # Below this free space the watchdog starts evicting...
+    STORAGE_HIGH_WATERMARK_MB: int = 2048  # ...derivatives, then expired sessions, until this is free
+    STORAGE_EVICT_GRACE_HOURS: int = 168  # Only sessions whose gallery link expired this long ago are evicted
+    STORAGE_WATCHDOG_INTERVAL_SECONDS: int = 60
+    
+    # Health
+    HEALTH_MIN_FREE_MB: int = 500  # /health reports unhealthy below this free space
+    
+    # Upload normalization (re-encode originals: upright, no EXIF/GPS)
+    NORMALIZE_UPLOADS: bool = False
+    NORMALIZE_FORMAT: str = "jpeg"  # jpeg or webp
+    NORMALIZE_QUALITY: int = 85
+    NORMALIZE_MAX_EDGE: int = 0  # Longest edge in pixels; 0 keeps the full resolution
+    NORMALIZE_MAX_KB: int = 0  # Size budget; quality steps down until the photo fits (0 = none)
+    NORMALIZE_WORKERS: int = 2
+    
+    # Derivatives (resized copies served to galleries and admin previews)
+    DERIVATIVES_ENABLED: bool = True
+    DERIVATIVE_FORMAT: str = "webp"  # webp or jpeg
+    DERIVATIVE_QUALITY: int = 80
+    DERIVATIVE_WORKERS: int = 2
+    
+    # Composites (photo strip, grid or branded frame rendered from each session's photos)
+    COMPOSITE_ENABLED: bool = True
+    COMPOSITE_TEMPLATE: str = "strip"  # strip, grid, frame, or {name}.json in COMPOSITE_TEMPLATES_DIR
+    COMPOSITE_TEMPLATES_DIR: str = "./templates"  # Relative to backend/; {name}.json/.png, {event_slug}/{name}.* per event
+    COMPOSITE_QUALITY: int = 90
+    COMPOSITE_WORKERS: int = 1
     
     # GDPR & Privacy
     DATA_RETENTION_DAYS: int = 30
     AUTO_DELETE_ENABLED: bool = True
+    RETENTION_SWEEP_INTERVAL_MINUTES: int = 60
+    RETENTION_BATCH_SIZE: int = 500
     
     class Config:
         env_file = ".env"
@@ -1,19 +1,78 @@
 """
 Main application entry point for the photobooth backend.
 """
+import asyncio
+import logging
+from contextlib import asynccontextmanager
+from pathlib import Path
+
 from fastapi import FastAPI
+from fastapi.concurrency import run_in_threadpool
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse
 
 from app.config import settings
 from app.api.v1 import photos, sessions, settings_api
-from app.api import gallery, media_route
+from app.api import admission, gallery, media_route, metrics_route
+from app.services import composite_service, database, health_service, photo_index, upload_journal
+from app.services.cache_sync import cache_poller
+from app.services.quota_service import watchdog
+from app.services.retention_service import reaper
+from app.services.settings_store import get_settings
+from app.utils import process_pool
+from app.utils.file_lock import file_lock
+
+logger = logging.getLogger(__name__)
+
+
+async def _reconcile_photo_index():
+    """Index photos that predate the photo index or were copied in while stopped."""
+    try:
+        # One worker reconciles; the others would only repeat the same directory walk
+        with file_lock(database.lock_path(database.DB_PATH, "reconcile"), blocking=False) as held:
+            if held:
+                totals = await asyncio.to_thread(photo_index.reconcile_all, Path(get_settings()["media_root"]))
+                logger.info(f"Photo index reconciled: {totals}")
+    except Exception:
+        logger.exception("Photo index reconciliation failed")
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Run schema migrations once at startup and release pooled connections on shutdown."""
+    database.init_db()
+    # Before reconciling, which would index a half-committed upload as a loose photo
+    try:
+        await asyncio.to_thread(upload_journal.recover)
+    except Exception:
+        logger.exception("Upload journal recovery failed")
+    reconcile_task = asyncio.create_task(_reconcile_photo_index())
+    if settings.AUTO_DELETE_ENABLED:
+        reaper.start(settings.RETENTION_SWEEP_INTERVAL_MINUTES * 60)
+    cache_poller.start(settings.CACHE_SYNC_INTERVAL_SECONDS)
+    watchdog.start(settings.STORAGE_WATCHDOG_INTERVAL_SECONDS)
+    yield
+    await watchdog.stop()
+    await cache_poller.stop()
+    await reaper.stop()
+    await reconcile_task
+    await composite_service.drain()
+    process_pool.shutdown_all()
+    upload_journal.journal.shutdown()
+    database.close_db()
+
 
 app = FastAPI(
     title="Photobooth API",
     description="Backend API for AI-driven photobooth system",
     version="0.1.0",
+    lifespan=lifespan,
 )
 
+# Innermost, so refused uploads are still measured and get CORS headers
+app.add_middleware(admission.UploadAdmissionMiddleware)
+app.add_middleware(metrics_route.MetricsMiddleware)
+
 # CORS middleware for frontend communication
 app.add_middleware(
     CORSMiddleware,
@@ -29,6 +88,7 @@ app.include_router(sessions.router, prefix=settings.API_V1_PREFIX)
 app.include_router(settings_api.router, prefix=settings.API_V1_PREFIX)
 app.include_router(gallery.router)
 app.include_router(media_route.router)
+app.include_router(metrics_route.router)
 
 
 @app.get("/")
@@ -39,8 +99,7 @@ async def root():
 
 @app.get("/health")
 async def health_check():
-    """Detailed health check."""
-    return {
-        "status": "healthy",
-        "service": "photobooth-backend",
-    }
+    """Readiness check: database, media root writability and free disk space."""
+    result = await run_in_threadpool(health_service.check_readiness)
+    status_code = 200 if result["status"] == "healthy" else 503
+    return JSONResponse({**result, "service": "photobooth-backend"}, status_code=status_code)
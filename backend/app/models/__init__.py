@@ -0,0 +1,3 @@
+"""
+Pydantic models for API request and response bodies.
+"""
@@ -0,0 +1,24 @@
+"""
+Session request/response models.
+"""
+from datetime import datetime
+from typing import List, Optional
+
+from pydantic import BaseModel
+
+
+class SessionCreate(BaseModel):
+    """Body for creating a session. Event falls back to the configured default."""
+    event_slug: Optional[str] = None
+
+
+class SessionResponse(BaseModel):
+    """Session as returned to the frontend."""
+    id: str
+    event_slug: str
+    created_at: datetime
+    expires_at: datetime
+    photo_urls: List[str]
+    composite_url: Optional[str] = None
+    gallery_url: str
+    token: str
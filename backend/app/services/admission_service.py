@@ -0,0 +1,97 @@
+"""
+Admission service - concurrency and byte budget for in-flight uploads.
+Each upload request reserves its declared size (or the per-request cap when it
+has no Content-Length) before its body is read. When the budget is spent,
+requests wait in a short FIFO queue and are turned away once the queue is full
+or the wait times out, so a burst of large photos degrades into fast 503s
+instead of growing the kiosk's memory and temp files. Budgets are per worker.
+"""
+import asyncio
+import time
+from collections import deque
+from typing import Optional
+
+from app.config import settings
+from app.services.metrics import UPLOAD_ADMISSION_WAIT_SECONDS
+
+MB = 1024 * 1024
+
+
+class UploadAdmission:
+    """FIFO admission against UPLOAD_MAX_CONCURRENT requests and UPLOAD_MAX_INFLIGHT_MB bytes."""
+
+    def __init__(self):
+        self.in_flight = 0
+        self.bytes_in_flight = 0
+        self._waiters: deque = deque()
+
+    @property
+    def queued(self) -> int:
+        return len(self._waiters)
+
+    def _fits(self, nbytes: int) -> bool:
+        if self.in_flight >= settings.UPLOAD_MAX_CONCURRENT:
+            return False
+        # A lone request is always admitted, even if it alone exceeds the byte budget
+        return self.in_flight == 0 or self.bytes_in_flight + nbytes <= settings.UPLOAD_MAX_INFLIGHT_MB * MB
+
+    def _take(self, nbytes: int) -> None:
+        self.in_flight += 1
+        self.bytes_in_flight += nbytes
+
+    def _wake(self) -> None:
+        """Admit queued requests in arrival order while they fit."""
+        while self._waiters:
+            future, nbytes = self._waiters[0]
+            if not self._fits(nbytes):
+                return
+            self._waiters.popleft()
+            self._take(nbytes)
+            future.set_result(None)
+
+    async def acquire(self, nbytes: int) -> Optional[str]:
+        """
+        Reserve a slot and nbytes for an upload. Returns None once admitted (call
+        release() when done), or why it was refused: "queue_full" or "timeout".
+        """
+        if not self._waiters and self._fits(nbytes):
+            self._take(nbytes)
+            return None
+        timeout = settings.UPLOAD_QUEUE_TIMEOUT_SECONDS
+        if len(self._waiters) >= settings.UPLOAD_QUEUE_MAX or timeout <= 0:
+            return "queue_full"
+        future = asyncio.get_running_loop().create_future()
+        entry = (future, nbytes)
+        self._waiters.append(entry)
+        started = time.perf_counter()
+        try:
+            await asyncio.wait_for(asyncio.shield(future), timeout)
+        except asyncio.TimeoutError:
+            pass
+        except asyncio.CancelledError:
+            # Client went away; give back a slot that was granted meanwhile
+            if future.done():
+                self.release(nbytes)
+            else:
+                self._abandon(entry)
+            raise
+        finally:
+            UPLOAD_ADMISSION_WAIT_SECONDS.observe(time.perf_counter() - started)
+        if future.done():
+            return None
+        self._abandon(entry)
+        return "timeout"
+
+    def _abandon(self, entry: tuple) -> None:
+        self._waiters.remove(entry)
+        entry[0].cancel()
+        # A large request leaving the head of the queue may unblock smaller ones behind it
+        self._wake()
+
+    def release(self, nbytes: int) -> None:
+        self.in_flight -= 1
+        self.bytes_in_flight -= nbytes
+        self._wake()
+
+
+upload_admission = UploadAdmission()
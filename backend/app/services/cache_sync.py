@@ -0,0 +1,125 @@
+"""
+Cache sync - keeps each worker's in-memory caches coherent under uvicorn --workers.
+Rendered galleries, token revocations, media entries and SSE listeners live
+in one process, but a session can change in any of them. session_service
+describes every change as a small dict and:
+  1. record()s it in the cache_events table inside its own transaction,
+  2. apply()s it to the local caches right after commit.
+Every worker polls cache_events every CACHE_SYNC_INTERVAL_SECONDS and applies
+the rows other workers wrote, so remote changes show up within one interval.
+Row ids follow commit order (one writer at a time), so a cursor never skips.
+Sync is always on: the process model is not visible from inside a worker
+(uvicorn --workers, gunicorn, several instances on one media root), and a
+single process only pays one small insert per change and an idle poll.
+"""
+import asyncio
+import json
+import logging
+import os
+import secrets
+import time
+from datetime import datetime
+from typing import Optional
+
+from app.services import gallery_tokens
+from app.services.database import get_connection
+from app.services.gallery_cache import gallery_cache
+from app.services.media_cache import media_cache
+from app.services.session_events import session_events
+
+logger = logging.getLogger(__name__)
+
+ORIGIN = f"{os.getpid()}-{secrets.token_hex(4)}"
+EVENT_RETENTION_SECONDS = 300
+PRUNE_INTERVAL_SECONDS = 60
+
+
+def record(conn, session_id: str, change: dict) -> None:
+    """Queue a session change for the other workers. Part of the caller's transaction."""
+    conn.execute(
+        "INSERT INTO cache_events (origin, session_id, payload, created_at) VALUES (?, ?, ?, ?)",
+        (ORIGIN, session_id, json.dumps(change), time.time()),
+    )
+
+
+def apply(session_id: str, change: dict) -> None:
+    """
+    Apply a session change to this worker's caches. Call after commit.
+
+    change keys (all optional):
+        event: published to the session's SSE listeners
+        revoke: [first valid token version, ISO expiry of the revoked tokens]
+        forget: media-relative paths to drop from the media cache
+    """
+    revoke = change.get("revoke")
+    if revoke:
+        gallery_tokens.revocations.revoke(session_id, revoke[0], datetime.fromisoformat(revoke[1]))
+    for rel in change.get("forget", ()):
+        media_cache.forget(rel)
+    gallery_cache.invalidate(session_id)
+    if change.get("event"):
+        session_events.publish(session_id, change["event"])
+
+
+class CachePoller:
+    """Background poller applying other workers' cache_events rows."""
+
+    def __init__(self):
+        self._cursor: Optional[int] = None
+        self._next_prune = 0.0
+        self._task: Optional[asyncio.Task] = None
+        self.applied = 0
+
+    def poll_once(self) -> int:
+        """Apply rows written since the last poll by other workers. Blocking. Returns rows applied."""
+        with get_connection() as conn:
+            if self._cursor is None:
+                # Changes from before this worker started are already in the database
+                self._cursor = conn.execute("SELECT COALESCE(MAX(id), 0) FROM cache_events").fetchone()[0]
+                return 0
+            rows = conn.execute(
+                "SELECT id, origin, session_id, payload FROM cache_events WHERE id > ? ORDER BY id",
+                (self._cursor,),
+            ).fetchall()
+            if time.monotonic() >= self._next_prune:
+                self._next_prune = time.monotonic() + PRUNE_INTERVAL_SECONDS
+                conn.execute(
+                    "DELETE FROM cache_events WHERE created_at < ?",
+                    (time.time() - EVENT_RETENTION_SECONDS,),
+                )
+                conn.commit()
+        applied = 0
+        for row in rows:
+            self._cursor = row["id"]
+            if row["origin"] != ORIGIN:
+                apply(row["session_id"], json.loads(row["payload"]))
+                applied += 1
+        self.applied += applied
+        return applied
+
+    async def run_forever(self, interval_seconds: float) -> None:
+        while True:
+            try:
+                await asyncio.to_thread(self.poll_once)
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                logger.exception("Cache sync poll failed")
+            await asyncio.sleep(interval_seconds)
+
+    def start(self, interval_seconds: float) -> None:
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self.run_forever(interval_seconds))
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        self._cursor = None
+
+
+cache_poller = CachePoller()
@@ -0,0 +1,221 @@
+"""
+Composite service - photo strips, grids and branded frames rendered from a session's photos.
+A template is a canvas size, a background colour and the slots its photos are
+cropped into, plus an optional PNG overlay (logo, frame, event branding) drawn
+on top. Templates are looked up in COMPOSITE_TEMPLATES_DIR (relative to the
+backend folder unless absolute), event first:
+  {templates_dir}/{event_slug}/{name}.json|.png, then {templates_dir}/{name}.json|.png
+and the built-in layouts below when no JSON layout exists. Once a session has
+a photo for every slot, the composite is rendered in a background process pool,
+stored under composites/ (never evicted for space, unlike processed/) and shown
+on the gallery page.
+Decoded overlays and blank canvases are cached in each pool process, keyed by
+file modification time, so an edited overlay is picked up on the next render.
+"""
+import asyncio
+import io
+import json
+import logging
+import secrets
+import time
+from functools import lru_cache
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from PIL import Image
+
+from app.config import settings
+from app.services import session_service
+from app.services.metrics import COMPOSITE_RENDER_SECONDS
+from app.services.settings_store import get_settings
+from app.services.storage_service import StorageService
+from app.utils.process_pool import ProcessPool, open_upright
+
+logger = logging.getLogger(__name__)
+
+APP_ROOT = Path(__file__).parent.parent.parent
+
+# Built-in layouts: 2x6" strip and 6x4" grid and frame at 300 dpi; slots are [x, y, width, height]
+TEMPLATES = {
+    "strip": {
+        "size": [600, 1800],
+        "background": "#ffffff",
+        "slots": [[30, 30, 540, 405], [30, 465, 540, 405], [30, 900, 540, 405]],
+    },
+    "grid": {
+        "size": [1800, 1200],
+        "background": "#ffffff",
+        "slots": [[20, 20, 870, 570], [910, 20, 870, 570], [20, 610, 870, 570], [910, 610, 870, 570]],
+    },
+    "frame": {
+        "size": [1800, 1200],
+        "background": "#ffffff",
+        "slots": [[80, 80, 1640, 1040]],
+    },
+}
+
+pool = ProcessPool(enabled=lambda: settings.COMPOSITE_ENABLED, workers=lambda: settings.COMPOSITE_WORKERS)
+# session id -> background render, so a session is rendered once at a time
+_pending: Dict[str, asyncio.Task] = {}
+
+
+def _templates_dir() -> Path:
+    # Not the working directory: the server may be started from anywhere
+    return APP_ROOT / settings.COMPOSITE_TEMPLATES_DIR
+
+
+def _template_file(event_slug: str, name: str, suffix: str) -> Optional[Path]:
+    directory = _templates_dir()
+    candidates = [directory / f"{name}{suffix}"]
+    if event_slug and Path(event_slug).name == event_slug:
+        candidates.insert(0, directory / event_slug / f"{name}{suffix}")
+    return next((path for path in candidates if path.is_file()), None)
+
+
+def _check_layout(layout: dict) -> dict:
+    """Validate a layout read from JSON. Raises ValueError."""
+    try:
+        width, height = (int(v) for v in layout["size"])
+        slots = [[int(v) for v in slot] for slot in layout["slots"]]
+    except (KeyError, TypeError, ValueError) as e:
+        raise ValueError(f"Invalid composite layout: {e}") from e
+    if not slots or any(
+        len(s) != 4 or s[2] <= 0 or s[3] <= 0 or s[0] < 0 or s[1] < 0 or s[0] + s[2] > width or s[1] + s[3] > height
+        for s in slots
+    ):
+        raise ValueError("Invalid composite layout: every slot must lie within the canvas")
+    return {"size": [width, height], "background": str(layout.get("background", "#ffffff")), "slots": slots}
+
+
+@lru_cache(maxsize=64)
+def _read_layout(path: str, mtime_ns: int) -> dict:
+    return _check_layout(json.loads(Path(path).read_text(encoding="utf-8")))
+
+
+def resolve_template(event_slug: str, name: Optional[str] = None) -> Optional[dict]:
+    """
+    Layout and overlay of template `name` (default COMPOSITE_TEMPLATE) for an event.
+    Blocking (a few stat calls). Returns None for an unknown template.
+
+    Raises:
+        ValueError: If the template's JSON layout is invalid
+    """
+    name = name or settings.COMPOSITE_TEMPLATE
+    layout_path = _template_file(event_slug, name, ".json")
+    if layout_path is not None:
+        layout = _read_layout(str(layout_path), layout_path.stat().st_mtime_ns)
+    elif name in TEMPLATES:
+        layout = TEMPLATES[name]
+    else:
+        return None
+    overlay_path = _template_file(event_slug, name, ".png")
+    overlay = [str(overlay_path), overlay_path.stat().st_mtime_ns] if overlay_path else None
+    return {"name": name, **layout, "overlay": overlay}
+
+
+@lru_cache(maxsize=16)
+def _blank_canvas(size: tuple, background: str):
+    return Image.new("RGB", size, background)
+
+
+@lru_cache(maxsize=32)
+def _load_overlay(path: str, mtime_ns: int, size: tuple):
+    """Decoded RGBA overlay scaled to the canvas; cached per pool process."""
+    with Image.open(path) as im:
+        overlay = im.convert("RGBA")
+    if overlay.size != size:
+        overlay = overlay.resize(size, Image.LANCZOS)
+    return overlay
+
+
+def _cover(path: str, width: int, height: int):
+    """Photo scaled and centre-cropped to fill a width x height slot."""
+    # Square, so the decoded size still covers the slot whichever way EXIF rotates it
+    img = open_upright(path, max(width, height))
+    if img.mode != "RGB":
+        img = img.convert("RGB")
+    scale = max(width / img.width, height / img.height)
+    crop_width, crop_height = width / scale, height / scale
+    left, top = (img.width - crop_width) / 2, (img.height - crop_height) / 2
+    # Crop and resample in one pass; reducing_gap shrinks by whole factors first, which is much cheaper
+    return img.resize(
+        (width, height), Image.LANCZOS, box=(left, top, left + crop_width, top + crop_height), reducing_gap=2.0
+    )
+
+
+def _composite(paths: List[str], template: dict, quality: int) -> bytes:
+    """Process-pool entry point: fill the template's slots with photos and encode it as JPEG."""
+    size = tuple(template["size"])
+    canvas = _blank_canvas(size, template["background"]).copy()
+    for path, (x, y, width, height) in zip(paths, template["slots"]):
+        canvas.paste(_cover(path, width, height), (x, y))
+    if template["overlay"]:
+        overlay = _load_overlay(*template["overlay"], size)
+        canvas.paste(overlay, (0, 0), overlay)
+    out = io.BytesIO()
+    canvas.save(out, "JPEG", quality=quality, optimize=True, progressive=True)
+    return out.getvalue()
+
+
+async def render_session(session: dict, template: Optional[str] = None) -> Optional[str]:
+    """
+    Render a session's composite from its first photos, store it and record it on the session.
+
+    Returns:
+        The composite's /media URL, or None if the session has fewer photos than
+        the template has slots, or already has a composite or was deleted meanwhile
+
+    Raises:
+        ValueError: If the template is unknown or its layout is invalid
+    """
+    layout = await asyncio.to_thread(resolve_template, session["event_slug"], template)
+    if layout is None:
+        raise ValueError(f"Unknown composite template: {template or settings.COMPOSITE_TEMPLATE}")
+    slots = len(layout["slots"])
+    if len(session["photo_urls"]) < slots:
+        return None
+    media_root = Path(get_settings()["media_root"]).resolve()
+    paths = [str(media_root / url.removeprefix("/media/")) for url in session["photo_urls"][:slots]]
+
+    started = time.perf_counter()
+    data = await asyncio.wrap_future(
+        pool.submit(_composite, paths, layout, settings.COMPOSITE_QUALITY)
+    )
+    COMPOSITE_RENDER_SECONDS.observe(time.perf_counter() - started, template=layout["name"])
+
+    storage = StorageService(media_root=str(media_root))
+    # A concurrent render of the same session must not overwrite the recorded file
+    filename = f"{session['id']}_{layout['name']}_{secrets.token_hex(4)}.jpg"
+    saved_path = Path(await storage.save_composite(data, filename))
+    url = f"/media/{saved_path.relative_to(media_root).as_posix()}"
+    if not await asyncio.to_thread(session_service.set_session_composite, session["id"], url):
+        saved_path.unlink(missing_ok=True)
+        return None
+    return url
+
+
+async def _render_in_background(session: dict) -> None:
+    try:
+        await render_session(session)
+    except Exception:
+        logger.exception(f"Could not render composite for session {session['id']}")
+
+
+def schedule(session: dict) -> Optional[asyncio.Task]:
+    """
+    Render a session's composite in the background once it has a photo for every
+    slot (call after each upload is committed). Returns immediately; must be
+    called from the event loop.
+    """
+    if not pool.is_available() or session.get("composite_url") or session["id"] in _pending:
+        return None
+    task = asyncio.get_running_loop().create_task(_render_in_background(session))
+    _pending[session["id"]] = task
+    task.add_done_callback(lambda _: _pending.pop(session["id"], None))
+    return task
+
+
+async def drain() -> None:
+    """Wait for background renders to finish."""
+    if _pending:
+        await asyncio.gather(*_pending.values(), return_exceptions=True)
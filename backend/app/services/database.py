@@ -0,0 +1,634 @@
+"""
+Database - shared SQLite connection pool and schema management.
+Schema migrations run once per process; connections are pooled and reused
+by session_service and event_service instead of reconnecting per call.
+Several worker processes may share the file: migrations run under a lock file
+and read-modify-write cycles use write_transaction() (BEGIN IMMEDIATE).
+"""
+import json
+import logging
+import queue
+import re
+import sqlite3
+import threading
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Callable, List
+
+from app.utils.file_lock import file_lock
+
+logger = logging.getLogger(__name__)
+
+DB_PATH = Path(__file__).parent.parent.parent / "photobooth.db"
+POOL_SIZE = 8
+POOL_TIMEOUT_SECONDS = 10.0
+
+# Applied to every pooled connection. WAL lets gallery reads run alongside
+# upload writes; NORMAL sync is durable across app crashes in WAL mode.
+_PRAGMAS = (
+    "PRAGMA journal_mode=WAL",
+    "PRAGMA synchronous=NORMAL",
+    "PRAGMA foreign_keys=ON",
+    "PRAGMA temp_store=MEMORY",
+    "PRAGMA cache_size=-8000",
+    "PRAGMA busy_timeout=5000",
+)
+
+
+def _migration_1_base_schema(conn: sqlite3.Connection) -> None:
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS events (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            name TEXT NOT NULL,
+            slug TEXT NOT NULL UNIQUE,
+            created_at TEXT NOT NULL
+        )
+    """)
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS sessions (
+            id TEXT PRIMARY KEY,
+            event_slug TEXT NOT NULL,
+            token TEXT NOT NULL,
+            created_at TEXT NOT NULL,
+            expires_at TEXT NOT NULL,
+            photo_urls TEXT NOT NULL,
+            deleted_at TEXT
+        )
+    """)
+    # Databases created before soft-delete existed lack this column
+    columns = {r["name"] for r in conn.execute("PRAGMA table_info(sessions)")}
+    if "deleted_at" not in columns:
+        conn.execute("ALTER TABLE sessions ADD COLUMN deleted_at TEXT")
+    conn.execute(
+        "INSERT OR IGNORE INTO events (name, slug, created_at) VALUES (?, ?, datetime('now'))",
+        ("On Location", "onlocation"),
+    )
+
+
+def _migration_2_session_photos(conn: sqlite3.Connection) -> None:
+    """Move photos out of the sessions.photo_urls JSON blob into a child table."""
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS session_photos (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            session_id TEXT NOT NULL REFERENCES sessions(id) ON DELETE CASCADE,
+            position INTEGER NOT NULL,
+            url TEXT NOT NULL,
+            file_size INTEGER,
+            checksum TEXT,
+            created_at TEXT NOT NULL,
+            UNIQUE (session_id, position)
+        )
+    """)
+    conn.execute(
+        "CREATE INDEX IF NOT EXISTS idx_sessions_event_listing "
+        "ON sessions (event_slug, deleted_at, created_at)"
+    )
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_sessions_expires_at ON sessions (expires_at)")
+    rows = conn.execute(
+        "SELECT id, created_at, photo_urls FROM sessions WHERE photo_urls NOT IN ('', '[]')"
+    ).fetchall()
+    for row in rows:
+        try:
+            urls = json.loads(row["photo_urls"])
+        except json.JSONDecodeError:
+            logger.warning(f"Skipping unreadable photo_urls for session {row['id']}")
+            continue
+        conn.executemany(
+            """
+            INSERT OR IGNORE INTO session_photos (session_id, position, url, created_at)
+            VALUES (?, ?, ?, ?)
+            """,
+            [(row["id"], position, url, row["created_at"]) for position, url in enumerate(urls)],
+        )
+    # photo_urls is kept as it was (NOT NULL) so an older build still reads these
+    # sessions after a rollback; this build no longer reads or writes it
+
+
+def _migration_3_photo_index(conn: sqlite3.Connection) -> None:
+    """Index of every photo file under events/, recorded at upload time."""
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS photos (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            event_slug TEXT NOT NULL,
+            session_id TEXT,
+            rel_path TEXT NOT NULL UNIQUE,
+            file_size INTEGER NOT NULL,
+            mtime_ns INTEGER NOT NULL,
+            width INTEGER,
+            height INTEGER,
+            created_at TEXT NOT NULL
+        )
+    """)
+    conn.execute(
+        "CREATE INDEX IF NOT EXISTS idx_photos_event_listing "
+        "ON photos (event_slug, mtime_ns DESC, id DESC)"
+    )
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_photos_session ON photos (session_id)")
+
+
+def _migration_4_retention_index(conn: sqlite3.Connection) -> None:
+    """The retention reaper purges sessions oldest-first by created_at."""
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_sessions_created_at ON sessions (created_at)")
+
+
+def _migration_5_token_version(conn: sqlite3.Connection) -> None:
+    """Gallery tokens are signed with a per-session version, bumped on regenerate."""
+    conn.execute("ALTER TABLE sessions ADD COLUMN token_version INTEGER NOT NULL DEFAULT 1")
+
+
+def _migration_6_cache_events(conn: sqlite3.Connection) -> None:
+    """Cross-worker cache invalidations (see cache_sync); rows are pruned after a few minutes."""
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS cache_events (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            origin TEXT NOT NULL,
+            session_id TEXT NOT NULL,
+            payload TEXT NOT NULL,
+            created_at REAL NOT NULL
+        )
+    """)
+
+
+def _migration_7_original_size(conn: sqlite3.Connection) -> None:
+    """Upload size before normalization; NULL for photos stored as received."""
+    conn.execute("ALTER TABLE photos ADD COLUMN original_size INTEGER")
+
+
+def _migration_8_storage_usage(conn: sqlite3.Connection) -> None:
+    """
+    Bytes and files per (event, booth), kept current by triggers on the photo index
+    so every write, delete, purge and reconcile updates usage in its own transaction.
+    """
+    conn.execute("ALTER TABLE photos ADD COLUMN booth_id TEXT NOT NULL DEFAULT ''")
+    rows = conn.execute("SELECT id, rel_path FROM photos").fetchall()
+    conn.executemany(
+        "UPDATE photos SET booth_id = ? WHERE id = ?",
+        [(parts[2], row["id"]) for row in rows if len(parts := row["rel_path"].split("/")) == 5],
+    )
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS storage_usage (
+            event_slug TEXT NOT NULL,
+            booth_id TEXT NOT NULL,
+            bytes INTEGER NOT NULL DEFAULT 0,
+            files INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (event_slug, booth_id)
+        )
+    """)
+    conn.execute("""
+        INSERT INTO storage_usage (event_slug, booth_id, bytes, files)
+        SELECT event_slug, booth_id, SUM(file_size), COUNT(*) FROM photos GROUP BY event_slug, booth_id
+    """)
+    conn.execute("""
+        CREATE TRIGGER IF NOT EXISTS photos_usage_insert AFTER INSERT ON photos BEGIN
+            INSERT INTO storage_usage (event_slug, booth_id, bytes, files)
+            VALUES (NEW.event_slug, NEW.booth_id, NEW.file_size, 1)
+            ON CONFLICT (event_slug, booth_id) DO UPDATE SET
+                bytes = bytes + excluded.bytes, files = files + 1;
+        END
+    """)
+    conn.execute("""
+        CREATE TRIGGER IF NOT EXISTS photos_usage_delete AFTER DELETE ON photos BEGIN
+            UPDATE storage_usage SET bytes = bytes - OLD.file_size, files = files - 1
+            WHERE event_slug = OLD.event_slug AND booth_id = OLD.booth_id;
+        END
+    """)
+    conn.execute("""
+        CREATE TRIGGER IF NOT EXISTS photos_usage_update AFTER UPDATE OF file_size ON photos BEGIN
+            UPDATE storage_usage SET bytes = bytes + NEW.file_size - OLD.file_size
+            WHERE event_slug = OLD.event_slug AND booth_id = OLD.booth_id;
+        END
+    """)
+
+
+def _migration_9_listing_indexes(conn: sqlite3.Connection) -> None:
+    """
+    Keyset pagination: sessions page on (created_at, id) and events on (name, id),
+    so both need the tie-breaker in the index to avoid a sort per page.
+    """
+    conn.execute(
+        "CREATE INDEX IF NOT EXISTS idx_sessions_event_keyset "
+        "ON sessions (event_slug, deleted_at, created_at DESC, id DESC)"
+    )
+    conn.execute("DROP INDEX IF EXISTS idx_sessions_event_listing")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_events_name ON events (name, id)")
+
+
+# Hour bucket (UTC) of a photo, from its file mtime
+_CAPTURE_HOUR = "strftime('%Y-%m-%dT%H:00:00Z', {row}.mtime_ns / 1000000000, 'unixepoch')"
+
+
+def _migration_10_event_stats(conn: sqlite3.Connection) -> None:
+    """
+    Live sessions, photos and bytes per event, plus photos per capture hour.
+    Like storage_usage, triggers keep both current inside the transaction that
+    creates, deletes or purges a session or indexes a photo.
+    """
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS event_stats (
+            event_slug TEXT PRIMARY KEY,
+            sessions INTEGER NOT NULL DEFAULT 0,
+            photos INTEGER NOT NULL DEFAULT 0,
+            bytes INTEGER NOT NULL DEFAULT 0
+        )
+    """)
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS event_capture_hours (
+            event_slug TEXT NOT NULL,
+            hour TEXT NOT NULL,
+            photos INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (event_slug, hour)
+        )
+    """)
+    conn.execute("""
+        INSERT INTO event_stats (event_slug, sessions)
+        SELECT event_slug, COUNT(*) FROM sessions WHERE deleted_at IS NULL GROUP BY event_slug
+    """)
+    conn.execute("""
+        INSERT INTO event_stats (event_slug, photos, bytes)
+        SELECT event_slug, COUNT(*), SUM(file_size) FROM photos WHERE true GROUP BY event_slug
+        ON CONFLICT (event_slug) DO UPDATE SET photos = excluded.photos, bytes = excluded.bytes
+    """)
+    conn.execute(f"""
+        INSERT INTO event_capture_hours (event_slug, hour, photos)
+        SELECT event_slug, {_CAPTURE_HOUR.format(row="photos")}, COUNT(*) FROM photos GROUP BY 1, 2
+    """)
+    conn.execute("""
+        CREATE TRIGGER IF NOT EXISTS sessions_stats_insert AFTER INSERT ON sessions
+        WHEN NEW.deleted_at IS NULL BEGIN
+            INSERT INTO event_stats (event_slug, sessions) VALUES (NEW.event_slug, 1)
+            ON CONFLICT (event_slug) DO UPDATE SET sessions = sessions + 1;
+        END
+    """)
+    conn.execute("""
+        CREATE TRIGGER IF NOT EXISTS sessions_stats_soft_delete AFTER UPDATE OF deleted_at ON sessions
+        WHEN OLD.deleted_at IS NULL AND NEW.deleted_at IS NOT NULL BEGIN
+            UPDATE event_stats SET sessions = sessions - 1 WHERE event_slug = OLD.event_slug;
+        END
+    """)
+    conn.execute("""
+        CREATE TRIGGER IF NOT EXISTS sessions_stats_delete AFTER DELETE ON sessions
+        WHEN OLD.deleted_at IS NULL BEGIN
+            UPDATE event_stats SET sessions = sessions - 1 WHERE event_slug = OLD.event_slug;
+        END
+    """)
+    conn.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS photos_stats_insert AFTER INSERT ON photos BEGIN
+            INSERT INTO event_stats (event_slug, photos, bytes) VALUES (NEW.event_slug, 1, NEW.file_size)
+            ON CONFLICT (event_slug) DO UPDATE SET photos = photos + 1, bytes = bytes + excluded.bytes;
+            INSERT INTO event_capture_hours (event_slug, hour, photos)
+            VALUES (NEW.event_slug, {_CAPTURE_HOUR.format(row="NEW")}, 1)
+            ON CONFLICT (event_slug, hour) DO UPDATE SET photos = photos + 1;
+        END
+    """)
+    conn.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS photos_stats_delete AFTER DELETE ON photos BEGIN
+            UPDATE event_stats SET photos = photos - 1, bytes = bytes - OLD.file_size
+            WHERE event_slug = OLD.event_slug;
+            UPDATE event_capture_hours SET photos = photos - 1
+            WHERE event_slug = OLD.event_slug AND hour = {_CAPTURE_HOUR.format(row="OLD")};
+            DELETE FROM event_capture_hours WHERE event_slug = OLD.event_slug AND photos <= 0;
+        END
+    """)
+    conn.execute("""
+        CREATE TRIGGER IF NOT EXISTS photos_stats_resize AFTER UPDATE OF file_size ON photos BEGIN
+            UPDATE event_stats SET bytes = bytes + NEW.file_size - OLD.file_size
+            WHERE event_slug = OLD.event_slug;
+        END
+    """)
+    # A file re-indexed with a new mtime (reconcile) moves to its new hour
+    conn.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS photos_stats_retime AFTER UPDATE OF mtime_ns ON photos
+        WHEN {_CAPTURE_HOUR.format(row="NEW")} != {_CAPTURE_HOUR.format(row="OLD")} BEGIN
+            UPDATE event_capture_hours SET photos = photos - 1
+            WHERE event_slug = OLD.event_slug AND hour = {_CAPTURE_HOUR.format(row="OLD")};
+            DELETE FROM event_capture_hours WHERE event_slug = OLD.event_slug AND photos <= 0;
+            INSERT INTO event_capture_hours (event_slug, hour, photos)
+            VALUES (OLD.event_slug, {_CAPTURE_HOUR.format(row="NEW")}, 1)
+            ON CONFLICT (event_slug, hour) DO UPDATE SET photos = photos + 1;
+        END
+    """)
+
+
+def _migration_11_session_composite(conn: sqlite3.Connection) -> None:
+    """URL of the session's rendered photo strip or collage; NULL until rendered."""
+    conn.execute("ALTER TABLE sessions ADD COLUMN composite_url TEXT")
+
+
+def _migration_12_idempotent_uploads(conn: sqlite3.Connection) -> None:
+    """
+    Client-chosen keys that make session creation safe to retry, and the resumable
+    upload each indexed photo came from, so a retried /complete finds its photo.
+    """
+    conn.execute("ALTER TABLE sessions ADD COLUMN idempotency_key TEXT")
+    conn.execute(
+        "CREATE UNIQUE INDEX IF NOT EXISTS idx_sessions_idempotency_key "
+        "ON sessions (idempotency_key) WHERE idempotency_key IS NOT NULL"
+    )
+    conn.execute("ALTER TABLE photos ADD COLUMN upload_id TEXT")
+    conn.execute(
+        "CREATE INDEX IF NOT EXISTS idx_photos_upload_id ON photos (upload_id) WHERE upload_id IS NOT NULL"
+    )
+
+
+# Filename of a content-addressed upload ({sha256}{ext}); its session paths are hardlinks of one blob
+_CONTENT_NAME = re.compile(r"^[0-9a-f]{64}\.\w+$")
+_BLOB_MATCH = "event_slug = {row}.event_slug AND booth_id = {row}.booth_id AND blob = {row}.blob"
+
+
+def _migration_13_storage_usage_per_blob(conn: sqlite3.Connection) -> None:
+    """
+    storage_usage counts a content-addressed blob once per (event, booth), however
+    many sessions link to it. photos.blob names the blob (NULL for plain files) and
+    storage_blobs counts its links, so the triggers add its bytes on the first
+    link and remove them with the last.
+    """
+    conn.execute("ALTER TABLE photos ADD COLUMN blob TEXT")
+    rows = conn.execute("SELECT id, rel_path FROM photos").fetchall()
+    conn.executemany(
+        "UPDATE photos SET blob = ? WHERE id = ?",
+        [(name, row["id"]) for row in rows if _CONTENT_NAME.match(name := row["rel_path"].rsplit("/", 1)[-1])],
+    )
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS storage_blobs (
+            event_slug TEXT NOT NULL,
+            booth_id TEXT NOT NULL,
+            blob TEXT NOT NULL,
+            refs INTEGER NOT NULL,
+            PRIMARY KEY (event_slug, booth_id, blob)
+        ) WITHOUT ROWID
+    """)
+    conn.execute("""
+        INSERT INTO storage_blobs (event_slug, booth_id, blob, refs)
+        SELECT event_slug, booth_id, blob, COUNT(*) FROM photos WHERE blob IS NOT NULL
+        GROUP BY event_slug, booth_id, blob
+    """)
+    conn.execute("DELETE FROM storage_usage")
+    conn.execute("""
+        INSERT INTO storage_usage (event_slug, booth_id, bytes, files)
+        SELECT event_slug, booth_id, SUM(bytes), SUM(files) FROM (
+            SELECT event_slug, booth_id, MAX(file_size) AS bytes, COUNT(*) AS files FROM photos
+            GROUP BY event_slug, booth_id, COALESCE(blob, rel_path)
+        )
+        GROUP BY event_slug, booth_id
+    """)
+    for trigger in ("photos_usage_insert", "photos_usage_delete", "photos_usage_update"):
+        conn.execute(f"DROP TRIGGER IF EXISTS {trigger}")
+    conn.execute(f"""
+        CREATE TRIGGER photos_usage_insert AFTER INSERT ON photos BEGIN
+            INSERT INTO storage_blobs (event_slug, booth_id, blob, refs)
+            SELECT NEW.event_slug, NEW.booth_id, NEW.blob, 1 WHERE NEW.blob IS NOT NULL
+            ON CONFLICT (event_slug, booth_id, blob) DO UPDATE SET refs = refs + 1;
+            INSERT INTO storage_usage (event_slug, booth_id, bytes, files)
+            VALUES (
+                NEW.event_slug, NEW.booth_id,
+                CASE WHEN NEW.blob IS NULL OR (SELECT refs FROM storage_blobs WHERE {_BLOB_MATCH.format(row="NEW")}) = 1
+                    THEN NEW.file_size ELSE 0 END,
+                1
+            )
+            ON CONFLICT (event_slug, booth_id) DO UPDATE SET
+                bytes = bytes + excluded.bytes, files = files + 1;
+        END
+    """)
+    conn.execute(f"""
+        CREATE TRIGGER photos_usage_delete AFTER DELETE ON photos BEGIN
+            UPDATE storage_blobs SET refs = refs - 1 WHERE {_BLOB_MATCH.format(row="OLD")};
+            UPDATE storage_usage SET
+                bytes = bytes - CASE
+                    WHEN OLD.blob IS NULL OR (SELECT refs FROM storage_blobs WHERE {_BLOB_MATCH.format(row="OLD")}) = 0
+                    THEN OLD.file_size ELSE 0 END,
+                files = files - 1
+            WHERE event_slug = OLD.event_slug AND booth_id = OLD.booth_id;
+            DELETE FROM storage_blobs WHERE {_BLOB_MATCH.format(row="OLD")} AND refs <= 0;
+        END
+    """)
+    # A blob's size never changes; only plain files are rewritten in place
+    conn.execute("""
+        CREATE TRIGGER photos_usage_update AFTER UPDATE OF file_size ON photos WHEN OLD.blob IS NULL BEGIN
+            UPDATE storage_usage SET bytes = bytes + NEW.file_size - OLD.file_size
+            WHERE event_slug = OLD.event_slug AND booth_id = OLD.booth_id;
+        END
+    """)
+
+
+# Bytes a photo row adds or frees under the once-per-blob rule, read after storage_blobs is updated
+_FIRST_LINK_BYTES = (
+    "CASE WHEN NEW.blob IS NULL OR (SELECT refs FROM storage_blobs WHERE {match}) = 1 THEN NEW.file_size ELSE 0 END"
+).format(match=_BLOB_MATCH.format(row="NEW"))
+_LAST_LINK_BYTES = (
+    "CASE WHEN OLD.blob IS NULL OR (SELECT refs FROM storage_blobs WHERE {match}) = 0 THEN OLD.file_size ELSE 0 END"
+).format(match=_BLOB_MATCH.format(row="OLD"))
+
+
+def _migration_14_event_bytes_per_blob(conn: sqlite3.Connection) -> None:
+    """
+    event_stats.bytes follows storage_usage and counts a shared blob once. The
+    usage triggers, which already track blob links, now update both tables;
+    SQLite does not order separate triggers, so a stats trigger could not rely
+    on storage_blobs having been updated first.
+    """
+    conn.execute("""
+        UPDATE event_stats SET bytes = COALESCE(
+            (SELECT SUM(bytes) FROM storage_usage WHERE storage_usage.event_slug = event_stats.event_slug), 0
+        )
+    """)
+    for trigger in (
+        "photos_stats_insert", "photos_stats_delete", "photos_stats_resize",
+        "photos_usage_insert", "photos_usage_delete", "photos_usage_update",
+    ):
+        conn.execute(f"DROP TRIGGER IF EXISTS {trigger}")
+    conn.execute(f"""
+        CREATE TRIGGER photos_stats_insert AFTER INSERT ON photos BEGIN
+            INSERT INTO event_stats (event_slug, photos) VALUES (NEW.event_slug, 1)
+            ON CONFLICT (event_slug) DO UPDATE SET photos = photos + 1;
+            INSERT INTO event_capture_hours (event_slug, hour, photos)
+            VALUES (NEW.event_slug, {_CAPTURE_HOUR.format(row="NEW")}, 1)
+            ON CONFLICT (event_slug, hour) DO UPDATE SET photos = photos + 1;
+        END
+    """)
+    conn.execute(f"""
+        CREATE TRIGGER photos_stats_delete AFTER DELETE ON photos BEGIN
+            UPDATE event_stats SET photos = photos - 1 WHERE event_slug = OLD.event_slug;
+            UPDATE event_capture_hours SET photos = photos - 1
+            WHERE event_slug = OLD.event_slug AND hour = {_CAPTURE_HOUR.format(row="OLD")};
+            DELETE FROM event_capture_hours WHERE event_slug = OLD.event_slug AND photos <= 0;
+        END
+    """)
+    conn.execute(f"""
+        CREATE TRIGGER photos_usage_insert AFTER INSERT ON photos BEGIN
+            INSERT INTO storage_blobs (event_slug, booth_id, blob, refs)
+            SELECT NEW.event_slug, NEW.booth_id, NEW.blob, 1 WHERE NEW.blob IS NOT NULL
+            ON CONFLICT (event_slug, booth_id, blob) DO UPDATE SET refs = refs + 1;
+            INSERT INTO storage_usage (event_slug, booth_id, bytes, files)
+            VALUES (NEW.event_slug, NEW.booth_id, {_FIRST_LINK_BYTES}, 1)
+            ON CONFLICT (event_slug, booth_id) DO UPDATE SET
+                bytes = bytes + excluded.bytes, files = files + 1;
+            INSERT INTO event_stats (event_slug, bytes) VALUES (NEW.event_slug, {_FIRST_LINK_BYTES})
+            ON CONFLICT (event_slug) DO UPDATE SET bytes = bytes + excluded.bytes;
+        END
+    """)
+    conn.execute(f"""
+        CREATE TRIGGER photos_usage_delete AFTER DELETE ON photos BEGIN
+            UPDATE storage_blobs SET refs = refs - 1 WHERE {_BLOB_MATCH.format(row="OLD")};
+            UPDATE storage_usage SET bytes = bytes - {_LAST_LINK_BYTES}, files = files - 1
+            WHERE event_slug = OLD.event_slug AND booth_id = OLD.booth_id;
+            UPDATE event_stats SET bytes = bytes - {_LAST_LINK_BYTES} WHERE event_slug = OLD.event_slug;
+            DELETE FROM storage_blobs WHERE {_BLOB_MATCH.format(row="OLD")} AND refs <= 0;
+        END
+    """)
+    conn.execute("""
+        CREATE TRIGGER photos_usage_update AFTER UPDATE OF file_size ON photos WHEN OLD.blob IS NULL BEGIN
+            UPDATE storage_usage SET bytes = bytes + NEW.file_size - OLD.file_size
+            WHERE event_slug = OLD.event_slug AND booth_id = OLD.booth_id;
+            UPDATE event_stats SET bytes = bytes + NEW.file_size - OLD.file_size
+            WHERE event_slug = OLD.event_slug;
+        END
+    """)
+
+
+# Ordered schema migrations. PRAGMA user_version records how many have run.
+MIGRATIONS: List[Callable[[sqlite3.Connection], None]] = [
+    _migration_1_base_schema,
+    _migration_2_session_photos,
+    _migration_3_photo_index,
+    _migration_4_retention_index,
+    _migration_5_token_version,
+    _migration_6_cache_events,
+    _migration_7_original_size,
+    _migration_8_storage_usage,
+    _migration_9_listing_indexes,
+    _migration_10_event_stats,
+    _migration_11_session_composite,
+    _migration_12_idempotent_uploads,
+    _migration_13_storage_usage_per_blob,
+    _migration_14_event_bytes_per_blob,
+]
+
+
+class ConnectionPool:
+    """Bounded pool of SQLite connections to a single database file."""
+
+    def __init__(self, db_path: Path, size: int = POOL_SIZE):
+        self.db_path = Path(db_path)
+        self.size = size
+        self._idle: queue.LifoQueue = queue.LifoQueue()
+        self._slots = threading.BoundedSemaphore(size)
+        self._lock = threading.Lock()
+        self._all: List[sqlite3.Connection] = []
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(str(self.db_path), check_same_thread=False)
+        conn.row_factory = sqlite3.Row
+        for pragma in _PRAGMAS:
+            conn.execute(pragma)
+        with self._lock:
+            self._all.append(conn)
+        return conn
+
+    @contextmanager
+    def connection(self):
+        if not self._slots.acquire(timeout=POOL_TIMEOUT_SECONDS):
+            raise TimeoutError("Timed out waiting for a database connection")
+        try:
+            try:
+                conn = self._idle.get_nowait()
+            except queue.Empty:
+                conn = self._connect()
+            try:
+                yield conn
+            finally:
+                if conn.in_transaction:
+                    conn.rollback()
+                self._idle.put(conn)
+        finally:
+            self._slots.release()
+
+    def close(self) -> None:
+        with self._lock:
+            conns, self._all = self._all, []
+        for conn in conns:
+            try:
+                conn.close()
+            except sqlite3.Error:
+                pass
+        self._idle = queue.LifoQueue()
+
+
+_pool: ConnectionPool | None = None
+_pool_lock = threading.Lock()
+
+
+def lock_path(db_path: Path, name: str) -> Path:
+    """Lock file next to the database, shared by every worker process using it."""
+    return db_path.with_name(f".{db_path.name}.{name}.lock")
+
+
+def _migrate(db_path: Path) -> None:
+    """
+    Bring the schema up to date. Runs on a dedicated connection. Workers starting
+    together take turns on a lock file; the version is read only once it is held,
+    so each migration runs exactly once.
+    """
+    db_path.parent.mkdir(parents=True, exist_ok=True)
+    with file_lock(lock_path(db_path, "migrate")):
+        conn = sqlite3.connect(str(db_path))
+        conn.row_factory = sqlite3.Row
+        try:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA busy_timeout=5000")
+            version = conn.execute("PRAGMA user_version").fetchone()[0]
+            for number, migration in enumerate(MIGRATIONS[version:], start=version + 1):
+                with conn:
+                    conn.execute("BEGIN IMMEDIATE")
+                    migration(conn)
+                    conn.execute(f"PRAGMA user_version = {number}")
+                logger.info(f"Applied database migration {number}: {migration.__name__}")
+        finally:
+            conn.close()
+
+
+def init_db() -> ConnectionPool:
+    """Run schema migrations and create the connection pool (idempotent)."""
+    global _pool
+    with _pool_lock:
+        if _pool is not None and _pool.db_path == DB_PATH:
+            return _pool
+        if _pool is not None:
+            _pool.close()
+        _migrate(DB_PATH)
+        _pool = ConnectionPool(DB_PATH)
+        return _pool
+
+
+def close_db() -> None:
+    """Close all pooled connections. The next get_connection re-initializes."""
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.close()
+            _pool = None
+
+
+@contextmanager
+def get_connection():
+    """Borrow a pooled connection. Uncommitted work is rolled back on return."""
+    pool = _pool
+    if pool is None or pool.db_path != DB_PATH:
+        pool = init_db()
+    with pool.connection() as conn:
+        yield conn
+
+
+@contextmanager
+def write_transaction():
+    """
+    Borrow a pooled connection inside BEGIN IMMEDIATE, committing on exit.
+    The write lock is taken up front, so read-modify-write cycles from other
+    threads or worker processes queue behind busy_timeout instead of failing
+    with "database is locked" when a deferred read tries to upgrade. An
+    exception rolls everything back.
+    """
+    with get_connection() as conn:
+        conn.execute("BEGIN IMMEDIATE")
+        yield conn
+        if conn.in_transaction:
+            conn.commit()
@@ -0,0 +1,96 @@
+"""
+Derivative service - resized variants of uploaded photos for galleries and previews.
+Renders run in a background process pool so uploads never wait on image decoding.
+Layout mirrors the original under media_root:
+  media_root/derivatives/{size}/events/{event_slug}/.../{name}.{webp|jpg}
+With DERIVATIVES_ENABLED off no derivatives are produced and originals are served.
+"""
+import logging
+import os
+import threading
+from concurrent.futures import Future
+from pathlib import Path
+from typing import List, Optional
+
+from PIL import Image
+
+from app.config import settings
+from app.utils.process_pool import ProcessPool, open_upright
+
+logger = logging.getLogger(__name__)
+
+DERIVATIVES_DIR = "derivatives"
+# Longest edge in pixels; "full" is the original upload and is not resized
+SIZES = {"thumb": 320, "medium": 1024}
+
+pool = ProcessPool(enabled=lambda: settings.DERIVATIVES_ENABLED, workers=lambda: settings.DERIVATIVE_WORKERS)
+_pending: set = set()
+_pending_lock = threading.Lock()
+
+
+def _extension() -> str:
+    return ".jpg" if settings.DERIVATIVE_FORMAT.lower() in ("jpg", "jpeg") else ".webp"
+
+
+def derivative_path(media_root: Path, rel_path: str, size: str) -> Path:
+    """Location of the `size` variant of the original at media_root/rel_path."""
+    rel = Path(rel_path)
+    return Path(media_root) / DERIVATIVES_DIR / size / rel.with_suffix(_extension())
+
+
+def remove_derivatives(media_root: Path, rel_path: str) -> List[str]:
+    """Delete every size variant of an original. Returns their media-relative paths."""
+    removed = []
+    for size in SIZES:
+        path = derivative_path(media_root, rel_path, size)
+        if path.is_file():
+            path.unlink()
+            removed.append(derivative_path(Path(), rel_path, size).as_posix())
+    return removed
+
+
+def _render(src: str, targets: list, fmt: str, quality: int) -> None:
+    """Process-pool entry point: write each (dest, max_edge) variant of src, largest first."""
+    targets = sorted(targets, key=lambda t: t[1], reverse=True)
+    img = open_upright(src, targets[0][1])
+    if img.mode not in ("RGB", "RGBA"):
+        img = img.convert("RGB")
+    for dest, edge in targets:
+        img.thumbnail((edge, edge), Image.LANCZOS)
+        out = img.convert("RGB") if fmt == "JPEG" else img
+        dest_path = Path(dest)
+        dest_path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = dest_path.with_name(f".{dest_path.name}.part")
+        out.save(tmp_path, fmt, quality=quality, optimize=fmt == "JPEG", method=4)
+        os.replace(tmp_path, dest_path)
+
+
+def _on_done(src: str):
+    def callback(future: Future) -> None:
+        with _pending_lock:
+            _pending.discard(src)
+        if future.exception() is not None:
+            logger.warning(f"Derivative generation failed for {src}: {future.exception()}")
+    return callback
+
+
+def schedule(file_path: str, media_root: str) -> Optional[Future]:
+    """Queue derivative generation for a saved upload. Returns immediately."""
+    if not pool.is_available():
+        return None
+    media_root = Path(media_root).resolve()
+    src = Path(file_path).resolve()
+    try:
+        rel = src.relative_to(media_root).as_posix()
+    except ValueError:
+        logger.warning(f"Not generating derivatives outside media root: {src}")
+        return None
+    targets = [(str(derivative_path(media_root, rel, size)), edge) for size, edge in SIZES.items()]
+    fmt = "JPEG" if _extension() == ".jpg" else "WEBP"
+    with _pending_lock:
+        if str(src) in _pending:
+            return None
+        _pending.add(str(src))
+    future = pool.submit(_render, str(src), targets, fmt, settings.DERIVATIVE_QUALITY)
+    future.add_done_callback(_on_done(str(src)))
+    return future
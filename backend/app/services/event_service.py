@@ -1,13 +1,13 @@
 """
-Event service - manages photobooth events.
+Event service - manages photobooth events and reads their statistics.
 """
-import sqlite3
 import re
-from pathlib import Path
-from typing import List
-from contextlib import contextmanager
+from typing import Dict, List, Optional, Tuple
 
-DB_PATH = Path(__file__).parent.parent.parent / "photobooth.db"
+from app.services.database import get_connection as _get_connection, write_transaction
+
+DEFAULT_PAGE_SIZE = 100
+MAX_PAGE_SIZE = 500
 
 
 def _slugify(name: str) -> str:
@@ -17,41 +17,77 @@ def _slugify(name: str) -> str:
     return s or "event"
 
 
-@contextmanager
-def _get_connection():
-    DB_PATH.parent.mkdir(parents=True, exist_ok=True)
-    conn = sqlite3.connect(str(DB_PATH))
-    conn.row_factory = sqlite3.Row
-    try:
-        conn.execute("""
-            CREATE TABLE IF NOT EXISTS events (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                name TEXT NOT NULL,
-                slug TEXT NOT NULL UNIQUE,
-                created_at TEXT NOT NULL
-            )
-        """)
-        # Ensure onlocation exists
-        conn.execute(
-            "INSERT OR IGNORE INTO events (name, slug, created_at) VALUES (?, ?, datetime('now'))",
-            ("On Location", "onlocation"),
+def _encode_cursor(name: str, event_id: int) -> str:
+    return f"{event_id}.{name}"
+
+
+def _decode_cursor(cursor: str) -> Tuple[str, int]:
+    # Names may contain anything, so the id goes first
+    event_id, _, name = cursor.partition(".")
+    return name, int(event_id)
+
+
+def _event_row(r) -> dict:
+    return {"id": r["id"], "name": r["name"], "slug": r["slug"], "created_at": r["created_at"]}
+
+
+def _attach_stats(conn, events: List[dict]) -> None:
+    """Add event_stats and the capture-hour histogram: two indexed lookups per page."""
+    if not events:
+        return
+    slugs = [e["slug"] for e in events]
+    marks = ", ".join("?" * len(slugs))
+    totals = {
+        r["event_slug"]: r for r in conn.execute(
+            f"SELECT event_slug, sessions, photos, bytes FROM event_stats WHERE event_slug IN ({marks})", slugs
         )
-        conn.commit()
-        yield conn
-    finally:
-        conn.close()
+    }
+    hours: Dict[str, list] = {slug: [] for slug in slugs}
+    for r in conn.execute(
+        f"SELECT event_slug, hour, photos FROM event_capture_hours WHERE event_slug IN ({marks}) "
+        "ORDER BY event_slug, hour",
+        slugs,
+    ):
+        hours[r["event_slug"]].append({"hour": r["hour"], "photos": r["photos"]})
+    for event in events:
+        row = totals.get(event["slug"])
+        event["stats"] = {
+            "sessions": row["sessions"] if row else 0,
+            "photos": row["photos"] if row else 0,
+            "bytes": row["bytes"] if row else 0,
+            "hourly": hours[event["slug"]],
+        }
+
 
+def list_events(cursor: Optional[str] = None, limit: int = DEFAULT_PAGE_SIZE) -> dict:
+    """
+    One page of events by name, read from the (name, id) index. Each event
+    carries its "stats": live sessions, indexed photos and bytes, and photos per
+    UTC capture hour, read from tables the database keeps current on every write.
 
-def list_events() -> List[dict]:
-    """List all events."""
+    Returns:
+        {"events": [...], "next_cursor": str or None}
+
+    Raises:
+        ValueError: If cursor is malformed
+    """
+    limit = max(1, min(limit, MAX_PAGE_SIZE))
+    where, params = "", []
+    if cursor:
+        where = "WHERE (name, id) > (?, ?)"
+        params.extend(_decode_cursor(cursor))
     with _get_connection() as conn:
         rows = conn.execute(
-            "SELECT id, name, slug, created_at FROM events ORDER BY name"
+            f"SELECT id, name, slug, created_at FROM events {where} ORDER BY name, id LIMIT ?",
+            (*params, limit + 1),
         ).fetchall()
-        return [
-            {"id": r["id"], "name": r["name"], "slug": r["slug"], "created_at": r["created_at"]}
-            for r in rows
-        ]
+        next_cursor = None
+        if len(rows) > limit:
+            rows = rows[:limit]
+            next_cursor = _encode_cursor(rows[-1]["name"], rows[-1]["id"])
+        events = [_event_row(r) for r in rows]
+        _attach_stats(conn, events)
+    return {"events": events, "next_cursor": next_cursor}
 
 
 def create_event(name: str) -> dict:
@@ -59,7 +95,8 @@ def create_event(name: str) -> dict:
     slug = _slugify(name)
     if not slug:
         slug = "event"
-    with _get_connection() as conn:
+    # Write lock first, so two workers creating "Wedding" can't both pick the same slug
+    with write_transaction() as conn:
         # Ensure slug is unique
         base_slug = slug
         n = 0
@@ -70,11 +107,10 @@ def create_event(name: str) -> dict:
             "INSERT INTO events (name, slug, created_at) VALUES (?, ?, datetime('now'))",
             (name, slug),
         )
-        conn.commit()
         row = conn.execute(
             "SELECT id, name, slug, created_at FROM events WHERE slug = ?", (slug,)
         ).fetchone()
-        return {"id": row["id"], "name": row["name"], "slug": row["slug"], "created_at": row["created_at"]}
+        return _event_row(row)
 
 
 def get_event_by_slug(slug: str) -> dict | None:
@@ -84,5 +120,5 @@ def get_event_by_slug(slug: str) -> dict | None:
             "SELECT id, name, slug, created_at FROM events WHERE slug = ?", (slug,)
         ).fetchone()
         if row:
-            return {"id": row["id"], "name": row["name"], "slug": row["slug"], "created_at": row["created_at"]}
+            return _event_row(row)
         return None
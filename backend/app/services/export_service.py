@@ -0,0 +1,102 @@
+"""
+Export service - ZIP archives of an event's photos, streamed straight from disk.
+Files are collected from the upload layout (events/{event_slug}/{booth_id}/{session_id}/)
+and stored uncompressed (JPEGs don't shrink) with a manifest.json of sessions.
+The archive layout is deterministic for unchanged files, so downloads can be
+resumed with HTTP Range requests.
+"""
+import json
+import os
+import re
+from datetime import date, datetime, time, timedelta
+from pathlib import Path
+from typing import List, Optional
+
+from app.config import settings
+from app.services import session_service
+from app.services.photo_index import PHOTO_EXTENSIONS
+from app.services.storage_service import StorageService
+from app.utils.zipstream import ZipArchive, ZipEntry
+
+MANIFEST_NAME = "manifest.json"
+_SLUG = re.compile(r"[\w-]+")
+
+
+def _collect(event_dir: Path, since: Optional[float], until: Optional[float]) -> List[tuple]:
+    """(rel_path, path, stat) for photo files below event_dir, filtered by mtime."""
+    found = []
+    stack = [event_dir]
+    while stack:
+        current = stack.pop()
+        try:
+            entries = list(os.scandir(current))
+        except OSError:
+            continue
+        for entry in entries:
+            if entry.name.startswith("."):
+                continue  # in-flight .part files
+            if entry.is_dir(follow_symlinks=False):
+                stack.append(Path(entry.path))
+            elif entry.is_file(follow_symlinks=False) and Path(entry.name).suffix.lower() in PHOTO_EXTENSIONS:
+                st = entry.stat()
+                if (since is None or st.st_mtime >= since) and (until is None or st.st_mtime < until):
+                    path = Path(entry.path)
+                    found.append((path.relative_to(event_dir).as_posix(), path, st))
+    found.sort(key=lambda f: f[0])
+    return found
+
+
+def _manifest(event_slug: str, files: List[tuple], since: Optional[date], until: Optional[date]) -> bytes:
+    sessions_by_id = {s["id"]: s for s in session_service.list_sessions_for_event(event_slug)}
+    sessions = {}
+    for rel_path, _, st in files:
+        parts = rel_path.split("/")
+        # {booth_id}/{session_id}/{filename}; anything else is listed without a session
+        booth_id, session_id = (parts[0], parts[1]) if len(parts) == 3 else (None, None)
+        group = sessions.setdefault(session_id, {
+            "session_id": session_id,
+            "booth_id": booth_id,
+            "created_at": None,
+            "photos": [],
+        })
+        if session_id in sessions_by_id:
+            group["created_at"] = sessions_by_id[session_id]["created_at"].isoformat()
+        group["photos"].append({"name": f"{event_slug}/{rel_path}", "size": st.st_size})
+    manifest = {
+        "event_slug": event_slug,
+        "since": since.isoformat() if since else None,
+        "until": until.isoformat() if until else None,
+        "photo_count": len(files),
+        "sessions": list(sessions.values()),
+    }
+    return json.dumps(manifest, indent=2).encode("utf-8")
+
+
+def build_event_archive(
+    media_root: str,
+    event_slug: str,
+    since: Optional[date] = None,
+    until: Optional[date] = None,
+) -> ZipArchive:
+    """
+    Plan a ZIP of an event's photos, optionally limited to files modified
+    between since and until (inclusive, local dates). Blocking (directory walk).
+
+    Raises:
+        ValueError: If event_slug is not a valid slug
+    """
+    if not _SLUG.fullmatch(event_slug):
+        raise ValueError("Invalid event slug")
+    storage = StorageService(media_root=media_root, retention_days=settings.DATA_RETENTION_DAYS)
+    event_dir = storage._get_upload_dir(event_slug)
+    since_ts = datetime.combine(since, time.min).timestamp() if since else None
+    until_ts = datetime.combine(until + timedelta(days=1), time.min).timestamp() if until else None
+    files = _collect(event_dir, since_ts, until_ts)
+
+    entries = [ZipEntry.from_file(f"{event_slug}/{rel}", path, st) for rel, path, st in files]
+    # Newest photo's mtime, so an unchanged event always yields byte-identical archives
+    manifest_mtime = max((st.st_mtime for _, _, st in files), default=0)
+    entries.insert(0, ZipEntry.from_bytes(
+        f"{event_slug}/{MANIFEST_NAME}", _manifest(event_slug, files, since, until), manifest_mtime
+    ))
+    return ZipArchive(entries)
@@ -0,0 +1,110 @@
+"""
+Gallery cache - rendered gallery pages, pre-compressed, keyed by session and token.
+A QR code on a big screen is scanned by many phones at once; after the first
+hit the page is served from memory with an ETag instead of a DB query and
+re-render. session_service invalidates entries whenever a session changes.
+"""
+import gzip
+import hashlib
+import threading
+from collections import OrderedDict
+from datetime import datetime
+from typing import Optional
+
+try:
+    import brotli
+except ImportError:  # pragma: no cover - optional dependency
+    brotli = None
+
+MAX_ENTRIES = 1024
+
+
+class GalleryPage:
+    """One rendered gallery with its compressed bodies and validators."""
+
+    __slots__ = ("expires_at", "etag", "bodies")
+
+    def __init__(self, html: str, expires_at: datetime):
+        raw = html.encode("utf-8")
+        digest = hashlib.sha256(raw).hexdigest()[:20]
+        self.expires_at = expires_at
+        self.etag = f'"{digest}"'
+        # content-coding -> body; each coding gets its own strong ETag suffix.
+        # Mid levels: a burst of first scans compresses the same page several
+        # times, and the top levels cost far more for a few percent on HTML.
+        self.bodies = {"identity": raw, "gzip": gzip.compress(raw, compresslevel=6, mtime=0)}
+        if brotli is not None:
+            self.bodies["br"] = brotli.compress(raw, quality=5)
+
+    def etag_for(self, coding: str) -> str:
+        return self.etag if coding == "identity" else f'{self.etag[:-1]}-{coding}"'
+
+    def matches(self, if_none_match: str) -> bool:
+        tags = {tag.strip().removeprefix("W/") for tag in if_none_match.split(",")}
+        return "*" in tags or any(self.etag_for(c) in tags for c in self.bodies)
+
+    def negotiate(self, accept_encoding: str) -> str:
+        accepted = {
+            part.split(";")[0].strip().lower()
+            for part in accept_encoding.split(",")
+            if not part.strip().endswith(";q=0")
+        }
+        for coding in ("br", "gzip"):
+            if coding in accepted and coding in self.bodies:
+                return coding
+        return "identity"
+
+
+class GalleryCache:
+    """Bounded LRU of rendered galleries keyed by (session_id, token)."""
+
+    def __init__(self, max_entries: int = MAX_ENTRIES):
+        self.max_entries = max_entries
+        self._pages: "OrderedDict[tuple, GalleryPage]" = OrderedDict()
+        self._lock = threading.Lock()
+        # Bumped on every invalidation; a render that started before one is not stored
+        self._epoch = 0
+        self.hits = 0
+        self.misses = 0
+
+    @property
+    def epoch(self) -> int:
+        return self._epoch
+
+    def get(self, session_id: str, token: str) -> Optional[GalleryPage]:
+        key = (session_id, token)
+        with self._lock:
+            page = self._pages.get(key)
+            if page is None or datetime.utcnow() > page.expires_at:
+                self._pages.pop(key, None)
+                self.misses += 1
+                return None
+            self._pages.move_to_end(key)
+            self.hits += 1
+            return page
+
+    def put(self, session_id: str, token: str, html: str, expires_at: datetime, epoch: int) -> GalleryPage:
+        """Cache a rendered page, unless a session changed since `epoch` was read."""
+        page = GalleryPage(html, expires_at)
+        with self._lock:
+            if epoch != self._epoch:
+                return page
+            self._pages[(session_id, token)] = page
+            self._pages.move_to_end((session_id, token))
+            while len(self._pages) > self.max_entries:
+                self._pages.popitem(last=False)
+        return page
+
+    def invalidate(self, session_id: str) -> None:
+        """Drop every cached page for a session (all token versions)."""
+        with self._lock:
+            self._epoch += 1
+            for key in [k for k in self._pages if k[0] == session_id]:
+                del self._pages[key]
+
+    def clear(self) -> None:
+        with self._lock:
+            self._pages.clear()
+
+
+gallery_cache = GalleryCache()
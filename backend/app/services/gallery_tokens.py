@@ -0,0 +1,120 @@
+"""
+Gallery tokens - HMAC-signed gallery links verified in memory.
+A token encodes the session id, its expiry and a token version:
+    base64url("{session_id}.{version}.{expires_unix}") + "." + base64url(hmac_sha256)[:22]
+Forged, mismatched or expired links are rejected without touching the database.
+Tokens issued before signing existed (plain token_urlsafe strings, no ".")
+carry no claims; they are accepted only for the sessions that were issued
+one (see session_service._has_legacy_token) and checked against the row.
+Regenerating a link bumps the version; regenerate and delete feed a small
+revocation cache so superseded tokens are refused in memory as well. The
+database stays the source of truth (the session row holds the current token).
+"""
+import base64
+import binascii
+import hashlib
+import hmac
+import threading
+import time
+from datetime import datetime, timezone
+from typing import Dict, NamedTuple, Optional, Tuple
+
+from app.services.metrics import GALLERY_TOKEN_REJECTIONS
+from app.services.settings_store import get_token_secret
+
+SIGNATURE_LENGTH = 22  # base64 characters, 132 bits
+ALL_VERSIONS = float("inf")
+
+
+class TokenClaims(NamedTuple):
+    session_id: str
+    version: int
+    expires_at: datetime
+
+
+def _b64encode(data: bytes) -> str:
+    return base64.urlsafe_b64encode(data).rstrip(b"=").decode("ascii")
+
+
+def _b64decode(text: str) -> bytes:
+    return base64.urlsafe_b64decode(text + "=" * (-len(text) % 4))
+
+
+def _signature(payload: str) -> str:
+    digest = hmac.new(get_token_secret(), payload.encode("utf-8"), hashlib.sha256).digest()
+    return _b64encode(digest)[:SIGNATURE_LENGTH]
+
+
+def issue(session_id: str, version: int, expires_at: datetime) -> str:
+    """Signed token for a session link. expires_at is naive UTC, as stored on sessions."""
+    expires_unix = int(expires_at.replace(tzinfo=timezone.utc).timestamp())
+    payload = _b64encode(f"{session_id}.{version}.{expires_unix}".encode("utf-8"))
+    return f"{payload}.{_signature(payload)}"
+
+
+class RevocationCache:
+    """
+    Per-session minimum valid token version. Entries are only needed until the
+    tokens they reject would have expired anyway, so the cache stays small.
+    """
+
+    def __init__(self):
+        # session_id -> (first valid version, drop entry after unix time)
+        self._entries: Dict[str, Tuple[float, float]] = {}
+        self._lock = threading.Lock()
+
+    def revoke(self, session_id: str, below_version: float, until: datetime) -> None:
+        until_unix = until.replace(tzinfo=timezone.utc).timestamp()
+        now = time.time()
+        with self._lock:
+            previous = self._entries.get(session_id)
+            if previous is not None:
+                below_version = max(below_version, previous[0])
+                until_unix = max(until_unix, previous[1])
+            self._entries[session_id] = (below_version, until_unix)
+            for key in [k for k, (_, expiry) in self._entries.items() if expiry < now]:
+                del self._entries[key]
+
+    def is_revoked(self, session_id: str, version: int) -> bool:
+        entry = self._entries.get(session_id)
+        return entry is not None and version < entry[0]
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+revocations = RevocationCache()
+
+
+def _reject(reason: str) -> None:
+    GALLERY_TOKEN_REJECTIONS.inc(reason=reason)
+    return None
+
+
+def is_signed(token: str) -> bool:
+    """Whether a token has the signed format; legacy tokens never contain a dot."""
+    return "." in token
+
+
+def verify(session_id: str, token: str) -> Optional[TokenClaims]:
+    """Claims of a valid, unexpired, unrevoked token for session_id; None otherwise. No I/O."""
+    payload, _, signature = token.partition(".")
+    if not payload or not hmac.compare_digest(signature.encode(), _signature(payload).encode()):
+        return _reject("signature")
+    try:
+        token_session, version, expires_unix = _b64decode(payload).decode("utf-8").rsplit(".", 2)
+        version, expires_unix = int(version), int(expires_unix)
+    except (binascii.Error, UnicodeDecodeError, ValueError):
+        return _reject("malformed")
+    if not hmac.compare_digest(token_session.encode(), session_id.encode()):
+        return _reject("session")
+    if expires_unix <= time.time():
+        return _reject("expired")
+    if revocations.is_revoked(session_id, version):
+        return _reject("revoked")
+    expires_at = datetime.fromtimestamp(expires_unix, tz=timezone.utc).replace(tzinfo=None)
+    return TokenClaims(session_id, version, expires_at)
@@ -0,0 +1,57 @@
+"""
+Health service - readiness checks for the database and media storage.
+"""
+import shutil
+import tempfile
+from pathlib import Path
+
+from app.config import settings
+from app.services.database import get_connection
+from app.services.settings_store import get_settings
+
+
+def _check_database() -> dict:
+    try:
+        with get_connection() as conn:
+            conn.execute("SELECT 1").fetchone()
+        return {"ok": True}
+    except Exception as e:
+        return {"ok": False, "error": str(e)}
+
+
+def _check_media_root(media_root: Path) -> dict:
+    try:
+        media_root.mkdir(parents=True, exist_ok=True)
+        with tempfile.NamedTemporaryFile(dir=media_root, prefix=".health-"):
+            pass
+        return {"ok": True, "path": str(media_root)}
+    except OSError as e:
+        return {"ok": False, "path": str(media_root), "error": str(e)}
+
+
+def _check_free_space(media_root: Path) -> dict:
+    min_free = settings.HEALTH_MIN_FREE_MB * 1024 * 1024
+    try:
+        usage = shutil.disk_usage(media_root)
+    except OSError as e:
+        return {"ok": False, "error": str(e)}
+    return {
+        "ok": usage.free >= min_free,
+        "free_bytes": usage.free,
+        "total_bytes": usage.total,
+        "min_free_bytes": min_free,
+    }
+
+
+def check_readiness() -> dict:
+    """Run all checks. Blocking; call from a worker thread."""
+    media_root = Path(get_settings()["media_root"])
+    checks = {
+        "database": _check_database(),
+        "media_root_writable": _check_media_root(media_root),
+        "free_space": _check_free_space(media_root),
+    }
+    return {
+        "status": "healthy" if all(c["ok"] for c in checks.values()) else "unhealthy",
+        "checks": checks,
+    }
@@ -0,0 +1,133 @@
+"""
+Media cache - bounded LRU of resolved paths, stat results and small file bodies.
+A QR code on a big screen sends a crowd of phones to the same few photos;
+those requests are answered from memory instead of resolve/stat/open per hit.
+Entries are re-validated against the file's mtime and size every STAT_TTL_SECONDS.
+"""
+import os
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+from typing import Optional
+
+from app.utils.http_cache import http_date, make_etag
+
+MAX_ENTRIES = 4096
+MAX_BODY_BYTES = 64 * 1024 * 1024
+SMALL_FILE_LIMIT = 512 * 1024
+STAT_TTL_SECONDS = 2.0
+
+
+class MediaEntry:
+    """Cached metadata (and optionally bytes) for one file under the media root."""
+
+    __slots__ = ("path", "stat", "etag", "last_modified", "body", "checked_at")
+
+    def __init__(self, path: Path, stat: os.stat_result, body: Optional[bytes]):
+        self.path = path
+        self.stat = stat
+        self.etag = make_etag(stat.st_size, stat.st_mtime_ns)
+        self.last_modified = http_date(stat.st_mtime)
+        self.body = body
+        self.checked_at = time.monotonic()
+
+
+class MediaCache:
+    """LRU keyed by (media_root, relative path)."""
+
+    def __init__(
+        self,
+        max_entries: int = MAX_ENTRIES,
+        max_body_bytes: int = MAX_BODY_BYTES,
+        small_file_limit: int = SMALL_FILE_LIMIT,
+    ):
+        self.max_entries = max_entries
+        self.max_body_bytes = max_body_bytes
+        self.small_file_limit = small_file_limit
+        self._entries: "OrderedDict[tuple, MediaEntry]" = OrderedDict()
+        self._body_bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, media_root: Path, rel_path: str) -> Optional[MediaEntry]:
+        """Return a fresh entry without touching the disk, or None."""
+        key = (media_root, rel_path)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or time.monotonic() - entry.checked_at > STAT_TTL_SECONDS:
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry
+
+    def load(self, media_root: Path, rel_path: str) -> Optional[MediaEntry]:
+        """
+        Resolve, stat and (for small files) read a file, caching the result. Blocking.
+
+        Returns:
+            The entry, or None if the path is not a regular file
+
+        Raises:
+            PermissionError: If the path resolves outside media_root
+        """
+        file_path = (media_root / rel_path).resolve()
+        if not file_path.is_relative_to(media_root):
+            raise PermissionError(rel_path)
+        key = (media_root, rel_path)
+        try:
+            st = file_path.stat()
+        except OSError:
+            self.discard(key)
+            return None
+        if not os.path.isfile(file_path):
+            return None
+
+        with self._lock:
+            self.misses += 1
+            old = self._entries.get(key)
+            if old is not None and (old.stat.st_mtime_ns, old.stat.st_size) == (st.st_mtime_ns, st.st_size):
+                old.checked_at = time.monotonic()
+                self._entries.move_to_end(key)
+                return old
+
+        body = None
+        if st.st_size <= self.small_file_limit:
+            try:
+                body = file_path.read_bytes()
+            except OSError:
+                return None
+            if len(body) != st.st_size:
+                body = None  # Changed while reading; serve from disk this time
+        entry = MediaEntry(file_path, st, body)
+        with self._lock:
+            self._remove(key)
+            self._entries[key] = entry
+            self._body_bytes += len(body or b"")
+            while len(self._entries) > self.max_entries or self._body_bytes > self.max_body_bytes:
+                self._remove(next(iter(self._entries)))
+        return entry
+
+    def discard(self, key: tuple) -> None:
+        with self._lock:
+            self._remove(key)
+
+    def forget(self, rel_path: str) -> None:
+        """Drop a file from the cache under every media root, e.g. after deletion."""
+        with self._lock:
+            for key in [k for k in self._entries if k[1] == rel_path]:
+                self._remove(key)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._body_bytes = 0
+
+    def _remove(self, key: tuple) -> None:
+        entry = self._entries.pop(key, None)
+        if entry is not None and entry.body is not None:
+            self._body_bytes -= len(entry.body)
+
+
+media_cache = MediaCache()
@@ -0,0 +1,240 @@
+"""
+Metrics - in-process counters, gauges and histograms in Prometheus text format.
+Deliberately dependency-free; services record into the module-level metrics
+below and GET /metrics renders REGISTRY.
+"""
+import functools
+import math
+import threading
+import time
+from typing import Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+# Seconds; tuned for a mini PC where most requests finish in a few ms
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+LabelValues = Tuple[str, ...]
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    parts = [f'{n}="{_escape(str(v))}"' for n, v in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+def _format_value(value: float) -> str:
+    if math.isinf(value):
+        return "+Inf" if value > 0 else "-Inf"
+    return repr(float(value)) if not float(value).is_integer() else str(int(value))
+
+
+class Metric:
+    """Base class: a named metric family with optional labels."""
+
+    type = "untyped"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Sequence[str] = (),
+        callback: Optional[Callable[[], Iterable[Tuple[LabelValues, float]]]] = None,
+    ):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.callback = callback
+        self._values: Dict[LabelValues, float] = {}
+        self._lock = threading.Lock()
+
+    def _key(self, labels: dict) -> LabelValues:
+        return tuple(str(labels.get(n, "")) for n in self.labelnames)
+
+    def samples(self) -> List[str]:
+        if self.callback is not None:
+            items = list(self.callback())
+        else:
+            with self._lock:
+                items = list(self._values.items())
+        return [
+            f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}"
+            for key, value in items
+        ]
+
+    def render(self) -> str:
+        header = f"# HELP {self.name} {self.documentation}\n# TYPE {self.name} {self.type}\n"
+        return header + "".join(f"{line}\n" for line in self.samples())
+
+
+class Counter(Metric):
+    type = "counter"
+
+    def inc(self, amount: float = 1, **labels) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels) -> float:
+        return self._values.get(self._key(labels), 0)
+
+
+class Gauge(Counter):
+    type = "gauge"
+
+    def set(self, value: float, **labels) -> None:
+        with self._lock:
+            self._values[self._key(labels)] = value
+
+    def dec(self, amount: float = 1, **labels) -> None:
+        self.inc(-amount, **labels)
+
+
+class Histogram(Metric):
+    type = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets)) + (math.inf,)
+        # label values -> [bucket counts..., sum, count]
+        self._series: Dict[LabelValues, list] = {}
+
+    def observe(self, value: float, **labels) -> None:
+        key = self._key(labels)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [0] * len(self.buckets) + [0.0, 0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series[i] += 1
+                    break
+            series[-2] += value
+            series[-1] += 1
+
+    def count(self, **labels) -> int:
+        series = self._series.get(self._key(labels))
+        return series[-1] if series else 0
+
+    def time(self, **labels):
+        """Decorator recording the wall time of each call."""
+        def decorator(fn):
+            @functools.wraps(fn)
+            def wrapper(*args, **kwargs):
+                start = time.perf_counter()
+                try:
+                    return fn(*args, **kwargs)
+                finally:
+                    self.observe(time.perf_counter() - start, **labels)
+            return wrapper
+        return decorator
+
+    def samples(self) -> List[str]:
+        with self._lock:
+            items = [(k, list(v)) for k, v in self._series.items()]
+        lines = []
+        for key, series in items:
+            cumulative = 0
+            for bound, count in zip(self.buckets, series):
+                cumulative += count
+                le = f'le="{_format_value(bound)}"'
+                lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, key, le)} {cumulative}")
+            labels = _format_labels(self.labelnames, key)
+            lines.append(f"{self.name}_sum{labels} {_format_value(series[-2])}")
+            lines.append(f"{self.name}_count{labels} {series[-1]}")
+        return lines
+
+
+class Registry:
+    def __init__(self):
+        self._metrics: Dict[str, Metric] = {}
+        self._lock = threading.Lock()
+
+    def register(self, metric: Metric) -> Metric:
+        with self._lock:
+            if metric.name in self._metrics:
+                raise ValueError(f"Duplicate metric: {metric.name}")
+            self._metrics[metric.name] = metric
+        return metric
+
+    def render(self) -> str:
+        with self._lock:
+            metrics = list(self._metrics.values())
+        return "".join(m.render() for m in metrics)
+
+
+REGISTRY = Registry()
+
+HTTP_REQUEST_SECONDS = REGISTRY.register(Histogram(
+    "photobooth_http_request_duration_seconds",
+    "HTTP request latency by route template, method and status.",
+    ("route", "method", "status"),
+))
+HTTP_IN_FLIGHT = REGISTRY.register(Gauge(
+    "photobooth_http_requests_in_flight",
+    "HTTP requests currently being processed.",
+))
+DB_QUERY_SECONDS = REGISTRY.register(Histogram(
+    "photobooth_db_operation_duration_seconds",
+    "Time spent in session_service database operations.",
+    ("operation",),
+))
+STORAGE_BYTES_WRITTEN = REGISTRY.register(Counter(
+    "photobooth_storage_bytes_written_total",
+    "Bytes written to the media root by StorageService.",
+))
+STORAGE_FILES_WRITTEN = REGISTRY.register(Counter(
+    "photobooth_storage_files_written_total",
+    "Files written to the media root by StorageService.",
+))
+STORAGE_BYTES_DEDUPLICATED = REGISTRY.register(Counter(
+    "photobooth_storage_bytes_deduplicated_total",
+    "Upload bytes not stored again because identical content already existed.",
+))
+STORAGE_BYTES_EVICTED = REGISTRY.register(Counter(
+    "photobooth_storage_bytes_evicted_total",
+    "Bytes freed by the storage watchdog, by kind (regenerable, expired_sessions).",
+    ("kind",),
+))
+GALLERY_TOKEN_REJECTIONS = REGISTRY.register(Counter(
+    "photobooth_gallery_token_rejections_total",
+    "Gallery links refused in memory, before any database access.",
+    ("reason",),
+))
+UPLOAD_NORMALIZE_SECONDS = REGISTRY.register(Histogram(
+    "photobooth_upload_normalize_duration_seconds",
+    "Time to re-encode an upload (queueing included) by outcome.",
+    ("outcome",),
+))
+UPLOAD_NORMALIZE_BYTES = REGISTRY.register(Counter(
+    "photobooth_upload_normalize_bytes_total",
+    "Upload sizes before (original) and after (final) normalization.",
+    ("stage",),
+))
+UPLOAD_FSYNC_BATCH_SIZE = REGISTRY.register(Histogram(
+    "photobooth_upload_fsync_batch_size",
+    "Uploads made durable by one flush of the upload journal.",
+    buckets=(1, 2, 4, 8, 16, 32),
+))
+UPLOAD_JOURNAL_RECOVERED = REGISTRY.register(Counter(
+    "photobooth_upload_journal_recovered_total",
+    "Journaled uploads found at startup, by outcome (committed, finished, rolled_back, failed).",
+    ("outcome",),
+))
+UPLOAD_ADMISSION_WAIT_SECONDS = REGISTRY.register(Histogram(
+    "photobooth_upload_admission_wait_seconds",
+    "Time uploads spent queued for the in-flight upload budget.",
+))
+UPLOAD_REJECTIONS = REGISTRY.register(Counter(
+    "photobooth_upload_rejections_total",
+    "Uploads refused by admission control, by reason (too_large, queue_full, timeout).",
+    ("reason",),
+))
+COMPOSITE_RENDER_SECONDS = REGISTRY.register(Histogram(
+    "photobooth_composite_render_duration_seconds",
+    "Time to render a session composite (queueing included) by template.",
+    ("template",),
+))
@@ -0,0 +1,131 @@
+"""
+Normalize service - re-encodes uploads before they are stored.
+Canvas captures arrive as large, barely compressed JPEGs, and photos from other
+clients can carry EXIF (GPS position, device serials) that must not outlive a
+GDPR request. With NORMALIZE_UPLOADS each upload is decoded in a process pool,
+rotated upright from its EXIF orientation, optionally downscaled, and written
+back as a progressive, Huffman-optimized JPEG (or WebP) with no metadata
+except the colour profile. A size budget steps the quality down until the
+photo fits. Workers read the upload from disk, so it is never held in memory.
+"""
+import asyncio
+import io
+import logging
+import os
+import shutil
+import tempfile
+import time
+from pathlib import Path
+from typing import BinaryIO, Optional, Tuple
+
+from PIL import Image
+
+from app.config import settings
+from app.services.metrics import UPLOAD_NORMALIZE_BYTES, UPLOAD_NORMALIZE_SECONDS
+from app.utils.process_pool import ProcessPool, open_upright
+
+logger = logging.getLogger(__name__)
+
+MIN_QUALITY = 50
+QUALITY_STEP = 5
+
+pool = ProcessPool(enabled=lambda: settings.NORMALIZE_UPLOADS, workers=lambda: settings.NORMALIZE_WORKERS)
+
+
+def _format() -> Tuple[str, str]:
+    """(Pillow format, file extension) for normalized uploads."""
+    return ("WEBP", ".webp") if settings.NORMALIZE_FORMAT.lower() == "webp" else ("JPEG", ".jpg")
+
+
+def _flatten(img, fmt: str):
+    """Drop alpha for JPEG (onto white, as the photo would be printed); keep it for WebP."""
+    if img.mode in ("RGB", "L"):
+        return img
+    if img.mode == "P":
+        img = img.convert("RGBA")
+    if "A" not in img.getbands():
+        return img.convert("RGB")
+    if fmt == "WEBP":
+        return img.convert("RGBA")
+    background = Image.new("RGB", img.size, "white")
+    background.paste(img.convert("RGBA"), mask=img.getchannel("A"))
+    return background
+
+
+def _normalize(path: str, fmt: str, quality: int, max_edge: int, max_bytes: int) -> bytes:
+    """Process-pool entry point: upright, metadata-free re-encode of the image at path."""
+    img = open_upright(path, max_edge)
+    icc_profile = img.info.get("icc_profile")
+    if img.mode == "CMYK":
+        icc_profile = None  # a CMYK profile doesn't describe the converted RGB pixels
+    if max_edge:
+        img.thumbnail((max_edge, max_edge), Image.LANCZOS)
+    img = _flatten(img, fmt)
+    # Only what is passed here is written: EXIF, XMP and comments are left behind
+    options = {"icc_profile": icc_profile} if icc_profile else {}
+    if fmt == "JPEG":
+        options.update(optimize=True, progressive=True)
+    else:
+        options.update(method=4)
+    while True:
+        out = io.BytesIO()
+        img.save(out, fmt, quality=quality, **options)
+        if not max_bytes or out.tell() <= max_bytes or quality <= MIN_QUALITY:
+            return out.getvalue()
+        quality = max(MIN_QUALITY, quality - QUALITY_STEP)
+
+
+def _spool(source: BinaryIO) -> Tuple[str, int, bool]:
+    """
+    A path the pool can read the source from: the source's own file when it has
+    one (a resumable upload's data), else a temp copy streamed from it.
+    Returns (path, size, whether the path is a temp copy). Blocking.
+    """
+    name = getattr(source, "name", None)
+    if isinstance(name, str) and os.path.isfile(name):
+        return name, os.path.getsize(name) - source.tell(), False
+    fd, path = tempfile.mkstemp(suffix=".upload")
+    with os.fdopen(fd, "wb") as out:
+        shutil.copyfileobj(source, out)
+        return path, out.tell(), True
+
+
+async def normalize(source: BinaryIO, filename: str) -> Tuple[BinaryIO, str, Optional[int]]:
+    """
+    Re-encode an upload off the event loop.
+
+    Returns:
+        (normalized file, filename with the new extension, original size), or
+        (source rewound, filename, None) if the upload couldn't be decoded
+
+    Raises:
+        ValueError: If the source is empty
+    """
+    start = await asyncio.to_thread(source.tell)
+    path, size, is_copy = await asyncio.to_thread(_spool, source)
+    try:
+        if not size:
+            raise ValueError("Empty file")
+        fmt, ext = _format()
+        started = time.perf_counter()
+        try:
+            normalized = await asyncio.wrap_future(pool.submit(
+                _normalize,
+                path,
+                fmt,
+                settings.NORMALIZE_QUALITY,
+                settings.NORMALIZE_MAX_EDGE,
+                settings.NORMALIZE_MAX_KB * 1024,
+            ))
+        except Exception as e:
+            logger.warning(f"Could not normalize upload {filename}, storing as received: {e}")
+            UPLOAD_NORMALIZE_SECONDS.observe(time.perf_counter() - started, outcome="failed")
+            await asyncio.to_thread(source.seek, start)
+            return source, filename, None
+    finally:
+        if is_copy:
+            os.unlink(path)
+    UPLOAD_NORMALIZE_SECONDS.observe(time.perf_counter() - started, outcome="normalized")
+    UPLOAD_NORMALIZE_BYTES.inc(size, stage="original")
+    UPLOAD_NORMALIZE_BYTES.inc(len(normalized), stage="final")
+    return io.BytesIO(normalized), Path(filename).with_suffix(ext).name, size
@@ -0,0 +1,265 @@
+"""
+Photo index - database record of every photo file under media_root/events/.
+Uploads are recorded as they are written, so event photo listings are
+paginated index queries instead of recursive directory scans.
+reconcile_event() picks up files copied in or removed out-of-band.
+"""
+import logging
+import os
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from PIL import Image
+
+from app.services.database import get_connection as _get_connection, write_transaction
+from app.services.storage_service import CONTENT_NAME
+
+logger = logging.getLogger(__name__)
+
+PHOTO_EXTENSIONS = {".jpg", ".jpeg", ".png", ".webp"}
+DEFAULT_PAGE_SIZE = 100
+MAX_PAGE_SIZE = 500
+# Rows written per transaction while reconciling; the write lock is released in between
+RECONCILE_BATCH_SIZE = 200
+
+
+def read_dimensions(path: Path) -> Tuple[Optional[int], Optional[int]]:
+    """Width and height from the image header (no full decode), or (None, None)."""
+    try:
+        with Image.open(path) as im:
+            return im.size
+    except Exception:
+        return None, None
+
+
+def _session_from_rel(rel_path: str) -> Optional[str]:
+    # events/{event_slug}/{booth_id}/{session_id}/{filename}
+    parts = rel_path.split("/")
+    return parts[3] if len(parts) == 5 else None
+
+
+def _booth_from_rel(rel_path: str) -> str:
+    parts = rel_path.split("/")
+    return parts[2] if len(parts) == 5 else ""
+
+
+def _blob_from_rel(rel_path: str) -> Optional[str]:
+    # Content-addressed uploads are hardlinks named after the blob they share
+    name = rel_path.rsplit("/", 1)[-1]
+    return name if CONTENT_NAME.match(name) else None
+
+
+def describe_photo(media_root: Path, file_path: Path) -> dict:
+    """Stat and header-read a saved photo ahead of indexing it. Blocking."""
+    media_root = Path(media_root).resolve()
+    file_path = Path(file_path).resolve()
+    st = file_path.stat()
+    width, height = read_dimensions(file_path)
+    return {
+        "rel_path": file_path.relative_to(media_root).as_posix(),
+        "file_size": st.st_size,
+        "mtime_ns": st.st_mtime_ns,
+        "width": width,
+        "height": height,
+    }
+
+
+def insert_photos(conn, event_slug: str, session_id: Optional[str], photos: List[dict]) -> None:
+    """
+    Upsert describe_photo() results on an open connection. Does not commit.
+    A photo dict may also carry "original_size" (its size before normalization)
+    and "upload_id" (the resumable upload it was completed from).
+    """
+    now = datetime.utcnow().isoformat()
+    conn.executemany(
+        """
+        INSERT INTO photos (
+            event_slug, booth_id, session_id, rel_path, file_size, mtime_ns, width, height, original_size,
+            upload_id, blob, created_at
+        )
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+        ON CONFLICT (rel_path) DO UPDATE SET
+            file_size = excluded.file_size,
+            mtime_ns = excluded.mtime_ns,
+            width = excluded.width,
+            height = excluded.height,
+            original_size = COALESCE(excluded.original_size, photos.original_size),
+            upload_id = COALESCE(excluded.upload_id, photos.upload_id)
+        """,
+        [
+            (event_slug, _booth_from_rel(p["rel_path"]), session_id, p["rel_path"], p["file_size"],
+             p["mtime_ns"], p["width"], p["height"], p.get("original_size"), p.get("upload_id"),
+             _blob_from_rel(p["rel_path"]), now)
+            for p in photos
+        ],
+    )
+
+
+def find_upload(upload_id: str) -> Optional[str]:
+    """Media-relative path of the photo a resumable upload was stored as, or None."""
+    with _get_connection() as conn:
+        row = conn.execute("SELECT rel_path FROM photos WHERE upload_id = ?", (upload_id,)).fetchone()
+    return row["rel_path"] if row else None
+
+
+def record_photo(
+    media_root: Path,
+    file_path: Path,
+    event_slug: str,
+    session_id: Optional[str] = None,
+    original_size: Optional[int] = None,
+    upload_id: Optional[str] = None,
+) -> None:
+    """Record a newly saved photo. Blocking (stat plus image header read)."""
+    photo = {**describe_photo(media_root, file_path), "original_size": original_size, "upload_id": upload_id}
+    with _get_connection() as conn:
+        insert_photos(conn, event_slug, session_id, [photo])
+        conn.commit()
+
+
+def remove_photos(media_root: Path, file_paths: List[Path]) -> int:
+    """Drop the index rows of deleted files. Blocking. Returns rows removed."""
+    media_root = Path(media_root).resolve()
+    rel_paths = []
+    for path in file_paths:
+        try:
+            rel_paths.append((Path(path).resolve().relative_to(media_root).as_posix(),))
+        except ValueError:
+            continue
+    with _get_connection() as conn:
+        removed = conn.executemany("DELETE FROM photos WHERE rel_path = ?", rel_paths).rowcount
+        conn.commit()
+    return removed
+
+
+def _encode_cursor(mtime_ns: int, photo_id: int) -> str:
+    return f"{mtime_ns}.{photo_id}"
+
+
+def _decode_cursor(cursor: str) -> Tuple[int, int]:
+    mtime_ns, _, photo_id = cursor.partition(".")
+    return int(mtime_ns), int(photo_id)
+
+
+def list_event_photos(event_slug: str, cursor: Optional[str] = None, limit: int = DEFAULT_PAGE_SIZE) -> dict:
+    """
+    One page of an event's photo URLs, newest first.
+
+    Returns:
+        {"photos": [url, ...], "next_cursor": str or None}
+
+    Raises:
+        ValueError: If cursor is malformed
+    """
+    limit = max(1, min(limit, MAX_PAGE_SIZE))
+    params: list = [event_slug]
+    where = "event_slug = ?"
+    if cursor:
+        where += " AND (mtime_ns, id) < (?, ?)"
+        params.extend(_decode_cursor(cursor))
+    with _get_connection() as conn:
+        rows = conn.execute(
+            f"""
+            SELECT id, rel_path, mtime_ns FROM photos
+            WHERE {where}
+            ORDER BY mtime_ns DESC, id DESC
+            LIMIT ?
+            """,
+            (*params, limit + 1),
+        ).fetchall()
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = _encode_cursor(rows[-1]["mtime_ns"], rows[-1]["id"])
+    return {
+        "photos": [f"/media/{r['rel_path']}" for r in rows],
+        "next_cursor": next_cursor,
+    }
+
+
+def _scan(directory: Path, media_root: Path) -> Iterator[Tuple[str, os.DirEntry]]:
+    """Yield (rel_path, entry) for photo files below directory, one stat per file."""
+    stack = [directory]
+    while stack:
+        current = stack.pop()
+        try:
+            entries = list(os.scandir(current))
+        except OSError:
+            continue
+        for entry in entries:
+            if entry.name.startswith("."):
+                continue  # in-flight .part files
+            if entry.is_dir(follow_symlinks=False):
+                stack.append(Path(entry.path))
+            elif entry.is_file() and Path(entry.name).suffix.lower() in PHOTO_EXTENSIONS:
+                yield Path(entry.path).relative_to(media_root).as_posix(), entry
+
+
+def _write_batch(event_slug: str, photos: List[dict]) -> None:
+    with write_transaction() as conn:
+        for photo in photos:
+            insert_photos(conn, event_slug, _session_from_rel(photo["rel_path"]), [photo])
+
+
+def reconcile_event(media_root: Path, event_slug: str) -> Dict[str, int]:
+    """
+    Sync the index with events/{event_slug}/ on disk. Blocking.
+    The scan and header reads run outside any transaction; rows are written in
+    short batches, so uploads keep getting the write lock during a long scan.
+    """
+    media_root = Path(media_root).resolve()
+    event_dir = media_root / "events" / event_slug
+    with _get_connection() as conn:
+        indexed = {
+            r["rel_path"]: (r["file_size"], r["mtime_ns"])
+            for r in conn.execute(
+                "SELECT rel_path, file_size, mtime_ns FROM photos WHERE event_slug = ?", (event_slug,)
+            )
+        }
+    added = 0
+    seen = set()
+    batch: List[dict] = []
+    for rel_path, entry in _scan(event_dir, media_root):
+        seen.add(rel_path)
+        st = entry.stat()
+        if indexed.get(rel_path) == (st.st_size, st.st_mtime_ns):
+            continue
+        width, height = read_dimensions(Path(entry.path))
+        batch.append({
+            "rel_path": rel_path,
+            "file_size": st.st_size,
+            "mtime_ns": st.st_mtime_ns,
+            "width": width,
+            "height": height,
+        })
+        if len(batch) >= RECONCILE_BATCH_SIZE:
+            _write_batch(event_slug, batch)
+            added += len(batch)
+            batch = []
+    if batch:
+        _write_batch(event_slug, batch)
+        added += len(batch)
+    missing = [(rel,) for rel in indexed if rel not in seen]
+    if missing:
+        with write_transaction() as conn:
+            conn.executemany("DELETE FROM photos WHERE rel_path = ?", missing)
+    if added or missing:
+        logger.info(f"Reconciled photo index for {event_slug}: {added} added/updated, {len(missing)} removed")
+    return {"added": added, "removed": len(missing)}
+
+
+def reconcile_all(media_root: Path) -> Dict[str, int]:
+    """Reconcile every event directory under media_root/events/. Blocking."""
+    events_dir = Path(media_root) / "events"
+    totals = {"added": 0, "removed": 0}
+    slugs: List[str] = []
+    if events_dir.is_dir():
+        slugs = [p.name for p in events_dir.iterdir() if p.is_dir()]
+    with _get_connection() as conn:
+        slugs += [r[0] for r in conn.execute("SELECT DISTINCT event_slug FROM photos")]
+    for slug in sorted(set(slugs)):
+        result = reconcile_event(media_root, slug)
+        totals["added"] += result["added"]
+        totals["removed"] += result["removed"]
+    return totals
@@ -0,0 +1,265 @@
+"""
+Quota service - storage accounting, upload quotas and the free-space watchdog.
+Usage per event and booth is read from storage_usage, which triggers on the
+photo index keep current at write and delete time, so nothing is rescanned.
+Uploads are refused when they would break an event or booth quota, or push
+free space below STORAGE_MIN_FREE_MB. When free space drops below
+STORAGE_LOW_WATERMARK_MB the watchdog evicts, until STORAGE_HIGH_WATERMARK_MB
+is free again:
+  1. regenerable files (derivatives/, processed/), oldest first,
+  2. sessions whose gallery link expired over STORAGE_EVICT_GRACE_HOURS ago,
+     oldest first. This deletes guests' photos, so every batch is logged as a warning.
+"""
+import asyncio
+import logging
+import os
+import shutil
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import List, Optional, Tuple
+
+from app.config import settings
+from app.services import database, derivative_service, session_service
+from app.services.media_cache import media_cache
+from app.services.metrics import STORAGE_BYTES_EVICTED
+from app.services.settings_store import get_settings
+from app.utils.file_lock import file_lock
+
+logger = logging.getLogger(__name__)
+
+MB = 1024 * 1024
+EVICTION_BATCH_SIZE = 50
+REGENERABLE_DIRS = (derivative_service.DERIVATIVES_DIR, "processed")
+
+
+class QuotaExceeded(ValueError):
+    """Storing an upload would exceed a quota or the free-space floor."""
+
+
+def disk_usage(path: Path):
+    """shutil.disk_usage of path, or of its nearest existing parent."""
+    path = Path(path).resolve()
+    while not path.exists() and path.parent != path:
+        path = path.parent
+    return shutil.disk_usage(path)
+
+
+def _limits() -> dict:
+    return {
+        "event_quota_bytes": settings.STORAGE_EVENT_QUOTA_MB * MB or None,
+        "booth_quota_bytes": settings.STORAGE_BOOTH_QUOTA_MB * MB or None,
+        "min_free_bytes": settings.STORAGE_MIN_FREE_MB * MB,
+        "low_watermark_bytes": settings.STORAGE_LOW_WATERMARK_MB * MB,
+        "high_watermark_bytes": settings.STORAGE_HIGH_WATERMARK_MB * MB,
+    }
+
+
+def get_usage(media_root: Path) -> dict:
+    """Disk space, limits and stored bytes per event and booth. Blocking."""
+    with database.get_connection() as conn:
+        rows = conn.execute(
+            "SELECT event_slug, booth_id, bytes, files FROM storage_usage "
+            "WHERE files > 0 ORDER BY event_slug, booth_id"
+        ).fetchall()
+    events = {}
+    for row in rows:
+        event = events.setdefault(row["event_slug"], {
+            "event_slug": row["event_slug"],
+            "bytes": 0,
+            "files": 0,
+            "booths": [],
+        })
+        event["bytes"] += row["bytes"]
+        event["files"] += row["files"]
+        event["booths"].append({"booth_id": row["booth_id"] or None, "bytes": row["bytes"], "files": row["files"]})
+    disk = disk_usage(media_root)
+    return {
+        "disk": {"total_bytes": disk.total, "used_bytes": disk.used, "free_bytes": disk.free},
+        "limits": _limits(),
+        "events": list(events.values()),
+        "watchdog": watchdog.stats,
+    }
+
+
+def check_upload(media_root: Path, event_slug: str, booth_id: Optional[str], incoming_bytes: int) -> None:
+    """
+    Refuse an upload that would break a limit. Blocking (one statfs plus one
+    indexed lookup per configured quota). Wakes the watchdog when space is low.
+
+    Raises:
+        QuotaExceeded: If free space or an event/booth quota would be exceeded
+    """
+    limits = _limits()
+    free = disk_usage(media_root).free
+    if free < limits["low_watermark_bytes"]:
+        watchdog.wake()
+    if free - incoming_bytes < limits["min_free_bytes"]:
+        raise QuotaExceeded("Not enough free disk space")
+    if not (limits["event_quota_bytes"] or limits["booth_quota_bytes"]):
+        return
+    with database.get_connection() as conn:
+        if limits["event_quota_bytes"]:
+            used = conn.execute(
+                "SELECT COALESCE(SUM(bytes), 0) FROM storage_usage WHERE event_slug = ?", (event_slug,)
+            ).fetchone()[0]
+            if used + incoming_bytes > limits["event_quota_bytes"]:
+                raise QuotaExceeded(f"Storage quota for event {event_slug} exceeded")
+        if limits["booth_quota_bytes"]:
+            row = conn.execute(
+                "SELECT bytes FROM storage_usage WHERE event_slug = ? AND booth_id = ?",
+                (event_slug, booth_id or ""),
+            ).fetchone()
+            if (row["bytes"] if row else 0) + incoming_bytes > limits["booth_quota_bytes"]:
+                raise QuotaExceeded(f"Storage quota for booth {booth_id} exceeded")
+
+
+def _regenerable_files(media_root: Path) -> List[Tuple[float, int, Path]]:
+    """(mtime, size, path) of every derivative and processed file."""
+    found = []
+    stack = [media_root / d for d in REGENERABLE_DIRS if (media_root / d).is_dir()]
+    while stack:
+        current = stack.pop()
+        try:
+            entries = list(os.scandir(current))
+        except OSError:
+            continue
+        for entry in entries:
+            try:
+                if entry.is_dir(follow_symlinks=False):
+                    stack.append(Path(entry.path))
+                elif entry.is_file(follow_symlinks=False):
+                    st = entry.stat()
+                    found.append((st.st_mtime, st.st_size, Path(entry.path)))
+            except OSError:
+                continue
+    return found
+
+
+def evict_regenerable(media_root: Path, need_bytes: int) -> Tuple[int, int]:
+    """
+    Delete derivatives and processed files, oldest first, until need_bytes are
+    freed. Galleries fall back to originals for missing derivatives. Blocking.
+
+    Returns:
+        (files deleted, bytes freed)
+    """
+    media_root = Path(media_root).resolve()
+    deleted = freed = 0
+    for _, size, path in sorted(_regenerable_files(media_root)):
+        if freed >= need_bytes:
+            break
+        try:
+            path.unlink()
+        except OSError:
+            continue
+        deleted += 1
+        freed += size
+        media_cache.forget(path.relative_to(media_root).as_posix())
+    return deleted, freed
+
+
+class StorageWatchdog:
+    """Periodic free-space check that evicts data when the disk runs low."""
+
+    def __init__(self):
+        self._task: Optional[asyncio.Task] = None
+        self._wake: Optional[asyncio.Event] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self.stats = {
+            "checks": 0,
+            "evictions": 0,
+            "last_checked_at": None,
+            "free_bytes": None,
+            "last_eviction_at": None,
+            "last_error": None,
+            "files_evicted": 0,
+            "sessions_evicted": 0,
+            "bytes_evicted": 0,
+        }
+
+    def check_once(self) -> dict:
+        """Check free space and evict if it is below the low watermark. Blocking."""
+        media_root = Path(get_settings()["media_root"]).resolve()
+        limits = _limits()
+        free = disk_usage(media_root).free
+        self.stats["checks"] += 1
+        self.stats["last_checked_at"] = datetime.utcnow().isoformat()
+        self.stats["free_bytes"] = free
+        if free >= limits["low_watermark_bytes"]:
+            return self.stats
+        need = limits["high_watermark_bytes"] - free
+        # With several workers, one evicts and the others skip this round
+        with file_lock(database.lock_path(database.DB_PATH, "storage-watchdog"), blocking=False) as held:
+            if held:
+                self._evict(media_root, need)
+        return self.stats
+
+    def _evict(self, media_root: Path, need: int) -> None:
+        logger.warning(f"Free space below watermark on {media_root}; evicting {need} bytes")
+        files, freed = evict_regenerable(media_root, need)
+        STORAGE_BYTES_EVICTED.inc(freed, kind="regenerable")
+        self.stats["files_evicted"] += files
+        sessions = 0
+        while freed < need:
+            purged, session_bytes = session_service.evict_expired_sessions(EVICTION_BATCH_SIZE)
+            if purged == 0:
+                break
+            logger.warning(
+                f"Low disk space: permanently deleted {purged} sessions whose gallery links expired "
+                f"over {settings.STORAGE_EVICT_GRACE_HOURS}h ago ({session_bytes} bytes)"
+            )
+            sessions += purged
+            freed += session_bytes
+            STORAGE_BYTES_EVICTED.inc(session_bytes, kind="expired_sessions")
+        self.stats["sessions_evicted"] += sessions
+        self.stats["bytes_evicted"] += freed
+        self.stats["evictions"] += 1
+        self.stats["last_eviction_at"] = datetime.utcnow().isoformat()
+        logger.info(f"Evicted {files} regenerable files and {sessions} expired sessions ({freed} bytes)")
+        if freed < need:
+            logger.error(f"Disk still short of {need - freed} bytes with nothing left to evict")
+
+    def wake(self) -> None:
+        """Run a check now instead of at the next interval. Safe from any thread."""
+        if self._loop is not None and self._wake is not None:
+            try:
+                self._loop.call_soon_threadsafe(self._wake.set)
+            except RuntimeError:
+                pass  # loop already closed (shutdown)
+
+    async def run_forever(self, interval_seconds: float) -> None:
+        while True:
+            started = time.monotonic()
+            try:
+                await asyncio.to_thread(self.check_once)
+                self.stats["last_error"] = None
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                self.stats["last_error"] = str(e)
+                logger.exception("Storage watchdog check failed")
+            self._wake.clear()
+            try:
+                await asyncio.wait_for(self._wake.wait(), max(0.0, interval_seconds - (time.monotonic() - started)))
+            except asyncio.TimeoutError:
+                pass
+
+    def start(self, interval_seconds: float) -> None:
+        if self._task is None or self._task.done():
+            self._loop = asyncio.get_running_loop()
+            self._wake = asyncio.Event()
+            self._task = asyncio.create_task(self.run_forever(interval_seconds))
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        self._loop = self._wake = None
+
+
+watchdog = StorageWatchdog()
@@ -0,0 +1,161 @@
+"""
+Retention service - background reaper for GDPR retention and orphaned sessions.
+Started from the app lifespan when AUTO_DELETE_ENABLED. Each sweep:
+  1. marks sessions whose photos vanished from disk as deleted (in batches),
+  2. hard-deletes sessions older than DATA_RETENTION_DAYS with their files,
+  3. deletes any remaining files under the media root older than the cutoff,
+     dropping their photo index rows batch by batch,
+  4. discards resumable uploads older than RESUMABLE_UPLOAD_EXPIRY_HOURS.
+All blocking work runs in worker threads, one batch at a time, so a large
+media folder never stalls request handling. With several uvicorn workers,
+each sweep runs in whichever worker takes the reaper lock file; the others skip it.
+"""
+import asyncio
+import logging
+import time
+from datetime import datetime, timedelta
+from typing import Optional
+
+from app.config import settings
+from app.services import database, photo_index, session_service, upload_service
+from app.services.settings_store import get_settings
+from app.services.storage_service import StorageService
+from app.utils.file_lock import file_lock
+
+logger = logging.getLogger(__name__)
+
+
+class RetentionReaper:
+    """Incremental retention sweeper with progress counters."""
+
+    def __init__(self, retention_days: int, batch_size: int = 500):
+        self.retention_days = retention_days
+        self.batch_size = batch_size
+        self._task: Optional[asyncio.Task] = None
+        self.stats = {
+            "runs": 0,
+            "in_progress": False,
+            "phase": None,
+            "last_started_at": None,
+            "last_finished_at": None,
+            "last_duration_seconds": None,
+            "last_error": None,
+            "sessions_checked": 0,
+            "sessions_orphaned": 0,
+            "sessions_purged": 0,
+            "files_deleted": 0,
+            "bytes_deleted": 0,
+            "uploads_discarded": 0,
+            "skipped_locked": 0,
+        }
+
+    async def run_once(self) -> dict:
+        """Run one full sweep. Returns the updated stats."""
+        started = time.monotonic()
+        self.stats["in_progress"] = True
+        self.stats["last_started_at"] = datetime.utcnow().isoformat()
+        cutoff = datetime.utcnow() - timedelta(days=self.retention_days)
+        try:
+            await self._mark_orphans()
+            await self._purge_sessions(cutoff)
+            await self._sweep_files(datetime.now() - timedelta(days=self.retention_days))
+            await self._discard_stale_uploads()
+            self.stats["last_error"] = None
+        except Exception as e:
+            self.stats["last_error"] = str(e)
+            raise
+        finally:
+            self.stats["runs"] += 1
+            self.stats["in_progress"] = False
+            self.stats["phase"] = None
+            self.stats["last_finished_at"] = datetime.utcnow().isoformat()
+            self.stats["last_duration_seconds"] = round(time.monotonic() - started, 3)
+        return self.stats
+
+    async def _mark_orphans(self) -> None:
+        self.stats["phase"] = "orphans"
+        after_id = ""
+        while True:
+            last_id, checked, marked = await asyncio.to_thread(
+                session_service.mark_orphaned_sessions, after_id, self.batch_size
+            )
+            if last_id is None:
+                return
+            self.stats["sessions_checked"] += checked
+            self.stats["sessions_orphaned"] += marked
+            after_id = last_id
+
+    async def _purge_sessions(self, cutoff: datetime) -> None:
+        self.stats["phase"] = "sessions"
+        while True:
+            purged, freed = await asyncio.to_thread(
+                session_service.purge_expired_sessions, cutoff, min(self.batch_size, 100)
+            )
+            self.stats["sessions_purged"] += purged
+            self.stats["bytes_deleted"] += freed
+            if purged == 0:
+                return
+
+    async def _sweep_files(self, cutoff: datetime) -> None:
+        self.stats["phase"] = "files"
+        storage = StorageService(media_root=get_settings()["media_root"], retention_days=self.retention_days)
+        files = storage.iter_expired_files(cutoff)
+
+        def delete_batch():
+            deleted, freed, done = storage.delete_expired_batch(files, self.batch_size)
+            # Otherwise listings and storage usage keep counting the deleted files
+            photo_index.remove_photos(storage.media_root, deleted)
+            return len(deleted), freed, done
+
+        done = False
+        while not done:
+            deleted, freed, done = await asyncio.to_thread(delete_batch)
+            self.stats["files_deleted"] += deleted
+            self.stats["bytes_deleted"] += freed
+
+    async def _discard_stale_uploads(self) -> None:
+        self.stats["phase"] = "uploads"
+        self.stats["uploads_discarded"] += await asyncio.to_thread(
+            upload_service.cleanup_stale,
+            get_settings()["media_root"],
+            settings.RESUMABLE_UPLOAD_EXPIRY_HOURS * 3600,
+        )
+
+    async def run_if_leader(self) -> bool:
+        """Run a sweep unless another worker is already sweeping. Returns whether it ran."""
+        with file_lock(database.lock_path(database.DB_PATH, "reaper"), blocking=False) as held:
+            if not held:
+                self.stats["skipped_locked"] += 1
+                return False
+            await self.run_once()
+        return True
+
+    async def run_forever(self, interval_seconds: float) -> None:
+        while True:
+            try:
+                if await self.run_if_leader():
+                    logger.info(f"Retention sweep finished: {self.stats}")
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                logger.exception("Retention sweep failed")
+            await asyncio.sleep(interval_seconds)
+
+    def start(self, interval_seconds: float) -> None:
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self.run_forever(interval_seconds))
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+
+reaper = RetentionReaper(
+    retention_days=settings.DATA_RETENTION_DAYS,
+    batch_size=settings.RETENTION_BATCH_SIZE,
+)
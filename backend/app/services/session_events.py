@@ -0,0 +1,76 @@
+"""
+Session events - in-process pub/sub of session changes for live galleries.
+session_service publishes after each commit (from worker threads); open
+gallery pages and admin views subscribe over Server-Sent Events. Every event
+is a snapshot (the session's full photo list, or its rendered composite), so a
+subscriber only ever needs the latest ones and slow clients cannot make queues grow.
+"""
+import asyncio
+import threading
+from typing import Dict, Optional, Set
+
+QUEUE_SIZE = 4
+
+
+class Subscription:
+    """One listener's queue, bound to the event loop that created it."""
+
+    __slots__ = ("session_id", "queue", "loop")
+
+    def __init__(self, session_id: str):
+        self.session_id = session_id
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=QUEUE_SIZE)
+        self.loop = asyncio.get_running_loop()
+
+    def _offer(self, event: dict) -> None:
+        # Events are full snapshots: when a client falls behind, drop its oldest
+        if self.queue.full():
+            self.queue.get_nowait()
+        self.queue.put_nowait(event)
+
+    async def get(self, timeout: float) -> Optional[dict]:
+        """Next event, or None if nothing arrived within timeout."""
+        try:
+            return await asyncio.wait_for(self.queue.get(), timeout)
+        except asyncio.TimeoutError:
+            return None
+
+
+class SessionEvents:
+    def __init__(self):
+        self._subscribers: Dict[str, Set[Subscription]] = {}
+        self._lock = threading.Lock()
+
+    @property
+    def subscriber_count(self) -> int:
+        with self._lock:
+            return sum(len(subs) for subs in self._subscribers.values())
+
+    def subscribe(self, session_id: str) -> Subscription:
+        """Start listening to a session. Must be called from the event loop."""
+        subscription = Subscription(session_id)
+        with self._lock:
+            self._subscribers.setdefault(session_id, set()).add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription) -> None:
+        with self._lock:
+            subs = self._subscribers.get(subscription.session_id)
+            if subs is not None:
+                subs.discard(subscription)
+                if not subs:
+                    del self._subscribers[subscription.session_id]
+
+    def publish(self, session_id: str, event: dict) -> int:
+        """Deliver event to a session's listeners. Safe from any thread. Returns listener count."""
+        with self._lock:
+            subs = list(self._subscribers.get(session_id, ()))
+        for subscription in subs:
+            try:
+                subscription.loop.call_soon_threadsafe(subscription._offer, event)
+            except RuntimeError:
+                pass  # loop already closed (shutdown)
+        return len(subs)
+
+
+session_events = SessionEvents()
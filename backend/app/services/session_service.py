@@ -1,73 +1,70 @@
 """
 Session service - manages photobooth sessions and events.
 """
+import hmac
 import logging
-import sqlite3
 import secrets
 import json
 from pathlib import Path
-from datetime import datetime, timedelta
-from typing import Optional, List
-from contextlib import contextmanager
+from datetime import datetime, timedelta, timezone
+from typing import Dict, FrozenSet, Optional, List, Tuple
 
 from app.config import settings
+from app.services import cache_sync, database, derivative_service, gallery_tokens, photo_index, storage_service
+from app.services.database import get_connection as _get_connection, write_transaction
+from app.services.media_cache import media_cache
+from app.services.metrics import DB_QUERY_SECONDS, GALLERY_TOKEN_REJECTIONS
 from app.services.settings_store import get_settings
 
 logger = logging.getLogger(__name__)
 
-DB_PATH = Path(__file__).parent.parent.parent / "photobooth.db"
-
-
-def _get_db_path() -> Path:
-    return DB_PATH
-
-
-@contextmanager
-def _get_connection():
-    db_path = _get_db_path()
-    db_path.parent.mkdir(parents=True, exist_ok=True)
-    conn = sqlite3.connect(str(db_path))
-    conn.row_factory = sqlite3.Row
-    try:
-        conn.execute("""
-            CREATE TABLE IF NOT EXISTS sessions (
-                id TEXT PRIMARY KEY,
-                event_slug TEXT NOT NULL,
-                token TEXT NOT NULL,
-                created_at TEXT NOT NULL,
-                expires_at TEXT NOT NULL,
-                photo_urls TEXT NOT NULL,
-                deleted_at TEXT
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 200
+
+# Session row plus its photo URLs (in capture order) in one indexed query
+_SESSION_SELECT = """
+    SELECT s.*, (
+        SELECT json_group_array(url) FROM (
+            SELECT url FROM session_photos p
+            WHERE p.session_id = s.id
+            ORDER BY p.position
+        )
+    ) AS photos
+    FROM sessions s
+"""
+
+# Database path -> ids of sessions still on a pre-signing token, read once per database
+_legacy_token_sessions: Dict[Path, FrozenSet[str]] = {}
+
+
+def _has_legacy_token(session_id: str) -> bool:
+    """
+    Whether a session's link may carry a legacy (unsigned) token. No session is
+    given one any more, so the set only goes stale by shrinking (regenerated or
+    deleted sessions), which costs those ids a database lookup and nothing else.
+    """
+    ids = _legacy_token_sessions.get(database.DB_PATH)
+    if ids is None:
+        with _get_connection() as conn:
+            ids = frozenset(
+                row["id"] for row in conn.execute(
+                    "SELECT id FROM sessions WHERE instr(token, '.') = 0 AND deleted_at IS NULL"
+                )
             )
-        """)
-        try:
-            conn.execute("ALTER TABLE sessions ADD COLUMN deleted_at TEXT")
-        except sqlite3.OperationalError:
-            pass
-        conn.commit()
-        yield conn
-    finally:
-        conn.close()
+        _legacy_token_sessions[database.DB_PATH] = ids
+    return session_id in ids
 
 
-def create_session(event_slug: str = None) -> dict:
-    """Create a new session for the given event."""
+def new_session(event_slug: str = None) -> dict:
+    """
+    A session for the given event that is not stored yet (id, token, expiry).
+    Store it with create_session_with_photos() once its uploads are written.
+    """
     event_slug = event_slug or get_settings().get("default_event_slug", settings.DEFAULT_EVENT)
     session_id = secrets.token_urlsafe(16)
-    token = secrets.token_urlsafe(32)
     now = datetime.utcnow()
     expires_at = now + timedelta(hours=settings.GALLERY_EXPIRY_HOURS)
-
-    with _get_connection() as conn:
-        conn.execute(
-            """
-            INSERT INTO sessions (id, event_slug, token, created_at, expires_at, photo_urls)
-            VALUES (?, ?, ?, ?, ?, ?)
-            """,
-            (session_id, event_slug, token, now.isoformat(), expires_at.isoformat(), json.dumps([])),
-        )
-        conn.commit()
-
+    token = gallery_tokens.issue(session_id, 1, expires_at)
     return {
         "id": session_id,
         "event_slug": event_slug,
@@ -75,144 +72,492 @@ def create_session(event_slug: str = None) -> dict:
         "created_at": now,
         "expires_at": expires_at,
         "photo_urls": [],
+        "composite_url": None,
         "gallery_url": _build_gallery_url(session_id, token),
     }
 
 
-def add_photo_to_session(session_id: str, photo_url: str) -> Optional[dict]:
-    """Add a photo URL to a session. Returns updated session or None if not found."""
+def _insert_session(conn, session: dict, idempotency_key: Optional[str]) -> bool:
+    """Insert a new_session(). Returns False if idempotency_key already belongs to a session."""
+    return conn.execute(
+        """
+        INSERT INTO sessions (id, event_slug, token, created_at, expires_at, photo_urls, idempotency_key)
+        VALUES (?, ?, ?, ?, ?, ?, ?)
+        ON CONFLICT (idempotency_key) WHERE idempotency_key IS NOT NULL DO NOTHING
+        """,
+        (
+            session["id"],
+            session["event_slug"],
+            session["token"],
+            session["created_at"].isoformat(),
+            session["expires_at"].isoformat(),
+            json.dumps([]),
+            idempotency_key,
+        ),
+    ).rowcount == 1
+
+
+def _session_by_key(conn, idempotency_key: str) -> Optional[dict]:
+    row = conn.execute(
+        f"{_SESSION_SELECT} WHERE s.idempotency_key = ? AND s.deleted_at IS NULL", (idempotency_key,)
+    ).fetchone()
+    return _row_to_session(row) if row else None
+
+
+@DB_QUERY_SECONDS.time(operation="find_session_by_key")
+def find_session_by_key(idempotency_key: str) -> Optional[dict]:
+    """The live session created with idempotency_key, or None."""
     with _get_connection() as conn:
+        return _session_by_key(conn, idempotency_key)
+
+
+@DB_QUERY_SECONDS.time(operation="create_session")
+def create_session(event_slug: str = None, idempotency_key: Optional[str] = None) -> Optional[dict]:
+    """
+    Create a new session for the given event. With an idempotency_key that was
+    used before, returns that session instead (None if it has been deleted).
+    """
+    session = new_session(event_slug)
+    with write_transaction() as conn:
+        if not _insert_session(conn, session, idempotency_key):
+            return _session_by_key(conn, idempotency_key)
+    return session
+
+
+@DB_QUERY_SECONDS.time(operation="create_session_with_photos")
+def create_session_with_photos(
+    session: dict, photos: List[dict], idempotency_key: Optional[str] = None
+) -> Optional[dict]:
+    """
+    Store a session from new_session() and attach its photos in one transaction,
+    so a failed upload never leaves an empty session behind. Returns the stored
+    session; with an idempotency_key that was used before, that session instead
+    (None if it has been deleted) and the photos are not attached.
+    """
+    now = datetime.utcnow().isoformat()
+    with write_transaction() as conn:
+        if not _insert_session(conn, session, idempotency_key):
+            return _session_by_key(conn, idempotency_key)
+        _attach_photos(conn, session["id"], session["event_slug"], 0, photos, now)
+        row = conn.execute(f"{_SESSION_SELECT} WHERE s.id = ?", (session["id"],)).fetchone()
+    return _row_to_session(row)
+
+
+@DB_QUERY_SECONDS.time(operation="add_photo_to_session")
+def add_photo_to_session(
+    session_id: str,
+    photo_url: str,
+    file_size: Optional[int] = None,
+    checksum: Optional[str] = None,
+) -> Optional[dict]:
+    """Add a photo URL to a session. Returns updated session or None if not found."""
+    return add_photos_to_session(
+        session_id, [{"url": photo_url, "file_size": file_size, "checksum": checksum}]
+    )
+
+
+def _attach_photos(conn, session_id: str, event_slug: str, first_position: int, photos: List[dict], now: str) -> None:
+    """Append photos to a session and index them. Part of the caller's transaction."""
+    # Content-addressed uploads of the same frame share a URL; attach it only once
+    conn.executemany(
+        """
+        INSERT INTO session_photos (session_id, position, url, file_size, checksum, created_at)
+        SELECT ?, ?, ?, ?, ?, ?
+        WHERE NOT EXISTS (SELECT 1 FROM session_photos WHERE session_id = ? AND url = ?)
+        """,
+        [
+            (session_id, first_position + i, p["url"], p.get("file_size"), p.get("checksum"), now,
+             session_id, p["url"])
+            for i, p in enumerate(photos)
+        ],
+    )
+    indexed = [p["index"] for p in photos if p.get("index")]
+    if indexed:
+        photo_index.insert_photos(conn, event_slug, session_id, indexed)
+
+
+@DB_QUERY_SECONDS.time(operation="add_photos_to_session")
+def add_photos_to_session(session_id: str, photos: List[dict]) -> Optional[dict]:
+    """
+    Append photos to a session in one transaction. Returns updated session or None if not found.
+
+    Each photo is a dict with "url" and optional "file_size", "checksum" and "index"
+    (a photo_index.describe_photo() result, recorded in the same transaction).
+    """
+    now = datetime.utcnow().isoformat()
+    # Take the write lock up front so concurrent uploads (from any worker) get distinct positions
+    with write_transaction() as conn:
         row = conn.execute(
-            "SELECT * FROM sessions WHERE id = ?",
+            """
+            SELECT s.event_slug, (
+                SELECT COALESCE(MAX(position) + 1, 0) FROM session_photos WHERE session_id = s.id
+            ) AS next_position
+            FROM sessions s WHERE s.id = ?
+            """,
             (session_id,),
         ).fetchone()
         if not row:
             return None
 
-        urls = json.loads(row["photo_urls"])
-        urls.append(photo_url)
-        conn.execute(
-            "UPDATE sessions SET photo_urls = ? WHERE id = ?",
-            (json.dumps(urls), session_id),
-        )
-        conn.commit()
-
-        row = conn.execute("SELECT * FROM sessions WHERE id = ?", (session_id,)).fetchone()
-        return _row_to_session(row)
+        _attach_photos(conn, session_id, row["event_slug"], row["next_position"], photos, now)
+        row = conn.execute(f"{_SESSION_SELECT} WHERE s.id = ?", (session_id,)).fetchone()
+        session = _row_to_session(row)
+        change = {"event": {"type": "photos", "photo_urls": session["photo_urls"]}}
+        cache_sync.record(conn, session_id, change)
+    cache_sync.apply(session_id, change)
+    return session
+
+
+@DB_QUERY_SECONDS.time(operation="set_session_composite")
+def set_session_composite(session_id: str, composite_url: str) -> bool:
+    """Record a session's rendered composite. Returns False if it is deleted or already has one."""
+    with write_transaction() as conn:
+        updated = conn.execute(
+            "UPDATE sessions SET composite_url = ? WHERE id = ? AND deleted_at IS NULL AND composite_url IS NULL",
+            (composite_url, session_id),
+        ).rowcount
+        if not updated:
+            return False
+        change = {"event": {"type": "composite", "composite_url": composite_url}}
+        cache_sync.record(conn, session_id, change)
+    cache_sync.apply(session_id, change)
+    return True
 
 
+@DB_QUERY_SECONDS.time(operation="list_sessions_for_event")
 def list_sessions_for_event(event_slug: str) -> List[dict]:
-    """List non-deleted sessions for an event. Auto-cleans orphaned sessions."""
-    cfg = get_settings()
-    media_root = Path(cfg["media_root"]).resolve()
-
+    """List non-deleted sessions for an event. Orphans are marked by the retention reaper."""
     with _get_connection() as conn:
         rows = conn.execute(
-            """
-            SELECT * FROM sessions
-            WHERE event_slug = ? AND deleted_at IS NULL
-            ORDER BY created_at DESC
+            f"""
+            {_SESSION_SELECT}
+            WHERE s.event_slug = ? AND s.deleted_at IS NULL
+            ORDER BY s.created_at DESC
             """,
             (event_slug,),
         ).fetchall()
+        return [_row_to_session(row) for row in rows]
+
+
+def _encode_cursor(created_at: str, session_id: str) -> str:
+    return f"{created_at}_{session_id}"
+
+
+def _decode_cursor(cursor: str) -> Tuple[str, str]:
+    # Session ids may contain "_", timestamps never do
+    created_at, _, session_id = cursor.partition("_")
+    if not session_id:
+        raise ValueError("Invalid cursor")
+    datetime.fromisoformat(created_at)
+    return created_at, session_id
+
+
+def _utc_naive(value: datetime) -> str:
+    """Stored timestamps are naive UTC ISO strings, which sort chronologically."""
+    if value.tzinfo is not None:
+        value = value.astimezone(timezone.utc).replace(tzinfo=None)
+    return value.isoformat()
+
+
+@DB_QUERY_SECONDS.time(operation="list_session_summaries")
+def list_session_summaries(
+    event_slug: str,
+    cursor: Optional[str] = None,
+    limit: int = DEFAULT_PAGE_SIZE,
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
+) -> dict:
+    """
+    One page of an event's non-deleted sessions, newest first, optionally limited
+    to sessions created in [since, until). Rows are summaries read straight from
+    the (event_slug, deleted_at, created_at, id) index plus one indexed probe of
+    session_photos each, so page cost doesn't grow with the event.
+
+    Returns:
+        {"sessions": [{"id", "created_at", "photo_count", "cover_url"}, ...],
+         "next_cursor": str or None}
+
+    Raises:
+        ValueError: If cursor is malformed
+    """
+    limit = max(1, min(limit, MAX_PAGE_SIZE))
+    where = "s.event_slug = ? AND s.deleted_at IS NULL"
+    params: list = [event_slug]
+    if cursor:
+        where += " AND (s.created_at, s.id) < (?, ?)"
+        params.extend(_decode_cursor(cursor))
+    if since:
+        where += " AND s.created_at >= ?"
+        params.append(_utc_naive(since))
+    if until:
+        where += " AND s.created_at < ?"
+        params.append(_utc_naive(until))
+    with _get_connection() as conn:
+        rows = conn.execute(
+            f"""
+            SELECT s.id, s.created_at,
+                (SELECT COUNT(*) FROM session_photos p WHERE p.session_id = s.id) AS photo_count,
+                (SELECT url FROM session_photos p WHERE p.session_id = s.id ORDER BY p.position LIMIT 1) AS cover
+            FROM sessions s
+            WHERE {where}
+            ORDER BY s.created_at DESC, s.id DESC
+            LIMIT ?
+            """,
+            (*params, limit + 1),
+        ).fetchall()
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = _encode_cursor(rows[-1]["created_at"], rows[-1]["id"])
+    return {
+        "sessions": [
+            {
+                "id": r["id"],
+                "created_at": r["created_at"],
+                "photo_count": r["photo_count"],
+                "cover_url": f"{r['cover']}?size=thumb" if r["cover"] else None,
+            }
+            for r in rows
+        ],
+        "next_cursor": next_cursor,
+    }
 
-        sessions = []
-        for row in rows:
-            photo_urls = json.loads(row["photo_urls"])
-            has_files = any(
-                (media_root / url.lstrip("/").removeprefix("media/")).is_file()
-                for url in photo_urls
-            ) if photo_urls else False
 
-            if photo_urls and not has_files:
-                conn.execute(
-                    "UPDATE sessions SET deleted_at = ? WHERE id = ?",
-                    (datetime.utcnow().isoformat(), row["id"]),
-                )
-                continue
+def _url_to_rel(url: str) -> str:
+    return url.lstrip("/").removeprefix("media/")
 
-            sessions.append(_row_to_session(row))
 
-        conn.commit()
-        return sessions
+def _session_files(row) -> List[str]:
+    """URLs of a session's photos and its composite, for removal."""
+    photo_urls = json.loads(row["photos"])
+    return photo_urls + [row["composite_url"]] if row["composite_url"] else photo_urls
 
 
+def _media_rels(photo_urls: List[str]) -> List[str]:
+    """Media-relative paths of photos and their derivatives, as keyed in media_cache."""
+    rels = []
+    for url in photo_urls:
+        rel = _url_to_rel(url)
+        rels.append(rel)
+        rels.extend(
+            derivative_service.derivative_path(Path(), rel, size).as_posix() for size in derivative_service.SIZES
+        )
+    return rels
+
+
+def _remove_photo_files(media_root: Path, photo_urls: List[str]) -> int:
+    """Delete photo files and their derivatives from disk. Returns bytes freed."""
+    freed = 0
+    for url in photo_urls:
+        rel = _url_to_rel(url)
+        file_path = media_root / rel
+        if file_path.is_file():
+            st = file_path.stat()
+            file_path.unlink()
+            logger.info(f"Deleted photo file: {file_path}")
+            # Content-addressed files are hardlinks; space is freed with the last reference
+            freed += st.st_size if st.st_nlink == 1 else storage_service.release_blob(media_root, file_path)
+        media_cache.forget(rel)
+        for derivative in derivative_service.remove_derivatives(media_root, rel):
+            media_cache.forget(derivative)
+
+    # Remove empty parent directories up to the event folder
+    for url in photo_urls:
+        parent = (media_root / _url_to_rel(url)).parent
+        try:
+            if parent.is_dir() and not any(parent.iterdir()):
+                parent.rmdir()
+                logger.info(f"Removed empty directory: {parent}")
+        except OSError:
+            pass
+    return freed
+
+
+@DB_QUERY_SECONDS.time(operation="delete_session")
 def delete_session(session_id: str) -> bool:
     """Soft-delete a session and hard-delete its photo files from disk."""
     cfg = get_settings()
     media_root = Path(cfg["media_root"]).resolve()
 
-    with _get_connection() as conn:
+    with write_transaction() as conn:
         row = conn.execute(
-            "SELECT * FROM sessions WHERE id = ? AND deleted_at IS NULL",
+            f"{_SESSION_SELECT} WHERE s.id = ? AND s.deleted_at IS NULL",
             (session_id,),
         ).fetchone()
         if not row:
             return False
 
-        photo_urls = json.loads(row["photo_urls"])
-        for url in photo_urls:
-            rel = url.lstrip("/").removeprefix("media/")
-            file_path = media_root / rel
-            if file_path.is_file():
-                file_path.unlink()
-                logger.info(f"Deleted photo file: {file_path}")
-
-        # Remove empty parent directories up to the event folder
-        for url in photo_urls:
-            rel = url.lstrip("/").removeprefix("media/")
-            file_path = media_root / rel
-            parent = file_path.parent
-            try:
-                if parent.is_dir() and not any(parent.iterdir()):
-                    parent.rmdir()
-                    logger.info(f"Removed empty directory: {parent}")
-            except OSError:
-                pass
-
+        photo_urls = _session_files(row)
         conn.execute(
             "UPDATE sessions SET deleted_at = ? WHERE id = ?",
             (datetime.utcnow().isoformat(), session_id),
         )
-        conn.commit()
+        conn.execute("DELETE FROM photos WHERE session_id = ?", (session_id,))
+        change = {
+            "event": {"type": "deleted"},
+            "revoke": [gallery_tokens.ALL_VERSIONS, row["expires_at"]],
+            "forget": _media_rels(photo_urls),
+        }
+        cache_sync.record(conn, session_id, change)
+    # Only the caller that marked the row deleted gets here, so files are removed once
+    _remove_photo_files(media_root, photo_urls)
+    cache_sync.apply(session_id, change)
     return True
 
 
+@DB_QUERY_SECONDS.time(operation="mark_orphaned_sessions")
+def mark_orphaned_sessions(after_id: str = "", limit: int = 500) -> Tuple[Optional[str], int, int]:
+    """
+    Soft-delete live sessions whose photos have all vanished from disk.
+    Checks up to `limit` sessions with id > after_id.
+
+    Returns:
+        (last id checked or None when the table is exhausted, sessions checked, sessions marked)
+    """
+    media_root = Path(get_settings()["media_root"]).resolve()
+    with _get_connection() as conn:
+        rows = conn.execute(
+            f"""
+            {_SESSION_SELECT}
+            WHERE s.id > ? AND s.deleted_at IS NULL
+            ORDER BY s.id
+            LIMIT ?
+            """,
+            (after_id, limit),
+        ).fetchall()
+    if not rows:
+        return None, 0, 0
+
+    orphaned = []
+    for row in rows:
+        photo_urls = json.loads(row["photos"])
+        if photo_urls and not any((media_root / _url_to_rel(u)).is_file() for u in photo_urls):
+            orphaned.append((row["id"], {
+                "event": {"type": "deleted"},
+                "revoke": [gallery_tokens.ALL_VERSIONS, row["expires_at"]],
+            }))
+    if orphaned:
+        now = datetime.utcnow().isoformat()
+        with write_transaction() as conn:
+            for session_id, change in orphaned:
+                conn.execute(
+                    "UPDATE sessions SET deleted_at = ? WHERE id = ? AND deleted_at IS NULL",
+                    (now, session_id),
+                )
+                cache_sync.record(conn, session_id, change)
+        for session_id, change in orphaned:
+            cache_sync.apply(session_id, change)
+    return rows[-1]["id"], len(rows), len(orphaned)
+
+
+def _purge_sessions(where: str, params: tuple, limit: int) -> Tuple[int, int]:
+    """Hard-delete up to `limit` sessions matching where, oldest first. Returns (purged, bytes freed)."""
+    media_root = Path(get_settings()["media_root"]).resolve()
+    with _get_connection() as conn:
+        rows = conn.execute(
+            f"{_SESSION_SELECT} WHERE {where} ORDER BY s.created_at LIMIT ?",
+            (*params, limit),
+        ).fetchall()
+    if not rows:
+        return 0, 0
+    freed = 0
+    changes = []
+    for row in rows:
+        photo_urls = _session_files(row)
+        freed += _remove_photo_files(media_root, photo_urls)
+        changes.append((row["id"], {"event": {"type": "deleted"}, "forget": _media_rels(photo_urls)}))
+    with write_transaction() as conn:
+        ids = [(session_id,) for session_id, _ in changes]
+        conn.executemany("DELETE FROM photos WHERE session_id = ?", ids)
+        conn.executemany("DELETE FROM session_photos WHERE session_id = ?", ids)
+        conn.executemany("DELETE FROM sessions WHERE id = ?", ids)
+        for session_id, change in changes:
+            cache_sync.record(conn, session_id, change)
+    for session_id, change in changes:
+        cache_sync.apply(session_id, change)
+    return len(rows), freed
+
+
+@DB_QUERY_SECONDS.time(operation="purge_expired_sessions")
+def purge_expired_sessions(cutoff: datetime, limit: int = 100) -> Tuple[int, int]:
+    """
+    Hard-delete up to `limit` sessions created before cutoff (live or soft-deleted),
+    including their photo files, derivatives and index rows.
+
+    Returns:
+        (sessions purged, bytes freed)
+    """
+    return _purge_sessions("s.created_at < ?", (cutoff.isoformat(),), limit)
+
+
+@DB_QUERY_SECONDS.time(operation="evict_expired_sessions")
+def evict_expired_sessions(limit: int = 50) -> Tuple[int, int]:
+    """
+    Hard-delete up to `limit` sessions whose gallery link expired more than
+    STORAGE_EVICT_GRACE_HOURS ago, oldest first. Used by the storage watchdog
+    to reclaim space when the disk runs low. Link expiry is short (guests get
+    a fresh link on request), so the grace period is what keeps a recent
+    capture from being purged the hour after it was taken.
+
+    Returns:
+        (sessions purged, bytes freed)
+    """
+    cutoff = datetime.utcnow() - timedelta(hours=settings.STORAGE_EVICT_GRACE_HOURS)
+    return _purge_sessions("s.expires_at < ?", (cutoff.isoformat(),), limit)
+
+
+@DB_QUERY_SECONDS.time(operation="regenerate_session_token")
 def regenerate_session_token(session_id: str) -> Optional[dict]:
-    """Generate new token and extend expiry. Returns updated session or None."""
-    new_token = secrets.token_urlsafe(32)
+    """Issue a new signed token version and extend expiry. Returns updated session or None."""
     now = datetime.utcnow()
     expires_at = now + timedelta(hours=settings.GALLERY_EXPIRY_HOURS)
 
-    with _get_connection() as conn:
+    # Two concurrent regenerations must not both claim the same next version
+    with write_transaction() as conn:
         row = conn.execute(
-            "SELECT * FROM sessions WHERE id = ?",
-            (session_id,),
+            "SELECT token_version, expires_at FROM sessions WHERE id = ?", (session_id,)
         ).fetchone()
         if not row:
             return None
 
+        version = row["token_version"] + 1
+        new_token = gallery_tokens.issue(session_id, version, expires_at)
         conn.execute(
-            "UPDATE sessions SET token = ?, expires_at = ? WHERE id = ?",
-            (new_token, expires_at.isoformat(), session_id),
+            "UPDATE sessions SET token = ?, token_version = ?, expires_at = ? WHERE id = ?",
+            (new_token, version, expires_at.isoformat(), session_id),
         )
-        conn.commit()
+        # Older versions can't outlive the previous expiry
+        change = {"revoke": [version, row["expires_at"]]}
+        cache_sync.record(conn, session_id, change)
 
-        row = conn.execute("SELECT * FROM sessions WHERE id = ?", (session_id,)).fetchone()
-        return _row_to_session(row)
+        row = conn.execute(f"{_SESSION_SELECT} WHERE s.id = ?", (session_id,)).fetchone()
+        session = _row_to_session(row)
+    cache_sync.apply(session_id, change)
+    return session
 
 
+@DB_QUERY_SECONDS.time(operation="get_session")
 def get_session(session_id: str, token: str = None) -> Optional[dict]:
-    """Get session by ID. If token provided, validates it. Returns None if expired, invalid, or deleted."""
+    """
+    Get session by ID. If token provided, validates it. Returns None if expired, invalid, or deleted.
+    Forged, expired and revoked tokens are refused before the database is queried.
+    Unsigned tokens are only looked up for sessions created before signing existed.
+    """
+    if token and not gallery_tokens.is_signed(token):
+        if not _has_legacy_token(session_id):
+            GALLERY_TOKEN_REJECTIONS.inc(reason="unsigned")
+            return None
+    elif token and gallery_tokens.verify(session_id, token) is None:
+        return None
     with _get_connection() as conn:
         row = conn.execute(
-            "SELECT * FROM sessions WHERE id = ? AND deleted_at IS NULL",
+            f"{_SESSION_SELECT} WHERE s.id = ? AND s.deleted_at IS NULL",
             (session_id,),
         ).fetchone()
         if not row:
             return None
 
-        if token and row["token"] != token:
+        if token and not hmac.compare_digest(row["token"], token):
             return None
 
         expires_at = datetime.fromisoformat(row["expires_at"])
@@ -229,7 +574,8 @@ def _row_to_session(row) -> dict:
         "token": row["token"],
         "created_at": datetime.fromisoformat(row["created_at"]),
         "expires_at": datetime.fromisoformat(row["expires_at"]),
-        "photo_urls": json.loads(row["photo_urls"]),
+        "photo_urls": json.loads(row["photos"]),
+        "composite_url": row["composite_url"],
         "gallery_url": _build_gallery_url(row["id"], row["token"]),
     }
 
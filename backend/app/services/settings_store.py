@@ -1,24 +1,48 @@
 """
 Settings store - persists photobooth settings to JSON.
+Settings are cached in memory; the cache is refreshed by save_settings and
+change_password, and re-validated against the file's mtime at most once per
+STAT_INTERVAL_SECONDS so hand edits to settings.json are still picked up.
+Writes are read-modify-write cycles under a lock file, so several uvicorn
+workers sharing the file never lose each other's changes or mint two booth IDs.
 """
 import hashlib
 import json
+import os
+import secrets
+import threading
+import time
 import uuid
+from contextlib import contextmanager
 from pathlib import Path
 from typing import Optional
 
 from app.config import settings as default_settings
+from app.utils.file_lock import file_lock
 
 SETTINGS_FILE = Path(__file__).parent.parent.parent / "settings.json"
 DEFAULT_PASSWORD = "1234"
 PASSWORD_PEPPER = "photobooth-salt"
+STAT_INTERVAL_SECONDS = 1.0
+
+_lock = threading.RLock()
+# (settings file, raw dict, public settings view, file signature, next stat time)
+_cache: Optional[tuple] = None
 
 
 def _hash_password(password: str) -> str:
     return hashlib.sha256((password + PASSWORD_PEPPER).encode()).hexdigest()
 
 
-def _load_raw() -> dict:
+def _file_signature(path: Path) -> Optional[tuple]:
+    try:
+        st = path.stat()
+    except OSError:
+        return None
+    return (st.st_mtime_ns, st.st_size)
+
+
+def _read_file() -> dict:
     if SETTINGS_FILE.exists():
         try:
             return json.loads(SETTINGS_FILE.read_text(encoding="utf-8"))
@@ -27,32 +51,107 @@ def _load_raw() -> dict:
     return {}
 
 
+def _write_raw(raw: dict) -> None:
+    """Atomically replace the settings file and refresh the cache. Caller holds the locks."""
+    SETTINGS_FILE.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = SETTINGS_FILE.with_name(f".{SETTINGS_FILE.name}.{os.getpid()}.tmp")
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        f.write(json.dumps(raw, indent=2))
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, SETTINGS_FILE)
+    _store(raw)
+
+
+@contextmanager
+def _update():
+    """
+    Read-modify-write the settings file: yields the dict currently on disk and
+    writes it back on exit if it changed. Holds _lock and the settings lock file,
+    so other threads and worker processes wait instead of overwriting. Not reentrant.
+    """
+    with _lock, file_lock(SETTINGS_FILE.with_name(f".{SETTINGS_FILE.name}.lock")):
+        raw = _read_file()
+        before = json.dumps(raw, sort_keys=True)
+        yield raw
+        if json.dumps(raw, sort_keys=True) != before:
+            _write_raw(raw)
+        else:
+            _store(raw)
+
+
+def _store(raw: dict) -> None:
+    global _cache
+    view = {
+        "media_root": raw.get("media_root", default_settings.MEDIA_ROOT),
+        "default_event_slug": raw.get("default_event_slug", default_settings.DEFAULT_EVENT),
+        "booth_id": raw.get("booth_id"),
+    }
+    _cache = (
+        SETTINGS_FILE,
+        raw,
+        view,
+        _file_signature(SETTINGS_FILE),
+        time.monotonic() + STAT_INTERVAL_SECONDS,
+    )
+
+
+def _reload() -> tuple:
+    """Re-read the file if it changed since it was cached. Caller holds _lock."""
+    global _cache
+    cache = _cache
+    if cache is not None and cache[0] is SETTINGS_FILE:
+        if _file_signature(SETTINGS_FILE) == cache[3]:
+            _cache = cache[:4] + (time.monotonic() + STAT_INTERVAL_SECONDS,)
+            return _cache
+    raw = _read_file()
+    if not raw.get("booth_id"):
+        _ensure_booth_id(raw)
+    else:
+        _store(raw)
+    return _cache
+
+
+def _cached() -> tuple:
+    cache = _cache
+    if cache is not None and cache[0] is SETTINGS_FILE and time.monotonic() < cache[4]:
+        return cache
+    with _lock:
+        return _reload()
+
+
+def invalidate_cache() -> None:
+    """Drop cached settings so the next read goes to disk."""
+    global _cache
+    with _lock:
+        _cache = None
+
+
+def _new_booth_id() -> str:
+    return f"booth-{uuid.uuid4().hex[:8]}"
+
+
 def _ensure_booth_id(raw: dict) -> str:
     """Return existing booth_id or generate, persist, and return a new one."""
     booth_id = raw.get("booth_id")
     if booth_id:
         return booth_id
-    booth_id = f"booth-{uuid.uuid4().hex[:8]}"
+    with _update() as current:
+        # Another worker may have minted one since raw was read
+        booth_id = current.get("booth_id") or _new_booth_id()
+        current["booth_id"] = booth_id
     raw["booth_id"] = booth_id
-    SETTINGS_FILE.parent.mkdir(parents=True, exist_ok=True)
-    SETTINGS_FILE.write_text(json.dumps(raw, indent=2), encoding="utf-8")
     return booth_id
 
 
 def get_settings() -> dict:
     """Get current settings (merged with defaults). Does not include password hash."""
-    raw = _load_raw()
-    return {
-        "media_root": raw.get("media_root", default_settings.MEDIA_ROOT),
-        "default_event_slug": raw.get("default_event_slug", default_settings.DEFAULT_EVENT),
-        "booth_id": _ensure_booth_id(raw),
-    }
+    return dict(_cached()[2])
 
 
 def verify_password(password: str) -> bool:
     """Verify the admin password."""
-    raw = _load_raw()
-    stored_hash = raw.get("admin_password_hash")
+    stored_hash = _cached()[1].get("admin_password_hash")
     if stored_hash is None:
         return password == DEFAULT_PASSWORD
     return _hash_password(password) == stored_hash
@@ -65,31 +164,43 @@ def change_password(current_password: str, new_password: str) -> bool:
     new_password = (new_password or "").strip()
     if not new_password:
         return False
-    raw = _load_raw()
-    raw["admin_password_hash"] = _hash_password(new_password)
-    SETTINGS_FILE.parent.mkdir(parents=True, exist_ok=True)
-    SETTINGS_FILE.write_text(json.dumps(raw, indent=2), encoding="utf-8")
+    with _update() as raw:
+        raw["admin_password_hash"] = _hash_password(new_password)
     return True
 
 
+def get_token_secret() -> bytes:
+    """Key for signing gallery links: GALLERY_TOKEN_SECRET, else generated and persisted on first use."""
+    if default_settings.GALLERY_TOKEN_SECRET:
+        return default_settings.GALLERY_TOKEN_SECRET.encode()
+    secret = _cached()[1].get("gallery_token_secret")
+    if not secret:
+        # Every worker must sign with the same key: first writer wins, the rest re-read it
+        with _update() as raw:
+            secret = raw.get("gallery_token_secret") or secrets.token_hex(32)
+            raw["gallery_token_secret"] = secret
+    return secret.encode()
+
+
 def save_settings(
     media_root: Optional[str] = None,
     default_event_slug: Optional[str] = None,
 ) -> dict:
     """Update and persist settings. Does not touch password."""
-    raw = _load_raw()
-    current = {
-        "media_root": raw.get("media_root", default_settings.MEDIA_ROOT),
-        "default_event_slug": raw.get("default_event_slug", default_settings.DEFAULT_EVENT),
-    }
-    if media_root is not None:
-        current["media_root"] = str(media_root).strip() or default_settings.MEDIA_ROOT
-    if default_event_slug is not None:
-        current["default_event_slug"] = str(default_event_slug).strip() or default_settings.DEFAULT_EVENT
-    # Preserve booth_id and admin_password_hash when updating other settings
-    current["booth_id"] = _ensure_booth_id(raw)
-    if "admin_password_hash" in raw:
-        current["admin_password_hash"] = raw["admin_password_hash"]
-    SETTINGS_FILE.parent.mkdir(parents=True, exist_ok=True)
-    SETTINGS_FILE.write_text(json.dumps(current, indent=2), encoding="utf-8")
+    with _update() as raw:
+        current = {
+            "media_root": raw.get("media_root", default_settings.MEDIA_ROOT),
+            "default_event_slug": raw.get("default_event_slug", default_settings.DEFAULT_EVENT),
+        }
+        if media_root is not None:
+            current["media_root"] = str(media_root).strip() or default_settings.MEDIA_ROOT
+        if default_event_slug is not None:
+            current["default_event_slug"] = str(default_event_slug).strip() or default_settings.DEFAULT_EVENT
+        # Preserve booth_id, admin_password_hash and the link signing key when updating other settings
+        current["booth_id"] = raw.get("booth_id") or _new_booth_id()
+        for key in ("admin_password_hash", "gallery_token_secret"):
+            if key in raw:
+                current[key] = raw[key]
+        raw.clear()
+        raw.update(current)
     return get_settings()
@@ -3,31 +3,90 @@ Storage service for managing media files.
 Handles file storage, retrieval, and GDPR-compliant deletion.
 Organizes uploads by event and booth:
   media_root/events/{event_slug}/{booth_id}/{session_id}/{filename}
+In content-addressed mode the bytes live once under
+  media_root/blobs/{sha[:2]}/{sha[2:4]}/{sha}.{ext}
+and session paths are hardlinks named {sha}.{ext}; the blob's link count is
+its reference count. Journaled uploads are recorded in upload_journal between
+the temp file and the rename, so a crash can be finished or rolled back.
 """
+import asyncio
+import hashlib
+import io
 import logging
+import os
+import re
 import uuid
 from pathlib import Path
 from datetime import datetime, timedelta
-from typing import Optional, List
+from typing import BinaryIO, Iterator, Optional, List, Tuple, Union
+
+from app.services import derivative_service, normalize_service
+from app.services.upload_journal import journal
+from app.services.metrics import STORAGE_BYTES_DEDUPLICATED, STORAGE_BYTES_WRITTEN, STORAGE_FILES_WRITTEN
 
 logger = logging.getLogger(__name__)
 
+CHUNK_SIZE = 1024 * 1024
+BLOBS_DIR = "blobs"
+COMPOSITES_DIR = "composites"
+CONTENT_NAME = re.compile(r"^([0-9a-f]{64})(\.\w+)$")
+
+
+def blob_path(media_root: Path, checksum: str, ext: str) -> Path:
+    """Fan-out location of a content-addressed blob."""
+    return Path(media_root) / BLOBS_DIR / checksum[:2] / checksum[2:4] / f"{checksum}{ext}"
+
+
+def release_blob(media_root: Path, file_path: Path) -> int:
+    """
+    Drop the shared blob behind a just-deleted content-addressed file once no
+    other session links to it. Returns bytes freed.
+    """
+    match = CONTENT_NAME.match(Path(file_path).name)
+    if not match:
+        return 0
+    blob = blob_path(media_root, match.group(1), match.group(2))
+    try:
+        st = blob.stat()
+        if st.st_nlink > 1:
+            return 0
+        blob.unlink()
+    except FileNotFoundError:
+        return 0
+    logger.info(f"Released blob: {blob}")
+    return st.st_size
+
 
 class StorageService:
     """Service for media storage operations."""
     
-    def __init__(self, media_root: str = "./media", retention_days: int = 30):
+    def __init__(
+        self,
+        media_root: str = "./media",
+        retention_days: int = 30,
+        content_addressed: bool = False,
+        normalize: bool = False,
+        journaled: bool = False,
+    ):
         """
         Initialize storage service.
         
         Args:
             media_root: Root directory for media files
             retention_days: Number of days to retain files before auto-deletion
+            content_addressed: Store uploads once per content hash and hardlink them into sessions
+            normalize: Re-encode uploads (upright, metadata stripped) before storing them
+            journaled: Record uploads in the upload journal; callers close() the returned
+                journal_id once the photo is committed to the database
         """
         self.media_root = Path(media_root)
         self.retention_days = retention_days
+        self.content_addressed = content_addressed
+        self.normalize = normalize
+        self.journaled = journaled
         self.upload_dir = self.media_root / "uploads"
         self.processed_dir = self.media_root / "processed"
+        self.composites_dir = self.media_root / COMPOSITES_DIR
         
         # Create directories if they don't exist
         self._ensure_directories()
@@ -49,9 +108,199 @@ class StorageService:
             path = path / session_id
         return path
     
+    def _build_upload_path(
+        self,
+        filename: str,
+        event_slug: str,
+        booth_id: str = None,
+        session_id: str = None,
+    ) -> Path:
+        """Path: events/{event_slug}/{booth_id}/{session_id}/{booth_id}_{timestamp}_{uuid}.{ext}"""
+        upload_dir = self._get_upload_dir(event_slug, booth_id, session_id)
+        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S_%f")
+        ext = Path(filename).suffix or ".jpg"
+        short_id = uuid.uuid4().hex[:8]
+        parts = [p for p in [booth_id, timestamp, short_id] if p]
+        return upload_dir / f"{'_'.join(parts)}{ext}"
+
+    def _stream_to(self, source: BinaryIO, tmp_path: Path) -> Tuple[int, str]:
+        """Copy source into tmp_path, hashing as it goes. Returns (size, sha256)."""
+        digest = hashlib.sha256()
+        size = 0
+        tmp_path.parent.mkdir(parents=True, exist_ok=True)
+        try:
+            with open(tmp_path, "wb") as out:
+                while chunk := source.read(CHUNK_SIZE):
+                    out.write(chunk)
+                    digest.update(chunk)
+                    size += len(chunk)
+            if size == 0:
+                raise ValueError("Empty file")
+        except BaseException:
+            tmp_path.unlink(missing_ok=True)
+            raise
+        STORAGE_BYTES_WRITTEN.inc(size)
+        return size, digest.hexdigest()
+
+    def _begin(self, entry: Optional[dict], tmp_path: Path, file_path: Path, size: int, checksum: str) -> Optional[str]:
+        """Journal a fully written temp file before it is renamed into place (if entry is given)."""
+        if entry is None:
+            return None
+        record = {
+            "media_root": str(self.media_root.resolve()),
+            "tmp": str(tmp_path.resolve()),
+            "path": str(file_path.resolve()),
+            "size": size,
+            "checksum": checksum,
+            **entry,
+        }
+        try:
+            return journal.begin(record, tmp_path)
+        except BaseException:
+            tmp_path.unlink(missing_ok=True)
+            raise
+
+    def _write_atomic(self, source: BinaryIO, file_path: Path, entry: Optional[dict] = None) -> dict:
+        """
+        Copy source to file_path in chunks via a temp file and atomic rename,
+        so readers never see a partially written photo. With a journal entry
+        (event_slug, session_id, original_size) the temp file is journaled and
+        made durable first. Blocking; run off the event loop.
+
+        Returns:
+            Dict with path, size and sha256 checksum of the written file
+            (plus "journal_id" when journaled)
+        """
+        tmp_path = file_path.with_name(f".{file_path.name}.part")
+        size, checksum = self._stream_to(source, tmp_path)
+        journal_id = self._begin(entry, tmp_path, file_path, size, checksum)
+        try:
+            os.replace(tmp_path, file_path)
+        except BaseException:
+            tmp_path.unlink(missing_ok=True)
+            journal.close([journal_id])
+            raise
+        STORAGE_FILES_WRITTEN.inc()
+        return {"path": str(file_path), "size": size, "checksum": checksum, "journal_id": journal_id}
+
+    def _write_content_addressed(self, source: BinaryIO, file_path: Path, entry: Optional[dict] = None) -> dict:
+        """
+        Hash source while streaming it to a temp file, then store it once under
+        blobs/ and hardlink it into the session directory as {sha256}{ext}.
+        Journaled like _write_atomic when entry is given. Blocking; run off the event loop.
+
+        Returns:
+            Dict with path, size, sha256 checksum and whether the content was already stored
+            (plus "journal_id" when journaled)
+        """
+        tmp_path = self.media_root / BLOBS_DIR / f".{uuid.uuid4().hex}.part"
+        size, checksum = self._stream_to(source, tmp_path)
+        ext = file_path.suffix.lower() or ".jpg"
+        dest = file_path.with_name(f"{checksum}{ext}")
+        dest.parent.mkdir(parents=True, exist_ok=True)
+        journal_id = self._begin(entry, tmp_path, dest, size, checksum)
+        try:
+            deduplicated = self._link_blob(tmp_path, blob_path(self.media_root, checksum, ext), dest)
+        except BaseException:
+            journal.close([journal_id])
+            raise
+        finally:
+            tmp_path.unlink(missing_ok=True)
+        if deduplicated:
+            STORAGE_BYTES_DEDUPLICATED.inc(size)
+        else:
+            STORAGE_FILES_WRITTEN.inc()
+        return {
+            "path": str(dest),
+            "size": size,
+            "checksum": checksum,
+            "deduplicated": deduplicated,
+            "journal_id": journal_id,
+        }
+
+    def _link_blob(self, tmp_path: Path, blob: Path, dest: Path) -> bool:
+        """
+        Make dest a hardlink of blob, creating the blob from tmp_path if this content
+        is new. Returns True if the content was already stored.
+        """
+        try:
+            os.link(blob, dest)
+            # Links share the inode's mtime; refresh it so reused content isn't swept early
+            os.utime(blob)
+            return True
+        except FileExistsError:
+            return True  # the same frame uploaded to the same session again
+        except FileNotFoundError:
+            pass  # new content, or its last link was just released
+        except OSError:
+            # Filesystem without hardlinks (e.g. exFAT media drives): plain copy, no sharing
+            os.replace(tmp_path, dest)
+            return False
+        blob.parent.mkdir(parents=True, exist_ok=True)
+        try:
+            os.link(tmp_path, dest)
+        except FileExistsError:
+            return True
+        except OSError:
+            os.replace(tmp_path, dest)
+            return False
+        try:
+            os.link(tmp_path, blob)
+        except FileExistsError:
+            pass  # stored concurrently; this copy just isn't shared
+        return False
+
+    async def save_upload_stream(
+        self,
+        source: BinaryIO,
+        filename: str,
+        event_slug: str = "onlocation",
+        booth_id: str = None,
+        session_id: str = None,
+        upload_id: str = None,
+    ) -> dict:
+        """
+        Stream an uploaded file to disk from a worker thread and queue its derivatives.
+        With normalize, the upload is re-encoded in the normalize process pool first.
+        When journaled, the caller must close() the result's journal_id once the
+        photo is committed (or given up).
+
+        Args:
+            source: Readable binary file object (e.g. UploadFile.file)
+            filename: Original filename, used for the extension
+            upload_id: Resumable upload the file completes, kept in the journal
+                so a recovered photo is still found by a retried /complete
+
+        Returns:
+            Dict with path, size, sha256 checksum and journal_id (None unless
+            journaled) of the saved file (plus "deduplicated" in
+            content-addressed mode, and "original_size" when the upload was normalized)
+
+        Raises:
+            ValueError: If the source is empty
+        """
+        original_size = None
+        if self.normalize and normalize_service.pool.is_available():
+            source, filename, original_size = await normalize_service.normalize(source, filename)
+        file_path = self._build_upload_path(filename, event_slug, booth_id, session_id)
+        write = self._write_content_addressed if self.content_addressed else self._write_atomic
+        entry = None
+        if self.journaled:
+            entry = {"event_slug": event_slug, "session_id": session_id, "original_size": original_size}
+            if upload_id:
+                entry["upload_id"] = upload_id
+        saved = await asyncio.to_thread(write, source, file_path, entry)
+        if original_size is not None:
+            saved["original_size"] = original_size
+            logger.info(f"Saved upload: {saved['path']} ({original_size} -> {saved['size']} bytes)")
+        else:
+            logger.info(f"Saved upload: {saved['path']}")
+        derivative_service.schedule(saved["path"], self.media_root)
+        return saved
+
     async def save_upload(
         self,
-        file_data: bytes,
+        file_data: Union[bytes, BinaryIO],
         filename: str,
         event_slug: str = "onlocation",
         booth_id: str = None,
@@ -62,18 +311,10 @@ class StorageService:
         
         Path: events/{event_slug}/{booth_id}/{session_id}/{booth_id}_{timestamp}_{uuid}.{ext}
         """
-        upload_dir = self._get_upload_dir(event_slug, booth_id, session_id)
-        self._ensure_directories(upload_dir)
-        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S_%f")
-        ext = Path(filename).suffix or ".jpg"
-        short_id = uuid.uuid4().hex[:8]
-        parts = [p for p in [booth_id, timestamp, short_id] if p]
-        safe_filename = f"{'_'.join(parts)}{ext}"
-        file_path = upload_dir / safe_filename
-        
-        file_path.write_bytes(file_data)
-        logger.info(f"Saved upload: {file_path}")
-        return str(file_path)
+        if isinstance(file_data, bytes):
+            file_data = io.BytesIO(file_data)
+        saved = await self.save_upload_stream(file_data, filename, event_slug, booth_id, session_id)
+        return saved["path"]
     
     async def save_processed(self, file_data: bytes, filename: str) -> str:
         """
@@ -90,10 +331,23 @@ class StorageService:
         safe_filename = f"{timestamp}_{filename}"
         file_path = self.processed_dir / safe_filename
         
-        file_path.write_bytes(file_data)
+        await asyncio.to_thread(self._write_atomic, io.BytesIO(file_data), file_path)
         logger.info(f"Saved processed file: {file_path}")
         return str(file_path)
     
+    async def save_composite(self, file_data: bytes, filename: str) -> str:
+        """
+        Save a session's rendered strip or collage under composites/. Unlike
+        processed/, nothing there is evicted for space: it lives as long as its session.
+
+        Returns:
+            Path to saved file
+        """
+        file_path = self.composites_dir / filename
+        await asyncio.to_thread(self._write_atomic, io.BytesIO(file_data), file_path)
+        logger.info(f"Saved composite: {file_path}")
+        return str(file_path)
+
     async def get_file(self, file_path: str) -> Optional[bytes]:
         """
         Retrieve a file.
@@ -126,6 +380,67 @@ class StorageService:
             return True
         return False
     
+    def iter_expired_files(self, cutoff: datetime) -> Iterator[Path]:
+        """
+        Walk events/, uploads/, processed/, composites/ and derivatives/ recursively, yielding
+        files last modified before cutoff. Lazy, so callers can sweep in batches.
+        """
+        cutoff_ts = cutoff.timestamp()
+        roots = [
+            self.media_root / "events",
+            self.upload_dir,
+            self.processed_dir,
+            self.composites_dir,
+            self.media_root / derivative_service.DERIVATIVES_DIR,
+            self.media_root / BLOBS_DIR,
+        ]
+        stack = [r for r in roots if r.is_dir()]
+        while stack:
+            current = stack.pop()
+            try:
+                entries = list(os.scandir(current))
+            except OSError:
+                continue
+            for entry in entries:
+                try:
+                    if entry.is_dir(follow_symlinks=False):
+                        stack.append(Path(entry.path))
+                    elif entry.is_file(follow_symlinks=False) and entry.stat().st_mtime < cutoff_ts:
+                        yield Path(entry.path)
+                except OSError:
+                    continue
+
+    def delete_expired_batch(self, files: Iterator[Path], batch_size: int) -> Tuple[List[Path], int, bool]:
+        """
+        Delete up to batch_size files from an iter_expired_files() iterator. Blocking.
+
+        Returns:
+            (files deleted, bytes freed, whether the iterator is exhausted)
+        """
+        deleted = []
+        freed = 0
+        for _ in range(batch_size):
+            file_path = next(files, None)
+            if file_path is None:
+                return deleted, freed, True
+            try:
+                st = file_path.stat()
+                file_path.unlink()
+            except OSError:
+                continue
+            deleted.append(file_path)
+            # A hardlinked session file only frees space with its last link
+            freed += st.st_size if st.st_nlink == 1 else 0
+            logger.info(f"Deleted old file: {file_path}")
+            parent = file_path.parent
+            try:
+                # Keep the top-level events/uploads/processed/derivatives folders
+                if parent.parent != self.media_root and not any(parent.iterdir()):
+                    parent.rmdir()
+            except OSError:
+                pass
+        return deleted, freed, False
+
     async def cleanup_old_files(self) -> int:
         """
         Clean up files older than retention period (GDPR compliance).
@@ -134,17 +449,12 @@ class StorageService:
             Number of files deleted
         """
         cutoff_date = datetime.now() - timedelta(days=self.retention_days)
+        files = self.iter_expired_files(cutoff_date)
         deleted_count = 0
-        
-        for directory in [self.upload_dir, self.processed_dir]:
-            for file_path in directory.iterdir():
-                if file_path.is_file():
-                    file_time = datetime.fromtimestamp(file_path.stat().st_mtime)
-                    if file_time < cutoff_date:
-                        file_path.unlink()
-                        deleted_count += 1
-                        logger.info(f"Deleted old file: {file_path}")
-        
+        done = False
+        while not done:
+            deleted, _, done = await asyncio.to_thread(self.delete_expired_batch, files, 500)
+            deleted_count += len(deleted)
         return deleted_count
     
     async def list_files(self, directory: str = "uploads") -> List[str]:
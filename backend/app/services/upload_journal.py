@@ -0,0 +1,318 @@
+"""
+Upload journal - write-ahead records that make stored uploads crash-safe.
+An upload is streamed to a temp file, then a journal record naming the temp
+file, its final path, size, checksum and session is appended to this worker's
+log. Both are fsynced before the atomic rename, and the record stays open until
+the database commit that attaches the photo. If the booth loses power in
+between, recover() at the next startup finishes each open upload (completing
+the rename and attaching the photo) when the file matches its checksum, and
+rolls it back otherwise, so galleries never see orphaned or truncated photos.
+
+UPLOAD_FSYNC picks the flush policy: "always" fsyncs each upload on its own,
+"group" lets uploads landing within UPLOAD_FSYNC_WINDOW_MS share one flush of
+the log (one leader thread fsyncs for everyone), and "off" skips fsync and
+relies on the checksum check at recovery.
+
+Each worker appends to its own log under a lock file held for the worker's
+lifetime, so recovery only touches logs of workers that are gone.
+"""
+import hashlib
+import json
+import logging
+import os
+import secrets
+import threading
+import time
+from contextlib import ExitStack
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional
+
+from app.config import settings
+from app.services import database
+from app.services.metrics import UPLOAD_FSYNC_BATCH_SIZE, UPLOAD_JOURNAL_RECOVERED
+from app.utils.file_lock import file_lock
+
+logger = logging.getLogger(__name__)
+
+LOG_SUFFIX = ".log"
+LOCK_SUFFIX = ".lock"
+# The log is truncated once nothing is open and it has grown past this
+CHECKPOINT_BYTES = 64 * 1024
+HASH_CHUNK_SIZE = 1024 * 1024
+
+
+def journal_dir() -> Path:
+    """Directory of per-worker logs, next to the database shared by all workers."""
+    return database.DB_PATH.with_name(f".{database.DB_PATH.name}.upload-journal")
+
+
+def _fsync(path: Path, flags: int = os.O_RDWR) -> None:
+    fd = os.open(path, flags)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+def _fsync_dir(path: Path) -> None:
+    """Make renames in a directory durable. Not supported (nor needed) on Windows."""
+    if os.name == "nt":  # pragma: no cover - Windows
+        return
+    try:
+        _fsync(path, os.O_RDONLY)
+    except OSError as e:
+        logger.warning(f"Could not fsync directory {path}: {e}")
+
+
+class _Waiter:
+    __slots__ = ("paths", "done", "error")
+
+    def __init__(self, paths: List[Path]):
+        self.paths = paths
+        self.done = threading.Event()
+        self.error: Optional[BaseException] = None
+
+
+class UploadJournal:
+    """This worker's upload log: begin() before the rename, close() after the database commit."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._stack: Optional[ExitStack] = None
+        self._log = None
+        self._log_path: Optional[Path] = None
+        self._open: Dict[str, dict] = {}
+        self._dirs: set = set()
+        self._pending: List[_Waiter] = []
+        self._collecting = False
+
+    def _ensure_log(self) -> None:
+        """Open this worker's log (under self._lock), following DB_PATH if it moved."""
+        directory = journal_dir()
+        if self._log is not None and self._log_path.parent == directory:
+            return
+        self._close_log()
+        directory.mkdir(parents=True, exist_ok=True)
+        name = f"{os.getpid()}-{secrets.token_hex(4)}"
+        stack = ExitStack()
+        # Held until shutdown, so recovery in other workers leaves this log alone
+        stack.enter_context(file_lock(directory / f"{name}{LOCK_SUFFIX}"))
+        self._log_path = directory / f"{name}{LOG_SUFFIX}"
+        self._log = stack.enter_context(open(self._log_path, "ab"))
+        _fsync_dir(directory)
+        self._stack = stack
+
+    def _close_log(self) -> None:
+        if self._stack is None:
+            return
+        log_path, lock_path = self._log_path, self._log_path.with_suffix(LOCK_SUFFIX)
+        self._stack.close()
+        self._stack = self._log = self._log_path = None
+        if not self._open:
+            log_path.unlink(missing_ok=True)
+            lock_path.unlink(missing_ok=True)
+        # Uploads still open are left to recover() via the old log
+        self._open.clear()
+
+    def begin(self, record: dict, data_path: Path) -> str:
+        """
+        Journal an upload whose bytes are complete in data_path (its temp file),
+        and make both durable per UPLOAD_FSYNC. Blocking. Call before the rename.
+
+        record holds media_root, tmp, path, size, checksum, event_slug,
+        session_id and original_size. Returns the journal id for close().
+        """
+        journal_id = secrets.token_hex(8)
+        line = json.dumps({"id": journal_id, **record}).encode("utf-8") + b"\n"
+        with self._lock:
+            self._ensure_log()
+            self._log.write(line)
+            self._log.flush()
+            self._open[journal_id] = record
+            self._dirs.add(Path(record["path"]).parent)
+        policy = settings.UPLOAD_FSYNC.lower()
+        if policy == "always":
+            self._flush([_Waiter([data_path])])
+        elif policy == "group":
+            self._group_sync(data_path)
+        return journal_id
+
+    def _group_sync(self, data_path: Path) -> None:
+        """Wait for a flush covering data_path and the log. The first waiter leads the group."""
+        waiter = _Waiter([data_path])
+        with self._lock:
+            self._pending.append(waiter)
+            lead = not self._collecting
+            self._collecting = True
+        if lead:
+            time.sleep(settings.UPLOAD_FSYNC_WINDOW_MS / 1000)
+            with self._flush_lock:
+                with self._lock:
+                    batch, self._pending = self._pending, []
+                    self._collecting = False
+                self._flush(batch)
+        waiter.done.wait()
+        if waiter.error is not None:
+            raise waiter.error
+
+    def _flush(self, batch: List[_Waiter]) -> None:
+        """fsync every waiter's data file, then the log once for the whole batch."""
+        UPLOAD_FSYNC_BATCH_SIZE.observe(len(batch))
+        for waiter in batch:
+            try:
+                for path in waiter.paths:
+                    _fsync(path)
+            except OSError as e:
+                waiter.error = e
+        try:
+            with self._lock:
+                fd = self._log.fileno() if self._log is not None else None
+            if fd is not None:
+                os.fsync(fd)
+        except OSError as e:
+            for waiter in batch:
+                waiter.error = waiter.error or e
+        for waiter in batch:
+            waiter.done.set()
+
+    def close(self, journal_ids: Iterable[Optional[str]]) -> None:
+        """
+        Mark uploads committed (or rolled back) in the database. Blocking only when
+        the log is checkpointed: touched directories and the database WAL are synced
+        first, so renames and commits are durable before their records disappear.
+        """
+        with self._lock:
+            for journal_id in journal_ids:
+                if journal_id:
+                    self._open.pop(journal_id, None)
+            if self._open or self._log is None or self._log.tell() < CHECKPOINT_BYTES:
+                return
+            dirs, self._dirs = self._dirs, set()
+            for directory in dirs:
+                _fsync_dir(directory)
+            # In WAL mode with synchronous=NORMAL the WAL is synced before a checkpoint
+            with database.get_connection() as conn:
+                conn.execute("PRAGMA wal_checkpoint(PASSIVE)")
+            self._log.seek(0)
+            self._log.truncate()
+            os.fsync(self._log.fileno())
+
+    def shutdown(self) -> None:
+        """Close the log; it is removed when no upload is left open."""
+        with self._lock:
+            self._close_log()
+            self._dirs.clear()
+
+
+def _sha256(path: Path) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        while chunk := f.read(HASH_CHUNK_SIZE):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _read_records(log_path: Path) -> List[dict]:
+    """Records in a log, skipping a line torn by the crash."""
+    records = []
+    for line in log_path.read_bytes().splitlines():
+        try:
+            records.append(json.loads(line))
+        except (json.JSONDecodeError, UnicodeDecodeError):
+            logger.warning(f"Skipping torn upload journal record in {log_path}")
+    return records
+
+
+def _rollback(media_root: Path, tmp: Path, final: Path) -> None:
+    from app.services.storage_service import release_blob
+
+    tmp.unlink(missing_ok=True)
+    if final.is_file():
+        final.unlink()
+        release_blob(media_root, final)
+
+
+def _recover_record(record: dict) -> str:
+    """Finish or roll back one journaled upload. Returns the outcome."""
+    from app.services import photo_index, session_service
+
+    media_root = Path(record["media_root"])
+    tmp, final = Path(record["tmp"]), Path(record["path"])
+    rel_path = final.relative_to(media_root).as_posix()
+    with database.get_connection() as conn:
+        if conn.execute("SELECT 1 FROM photos WHERE rel_path = ?", (rel_path,)).fetchone():
+            tmp.unlink(missing_ok=True)
+            return "committed"
+        session = None
+        if record["session_id"]:
+            session = conn.execute(
+                "SELECT deleted_at FROM sessions WHERE id = ?", (record["session_id"],)
+            ).fetchone()
+    if record["session_id"] and (session is None or session["deleted_at"] is not None):
+        _rollback(media_root, tmp, final)
+        return "rolled_back"
+    if not final.exists() and tmp.exists():
+        # The temp file was complete when journaled; only the rename was lost
+        final.parent.mkdir(parents=True, exist_ok=True)
+        os.replace(tmp, final)
+    try:
+        intact = final.stat().st_size == record["size"] and _sha256(final) == record["checksum"]
+    except OSError:
+        intact = False
+    if not intact:
+        _rollback(media_root, tmp, final)
+        return "rolled_back"
+    index = {
+        **photo_index.describe_photo(media_root, final),
+        "original_size": record.get("original_size"),
+        "upload_id": record.get("upload_id"),
+    }
+    if record["session_id"]:
+        session_service.add_photos_to_session(record["session_id"], [{
+            "url": f"/media/{rel_path}",
+            "file_size": record["size"],
+            "checksum": record["checksum"],
+            "index": index,
+        }])
+    else:
+        with database.get_connection() as conn:
+            photo_index.insert_photos(conn, record["event_slug"], None, [index])
+            conn.commit()
+    return "finished"
+
+
+def recover() -> Dict[str, int]:
+    """
+    Finish or roll back uploads left open by workers that are no longer running.
+    Blocking; run at startup before anything reconciles the photo index.
+    """
+    totals = {"committed": 0, "finished": 0, "rolled_back": 0, "failed": 0}
+    directory = journal_dir()
+    if not directory.is_dir():
+        return totals
+    for log_path in sorted(directory.glob(f"*{LOG_SUFFIX}")):
+        lock_path = log_path.with_suffix(LOCK_SUFFIX)
+        with file_lock(lock_path, blocking=False) as held:
+            if not held or not log_path.exists():
+                continue  # a live worker's log, or recovered by another worker meanwhile
+            failed = 0
+            for record in _read_records(log_path):
+                try:
+                    outcome = _recover_record(record)
+                except Exception:
+                    logger.exception(f"Could not recover journaled upload {record.get('path')}")
+                    outcome = "failed"
+                    failed += 1
+                totals[outcome] += 1
+                UPLOAD_JOURNAL_RECOVERED.inc(outcome=outcome)
+            if failed:
+                continue  # keep the log and retry at the next startup
+            log_path.unlink()
+        lock_path.unlink(missing_ok=True)
+    if totals["finished"] or totals["rolled_back"] or totals["failed"]:
+        logger.warning(f"Recovered interrupted uploads: {totals}")
+    return totals
+
+
+journal = UploadJournal()
@@ -0,0 +1,150 @@
+"""
+Upload service - resumable (tus-like) uploads for booths on unreliable networks.
+Each upload lives in media_root/.uploads/{upload_id}/ as info.json plus the
+bytes received so far (data.part). The current offset is the size of
+data.part, so partial uploads survive a backend restart and clients resume
+from wherever the last chunk stopped. Chunks of one upload may reach different
+workers; each upload's lock file serializes them across processes.
+"""
+import json
+import logging
+import os
+import re
+import secrets
+import shutil
+import time
+from pathlib import Path
+from typing import Optional
+
+from app.utils.file_lock import file_lock
+
+logger = logging.getLogger(__name__)
+
+UPLOADS_DIR = ".uploads"
+INFO_NAME = "info.json"
+DATA_NAME = "data.part"
+LOCK_NAME = ".lock"
+_UPLOAD_ID = re.compile(r"[\w-]{16,64}")
+
+
+class OffsetMismatch(ValueError):
+    """The client's Upload-Offset doesn't match the bytes already received."""
+
+
+def _upload_dir(media_root: Path, upload_id: str) -> Path:
+    if not _UPLOAD_ID.fullmatch(upload_id):
+        raise KeyError(upload_id)
+    return Path(media_root) / UPLOADS_DIR / upload_id
+
+
+def _write_info(directory: Path, info: dict) -> None:
+    tmp_path = directory / f".{INFO_NAME}.tmp"
+    tmp_path.write_text(json.dumps(info), encoding="utf-8")
+    os.replace(tmp_path, directory / INFO_NAME)
+
+
+def _read(directory: Path) -> Optional[dict]:
+    try:
+        info = json.loads((directory / INFO_NAME).read_text(encoding="utf-8"))
+    except (OSError, json.JSONDecodeError):
+        return None
+    try:
+        info["offset"] = (directory / DATA_NAME).stat().st_size
+    except FileNotFoundError:
+        info["offset"] = info["length"] if info.get("result") else 0
+    return info
+
+
+def create_upload(media_root: Path, length: int, filename: str, session_id: Optional[str] = None) -> dict:
+    """Start a resumable upload of `length` bytes. Blocking."""
+    upload_id = secrets.token_urlsafe(16)
+    directory = _upload_dir(media_root, upload_id)
+    directory.mkdir(parents=True)
+    (directory / DATA_NAME).touch()
+    info = {
+        "id": upload_id,
+        "length": length,
+        "filename": filename,
+        "session_id": session_id,
+        "created_at": time.time(),
+        "result": None,
+    }
+    _write_info(directory, info)
+    return {**info, "offset": 0}
+
+
+def get_upload(media_root: Path, upload_id: str) -> Optional[dict]:
+    """Upload info with its current offset, or None if unknown."""
+    try:
+        return _read(_upload_dir(media_root, upload_id))
+    except KeyError:
+        return None
+
+
+def append(media_root: Path, upload_id: str, offset: int, data: bytes) -> int:
+    """
+    Append a chunk at `offset`. Blocking. Returns the new offset.
+
+    Raises:
+        KeyError: If the upload doesn't exist
+        OffsetMismatch: If offset isn't the current end of the upload
+        ValueError: If the chunk would run past the declared length
+    """
+    directory = _upload_dir(media_root, upload_id)
+    if not directory.is_dir():
+        raise KeyError(upload_id)
+    with file_lock(directory / LOCK_NAME):
+        info = _read(directory)
+        if info is None or info["result"] is not None:
+            raise KeyError(upload_id)
+        if offset != info["offset"]:
+            raise OffsetMismatch(f"Expected offset {info['offset']}")
+        if offset + len(data) > info["length"]:
+            raise ValueError("Chunk exceeds upload length")
+        with open(directory / DATA_NAME, "ab") as f:
+            f.write(data)
+        return offset + len(data)
+
+
+def open_data(media_root: Path, upload_id: str):
+    """Open the received bytes of a complete upload for reading."""
+    return open(_upload_dir(media_root, upload_id) / DATA_NAME, "rb")
+
+
+def mark_finished(media_root: Path, upload_id: str, result: dict) -> None:
+    """Record the finalized photo and drop the partial data. Finishing again returns `result`."""
+    directory = _upload_dir(media_root, upload_id)
+    with file_lock(directory / LOCK_NAME):
+        info = _read(directory)
+        info.pop("offset", None)
+        _write_info(directory, {**info, "result": result})
+        (directory / DATA_NAME).unlink(missing_ok=True)
+
+
+def delete_upload(media_root: Path, upload_id: str) -> bool:
+    """Abort an upload and remove its state. Returns False if it doesn't exist."""
+    try:
+        directory = _upload_dir(media_root, upload_id)
+    except KeyError:
+        return False
+    if not directory.is_dir():
+        return False
+    shutil.rmtree(directory, ignore_errors=True)
+    return True
+
+
+def cleanup_stale(media_root: Path, max_age_seconds: float) -> int:
+    """Remove uploads (finished or abandoned) older than max_age_seconds. Blocking."""
+    root = Path(media_root) / UPLOADS_DIR
+    if not root.is_dir():
+        return 0
+    cutoff = time.time() - max_age_seconds
+    removed = 0
+    for directory in root.iterdir():
+        info = _read(directory) if directory.is_dir() else None
+        created_at = info["created_at"] if info else directory.stat().st_mtime
+        if created_at < cutoff and delete_upload(media_root, directory.name):
+            removed += 1
+    if removed:
+        logger.info(f"Removed {removed} stale resumable uploads")
+    return removed
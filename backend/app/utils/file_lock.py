@@ -0,0 +1,76 @@
+"""
+File lock - advisory exclusive locks that hold across worker processes.
+uvicorn --workers N runs N copies of the app against the same settings.json,
+database and media root; these locks serialize their read-modify-write cycles
+and elect a single worker for background sweeps. flock on POSIX, msvcrt
+byte-range locks on Windows. Locks are released when the holder exits, even
+if it crashes.
+"""
+import os
+import time
+from contextlib import contextmanager
+from pathlib import Path
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover - Windows
+    fcntl = None
+    import msvcrt
+
+WINDOWS_RETRY_SECONDS = 0.05
+
+
+def _try_acquire(fd: int) -> bool:
+    try:
+        if fcntl is not None:
+            fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        else:  # pragma: no cover - Windows
+            msvcrt.locking(fd, msvcrt.LK_NBLCK, 1)
+    except BlockingIOError:
+        return False
+    except OSError:  # pragma: no cover - Windows reports contention as EACCES
+        if fcntl is None:
+            return False
+        raise
+    return True
+
+
+def _acquire(fd: int) -> None:
+    if fcntl is not None:
+        fcntl.flock(fd, fcntl.LOCK_EX)
+        return
+    while not _try_acquire(fd):  # pragma: no cover - Windows
+        time.sleep(WINDOWS_RETRY_SECONDS)
+
+
+def _release(fd: int) -> None:
+    if fcntl is not None:
+        fcntl.flock(fd, fcntl.LOCK_UN)
+    else:  # pragma: no cover - Windows
+        os.lseek(fd, 0, os.SEEK_SET)
+        msvcrt.locking(fd, msvcrt.LK_UNLCK, 1)
+
+
+@contextmanager
+def file_lock(path: Path, blocking: bool = True):
+    """
+    Hold an exclusive lock on the lock file at `path` (created if missing).
+    Blocking. Yields True once the lock is held; with blocking=False yields
+    False straight away if another thread or process holds it.
+    """
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o644)
+    try:
+        if blocking:
+            _acquire(fd)
+            held = True
+        else:
+            held = _try_acquire(fd)
+        try:
+            yield held
+        finally:
+            if held:
+                _release(fd)
+    finally:
+        os.close(fd)
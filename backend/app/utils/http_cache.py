@@ -0,0 +1,69 @@
+"""
+HTTP conditional request and Range helpers shared by media and export routes.
+"""
+from email.utils import formatdate, parsedate_to_datetime
+from typing import Mapping, Optional, Tuple
+
+
+def make_etag(size: int, mtime_ns: int) -> str:
+    """Strong ETag derived from file size and modification time."""
+    return f'"{size:x}-{mtime_ns:x}"'
+
+
+def http_date(timestamp: float) -> str:
+    return formatdate(timestamp, usegmt=True)
+
+
+def etag_matches(header: str, etag: str) -> bool:
+    """True if an If-None-Match / If-Range header value matches etag."""
+    header = header.strip()
+    if header == "*":
+        return True
+    candidates = (tag.strip().removeprefix("W/") for tag in header.split(","))
+    return etag in candidates
+
+
+def is_not_modified(headers: Mapping[str, str], etag: str, mtime: float) -> bool:
+    """Evaluate If-None-Match (preferred) or If-Modified-Since against a representation."""
+    if_none_match = headers.get("if-none-match")
+    if if_none_match is not None:
+        return etag_matches(if_none_match, etag)
+    if_modified_since = headers.get("if-modified-since")
+    if if_modified_since:
+        try:
+            since = parsedate_to_datetime(if_modified_since).timestamp()
+        except (TypeError, ValueError):
+            return False
+        return int(mtime) <= since
+    return False
+
+
+def parse_range(header: Optional[str], size: int) -> Optional[Tuple[int, int]]:
+    """
+    Parse a single-range `Range: bytes=...` header.
+
+    Returns:
+        Inclusive (start, end) byte offsets, or None if the header is absent,
+        malformed or asks for multiple ranges (serve the full body instead)
+
+    Raises:
+        ValueError: If the range cannot be satisfied (respond 416)
+    """
+    if not header or not header.startswith("bytes=") or "," in header:
+        return None
+    start_s, _, end_s = header[len("bytes="):].strip().partition("-")
+    try:
+        if start_s:
+            start = int(start_s)
+            end = int(end_s) if end_s else size - 1
+        elif end_s:
+            # Suffix range: the last N bytes
+            start = max(size - int(end_s), 0)
+            end = size - 1
+        else:
+            return None
+    except ValueError:
+        return None
+    if start >= size or start > end:
+        raise ValueError("Range not satisfiable")
+    return start, min(end, size - 1)
@@ -0,0 +1,69 @@
+"""
+Process pool - lazily started worker pools for CPU-bound image work.
+Normalizing uploads, rendering derivatives and compositing strips each get a
+pool of their own, switched on and sized by their settings, so a burst of
+thumbnails never queues a composite. A pool starts on first submit with the
+spawn start method: forking a threaded server process is unsafe, and it
+matches Windows behaviour. Also holds the image decoding the workers share.
+"""
+import multiprocessing
+import threading
+from concurrent.futures import Future, ProcessPoolExecutor
+from typing import BinaryIO, Callable, List, Optional, Union
+
+from PIL import Image, ImageOps
+
+
+class ProcessPool:
+    """
+    One service's worker pool. `enabled` and `workers` are read when called,
+    so settings changed at runtime (or by tests) apply to the next pool.
+    """
+
+    _pools: List["ProcessPool"] = []
+
+    def __init__(self, enabled: Callable[[], bool], workers: Callable[[], int]):
+        self._enabled = enabled
+        self._workers = workers
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._lock = threading.Lock()
+        ProcessPool._pools.append(self)
+
+    def is_available(self) -> bool:
+        return bool(self._enabled())
+
+    def submit(self, fn, *args) -> Future:
+        with self._lock:
+            if self._executor is None:
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self._workers(),
+                    mp_context=multiprocessing.get_context("spawn"),
+                )
+            executor = self._executor
+        return executor.submit(fn, *args)
+
+    def shutdown(self) -> None:
+        """Stop the workers, letting queued jobs finish. The next submit starts a new pool."""
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=True)
+
+
+def shutdown_all() -> None:
+    """Stop every service's pool."""
+    for pool in ProcessPool._pools:
+        pool.shutdown()
+
+
+def open_upright(source: Union[str, BinaryIO], min_edge: int = 0) -> Image.Image:
+    """
+    Decode an image rotated upright from its EXIF orientation. With min_edge,
+    JPEGs are decoded at 1/2, 1/4 or 1/8 scale as long as both edges stay at
+    least min_edge, which is much cheaper than a full decode.
+    """
+    with Image.open(source) as im:
+        if min_edge:
+            im.draft("RGB", (min_edge, min_edge))
+        # Returns a loaded copy, so it outlives the file
+        return ImageOps.exif_transpose(im)
@@ -0,0 +1,268 @@
+"""
+Streaming ZIP writer - store-mode (uncompressed) archives with ZIP64 support.
+The byte layout is computed up front from file sizes alone, so the archive
+length is known before any data is read and any byte range can be produced
+on demand. CRCs are filled in from data descriptors and the central
+directory, computed while streaming. Nothing is buffered beyond one chunk.
+"""
+import bisect
+import hashlib
+import struct
+import threading
+import time
+import zlib
+from collections import OrderedDict
+from pathlib import Path
+from typing import Callable, Iterator, List, Optional, Tuple
+
+CHUNK_SIZE = 256 * 1024
+ZIP32_LIMIT = 0xFFFFFFFF
+ZIP32_MAX_ENTRIES = 0xFFFF
+
+_FLAGS = 0x0008 | 0x0800  # sizes/CRC in data descriptor, UTF-8 names
+_EXTERNAL_ATTR = 0o100644 << 16
+_MADE_BY_UNIX = 3 << 8
+
+
+class _CrcCache:
+    """Small LRU of file CRCs keyed by (path, size, mtime_ns), so resumed downloads don't re-hash."""
+
+    def __init__(self, max_entries: int = 20000):
+        self.max_entries = max_entries
+        self._crcs: "OrderedDict[tuple, int]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: tuple) -> Optional[int]:
+        with self._lock:
+            crc = self._crcs.get(key)
+            if crc is not None:
+                self._crcs.move_to_end(key)
+            return crc
+
+    def put(self, key: tuple, crc: int) -> None:
+        with self._lock:
+            self._crcs[key] = crc
+            self._crcs.move_to_end(key)
+            while len(self._crcs) > self.max_entries:
+                self._crcs.popitem(last=False)
+
+
+crc_cache = _CrcCache()
+
+
+def _dos_datetime(mtime: float) -> Tuple[int, int]:
+    t = time.localtime(max(mtime, 315532800))  # DOS dates start in 1980
+    dos_time = (t.tm_hour << 11) | (t.tm_min << 5) | (t.tm_sec // 2)
+    dos_date = ((t.tm_year - 1980) << 9) | (t.tm_mon << 5) | t.tm_mday
+    return dos_time, dos_date
+
+
+class ZipEntry:
+    """One archive member: a file on disk or an in-memory blob (e.g. a manifest)."""
+
+    __slots__ = ("name", "size", "mtime", "path", "data", "mtime_ns", "offset", "crc")
+
+    def __init__(self, name: str, size: int, mtime: float, path: Optional[Path] = None,
+                 data: Optional[bytes] = None, mtime_ns: int = 0):
+        self.name = name.encode("utf-8")
+        self.size = size
+        self.mtime = mtime
+        self.path = path
+        self.data = data
+        self.mtime_ns = mtime_ns
+        self.offset = 0
+        self.crc: Optional[int] = zlib.crc32(data) if data is not None else None
+
+    @classmethod
+    def from_file(cls, name: str, path: Path, stat=None) -> "ZipEntry":
+        st = stat or path.stat()
+        return cls(name, st.st_size, st.st_mtime, path=path, mtime_ns=st.st_mtime_ns)
+
+    @classmethod
+    def from_bytes(cls, name: str, data: bytes, mtime: float) -> "ZipEntry":
+        return cls(name, len(data), mtime, data=data)
+
+    def _cache_key(self) -> tuple:
+        return (str(self.path), self.size, self.mtime_ns)
+
+    def ensure_crc(self) -> int:
+        """CRC-32 of the member, reading the file if it was not streamed in full."""
+        if self.crc is None:
+            self.crc = crc_cache.get(self._cache_key())
+        if self.crc is None:
+            crc = 0
+            for chunk in _read_file(self.path, 0, self.size):
+                crc = zlib.crc32(chunk, crc)
+            self._set_crc(crc)
+        return self.crc
+
+    def _set_crc(self, crc: int) -> None:
+        self.crc = crc
+        crc_cache.put(self._cache_key(), crc)
+
+
+def _read_file(path: Path, start: int, end: int) -> Iterator[bytes]:
+    """Yield bytes [start, end) of a file, failing if it shrank since it was planned."""
+    with open(path, "rb") as f:
+        f.seek(start)
+        remaining = end - start
+        while remaining > 0:
+            chunk = f.read(min(CHUNK_SIZE, remaining))
+            if not chunk:
+                raise IOError(f"{path} changed while streaming")
+            remaining -= len(chunk)
+            yield chunk
+
+
+class _Segment:
+    __slots__ = ("offset", "length", "render")
+
+    def __init__(self, offset: int, length: int, render: Callable[[int, int], Iterator[bytes]]):
+        self.offset = offset
+        self.length = length
+        # render(start, end) yields bytes [start, end) relative to the segment
+        self.render = render
+
+
+def _static(data: bytes) -> Callable[[int, int], Iterator[bytes]]:
+    def render(start: int, end: int) -> Iterator[bytes]:
+        yield data[start:end]
+    return render
+
+
+def _lazy(build: Callable[[], bytes]) -> Callable[[int, int], Iterator[bytes]]:
+    def render(start: int, end: int) -> Iterator[bytes]:
+        yield build()[start:end]
+    return render
+
+
+class ZipArchive:
+    """
+    A planned store-mode ZIP archive.
+
+    Usage:
+        archive = ZipArchive([ZipEntry.from_file("a.jpg", path), ...])
+        archive.size                      # exact Content-Length
+        for chunk in archive.iter_bytes(start, end): ...
+    """
+
+    def __init__(self, entries: List[ZipEntry], force_zip64: bool = False):
+        self.entries = entries
+        self.zip64 = force_zip64 or self._needs_zip64(entries)
+        self._segments: List[_Segment] = []
+        self._plan()
+        self.size = self._segments[-1].offset + self._segments[-1].length if self._segments else 0
+        self._starts = [s.offset for s in self._segments]
+
+    @staticmethod
+    def _needs_zip64(entries: List[ZipEntry]) -> bool:
+        # Generous per-entry overhead estimate; the exact layout is only known once planned
+        estimate = sum(e.size + 2 * len(e.name) + 200 for e in entries)
+        return len(entries) >= ZIP32_MAX_ENTRIES or estimate >= ZIP32_LIMIT
+
+    @property
+    def etag(self) -> str:
+        """Strong validator over names, sizes and modification times of all members."""
+        digest = hashlib.sha256()
+        for e in self.entries:
+            digest.update(e.name + struct.pack("<QQ", e.size, e.mtime_ns or int(e.mtime)))
+            if e.data is not None:
+                digest.update(struct.pack("<I", e.crc))
+        return f'"zip-{digest.hexdigest()[:24]}"'
+
+    # Layout -------------------------------------------------------------
+
+    def _add(self, length: int, render) -> None:
+        offset = self._segments[-1].offset + self._segments[-1].length if self._segments else 0
+        self._segments.append(_Segment(offset, length, render))
+
+    def _plan(self) -> None:
+        for entry in self.entries:
+            entry.offset = self._segments[-1].offset + self._segments[-1].length if self._segments else 0
+            header = self._local_header(entry)
+            self._add(len(header), _static(header))
+            self._add(entry.size, self._data_renderer(entry))
+            self._add(24 if self.zip64 else 16, _lazy(lambda e=entry: self._descriptor(e)))
+        cd_offset = self._segments[-1].offset + self._segments[-1].length if self._segments else 0
+        cd_size = 0
+        for entry in self.entries:
+            length = 46 + len(entry.name) + (28 if self.zip64 else 0)
+            self._add(length, _lazy(lambda e=entry: self._central_header(e)))
+            cd_size += length
+        end = self._end_records(cd_offset, cd_size)
+        self._add(len(end), _static(end))
+
+    def _local_header(self, entry: ZipEntry) -> bytes:
+        dos_time, dos_date = _dos_datetime(entry.mtime)
+        extra = struct.pack("<HHQQ", 0x0001, 16, 0, 0) if self.zip64 else b""
+        placeholder = ZIP32_LIMIT if self.zip64 else 0
+        return struct.pack(
+            "<IHHHHHIIIHH",
+            0x04034B50, 45 if self.zip64 else 20, _FLAGS, 0, dos_time, dos_date,
+            0, placeholder, placeholder, len(entry.name), len(extra),
+        ) + entry.name + extra
+
+    def _descriptor(self, entry: ZipEntry) -> bytes:
+        crc = entry.ensure_crc()
+        if self.zip64:
+            return struct.pack("<IIQQ", 0x08074B50, crc, entry.size, entry.size)
+        return struct.pack("<IIII", 0x08074B50, crc, entry.size, entry.size)
+
+    def _central_header(self, entry: ZipEntry) -> bytes:
+        dos_time, dos_date = _dos_datetime(entry.mtime)
+        if self.zip64:
+            extra = struct.pack("<HHQQQ", 0x0001, 24, entry.size, entry.size, entry.offset)
+            size = offset = ZIP32_LIMIT
+            version = 45
+        else:
+            extra = b""
+            size, offset = entry.size, entry.offset
+            version = 20
+        return struct.pack(
+            "<IHHHHHHIIIHHHHHII",
+            0x02014B50, _MADE_BY_UNIX | version, version, _FLAGS, 0, dos_time, dos_date,
+            entry.ensure_crc(), size, size, len(entry.name), len(extra), 0, 0, 0,
+            _EXTERNAL_ATTR, offset,
+        ) + entry.name + extra
+
+    def _end_records(self, cd_offset: int, cd_size: int) -> bytes:
+        count = len(self.entries)
+        if not self.zip64:
+            return struct.pack("<IHHHHIIH", 0x06054B50, 0, 0, count, count, cd_size, cd_offset, 0)
+        zip64_end_offset = cd_offset + cd_size
+        return (
+            struct.pack("<IQHHIIQQQQ", 0x06064B50, 44, _MADE_BY_UNIX | 45, 45, 0, 0,
+                        count, count, cd_size, cd_offset)
+            + struct.pack("<IIQI", 0x07064B50, 0, zip64_end_offset, 1)
+            + struct.pack("<IHHHHIIH", 0x06054B50, 0, 0, ZIP32_MAX_ENTRIES, ZIP32_MAX_ENTRIES,
+                          ZIP32_LIMIT, ZIP32_LIMIT, 0)
+        )
+
+    def _data_renderer(self, entry: ZipEntry):
+        if entry.data is not None:
+            return _static(entry.data)
+
+        def render(start: int, end: int) -> Iterator[bytes]:
+            whole = start == 0 and end == entry.size and entry.crc is None
+            crc = 0
+            for chunk in _read_file(entry.path, start, end):
+                if whole:
+                    crc = zlib.crc32(chunk, crc)
+                yield chunk
+            if whole:
+                entry._set_crc(crc)
+        return render
+
+    # Streaming ----------------------------------------------------------
+
+    def iter_bytes(self, start: int = 0, end: Optional[int] = None) -> Iterator[bytes]:
+        """Yield archive bytes start..end (inclusive, like an HTTP byte range). Blocking."""
+        end = self.size - 1 if end is None else end
+        index = max(bisect.bisect_right(self._starts, start) - 1, 0)
+        for segment in self._segments[index:]:
+            if segment.offset > end:
+                break
+            lo = max(start - segment.offset, 0)
+            hi = min(end + 1 - segment.offset, segment.length)
+            if hi > lo:
+                yield from segment.render(lo, hi)
@@ -0,0 +1,3 @@
+"""
+Performance benchmarks. Run from backend/ with `python -m benchmarks.<name>`.
+"""
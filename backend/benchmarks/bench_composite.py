@@ -0,0 +1,55 @@
+"""
+Benchmark: time to render a 3-photo strip from full-resolution camera JPEGs.
+
+Renders in-process, so it measures one pool worker's CPU time per composite:
+the first render decodes the overlay, later ones hit the template cache.
+Needs Pillow.
+
+    python -m benchmarks.bench_composite [--iterations 20] [--width 4000] [--height 3000]
+"""
+import argparse
+import statistics
+import tempfile
+import time
+from pathlib import Path
+
+from PIL import Image
+
+from app.services import composite_service
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--iterations", type=int, default=20)
+    parser.add_argument("--width", type=int, default=4000)
+    parser.add_argument("--height", type=int, default=3000)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        paths = []
+        for i in range(3):
+            # Noise defeats JPEG compression, so decoding is the worst case a camera produces
+            path = Path(tmp) / f"photo_{i}.jpg"
+            Image.effect_noise((args.width, args.height), 64).convert("RGB").save(path, "JPEG", quality=92)
+            paths.append(str(path))
+        overlay = Path(tmp) / "strip.png"
+        Image.new("RGBA", tuple(composite_service.TEMPLATES["strip"]["size"]), (0, 0, 0, 0)).save(overlay)
+        template = {
+            **composite_service.TEMPLATES["strip"],
+            "overlay": [str(overlay), overlay.stat().st_mtime_ns],
+        }
+
+        samples = []
+        for _ in range(args.iterations):
+            start = time.perf_counter()
+            composite_service._composite(paths, template, 90)
+            samples.append((time.perf_counter() - start) * 1000)
+
+    print(f"first    {samples[0]:8.1f} ms   (overlay decoded)")
+    rest = sorted(samples[1:]) or samples
+    print(f"median   {statistics.median(rest):8.1f} ms")
+    print(f"max      {rest[-1]:8.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
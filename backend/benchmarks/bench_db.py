@@ -0,0 +1,84 @@
+"""
+Micro-benchmark: per-request session lookup latency, connect-per-call vs pooled.
+
+The "before" path reproduces the old _get_connection(): a fresh sqlite3.connect,
+CREATE TABLE IF NOT EXISTS, the deleted_at ALTER attempt and a commit on every call.
+
+    python -m benchmarks.bench_db [--iterations 2000]
+"""
+import argparse
+import sqlite3
+import statistics
+import tempfile
+import time
+from contextlib import contextmanager
+from pathlib import Path
+
+from app.services import database, session_service
+
+
+def _legacy_connection(db_path: Path):
+    @contextmanager
+    def connect():
+        conn = sqlite3.connect(str(db_path))
+        conn.row_factory = sqlite3.Row
+        try:
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS sessions (
+                    id TEXT PRIMARY KEY,
+                    event_slug TEXT NOT NULL,
+                    token TEXT NOT NULL,
+                    created_at TEXT NOT NULL,
+                    expires_at TEXT NOT NULL,
+                    photo_urls TEXT NOT NULL,
+                    deleted_at TEXT
+                )
+            """)
+            try:
+                conn.execute("ALTER TABLE sessions ADD COLUMN deleted_at TEXT")
+            except sqlite3.OperationalError:
+                pass
+            conn.commit()
+            yield conn
+        finally:
+            conn.close()
+    return connect
+
+
+def _time_lookups(session_id: str, token: str, iterations: int) -> list:
+    samples = []
+    for _ in range(iterations):
+        start = time.perf_counter()
+        session_service.get_session(session_id, token)
+        samples.append((time.perf_counter() - start) * 1e6)
+    return samples
+
+
+def _report(label: str, samples: list) -> None:
+    samples = sorted(samples)
+    p99 = samples[int(len(samples) * 0.99) - 1]
+    print(f"{label:<8} mean {statistics.mean(samples):8.1f} us   "
+          f"p50 {statistics.median(samples):8.1f} us   p99 {p99:8.1f} us")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--iterations", type=int, default=2000)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        database.DB_PATH = Path(tmp) / "bench.db"
+        session = session_service.create_session("onlocation")
+
+        pooled = _time_lookups(session["id"], session["token"], args.iterations)
+        session_service._get_connection = _legacy_connection(database.DB_PATH)
+        legacy = _time_lookups(session["id"], session["token"], args.iterations)
+        database.close_db()
+
+    _report("before", legacy)
+    _report("after", pooled)
+    print(f"speedup  {statistics.mean(legacy) / statistics.mean(pooled):.1f}x")
+
+
+if __name__ == "__main__":
+    main()
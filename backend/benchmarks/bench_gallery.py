@@ -0,0 +1,73 @@
+"""
+Benchmark: requests/sec for one hot gallery page, uncached vs cached.
+
+Simulates a crowd of phones scanning the same QR code: concurrent GETs of
+/gallery/{id} with gzip accepted. "before" bypasses the gallery cache, so each
+request queries SQLite and re-renders; "after" uses the cache, with a share
+of clients revalidating via If-None-Match.
+
+    python -m benchmarks.bench_gallery [--requests 2000] [--concurrency 50]
+"""
+import argparse
+import asyncio
+import json
+import tempfile
+import time
+from pathlib import Path
+
+import httpx
+
+from app.main import app
+from app.services import database, session_service, settings_store
+from app.services.gallery_cache import gallery_cache
+
+
+async def _run(session: dict, requests: int, concurrency: int, revalidate: bool) -> float:
+    transport = httpx.ASGITransport(app=app)
+    url = f"/gallery/{session['id']}"
+    params = {"token": session["token"]}
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        etag = (await client.get(url, params=params)).headers["etag"]
+        remaining = iter(range(requests))
+
+        async def worker():
+            for i in remaining:
+                headers = {"Accept-Encoding": "gzip"}
+                if revalidate and i % 2:
+                    headers["If-None-Match"] = etag
+                response = await client.get(url, params=params, headers=headers)
+                assert response.status_code in (200, 304)
+
+        start = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+        return time.perf_counter() - start
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, default=50)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        database.DB_PATH = Path(tmp) / "bench.db"
+        settings_store.SETTINGS_FILE = Path(tmp) / "settings.json"
+        settings_store.SETTINGS_FILE.write_text(json.dumps({"media_root": str(Path(tmp) / "media")}))
+        session = session_service.create_session("onlocation")
+        for i in range(3):
+            session_service.add_photo_to_session(session["id"], f"/media/events/onlocation/b/s/photo_{i}.jpg")
+
+        cached_get = gallery_cache.get
+        gallery_cache.get = lambda *a: None
+        before = asyncio.run(_run(session, args.requests, args.concurrency, revalidate=False))
+        gallery_cache.get = cached_get
+        after = asyncio.run(_run(session, args.requests, args.concurrency, revalidate=True))
+        database.close_db()
+
+    print(f"before   {args.requests / before:8.0f} req/s")
+    print(f"after    {args.requests / after:8.0f} req/s   (half the clients revalidate -> 304)")
+    print(f"speedup  {before / after:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,104 @@
+"""
+Load test: parallel photo uploads through the ASGI app, inline vs threaded writes.
+
+Emulates a slow SD card by sleeping per written chunk. The "before" mode performs
+the write on the event loop, as save_upload did with write_bytes; "after" uses the
+worker-thread streaming pipeline. Both write the same way otherwise (journal and
+all), and normalization, derivatives and composites are switched off, so the
+difference is the write path alone.
+
+    python -m benchmarks.bench_upload [--uploads 24] [--concurrency 6] [--size-mb 4]
+"""
+import argparse
+import asyncio
+import json
+import os
+import tempfile
+import time
+from pathlib import Path
+
+import httpx
+
+from app.config import settings
+from app.main import app
+from app.services import database, session_service, settings_store
+from app.services.storage_service import StorageService
+
+
+def _slow_disk(write_atomic, latency_s: float):
+    def write(self, source, file_path, entry=None):
+        class SlowSource:
+            def read(self, n):
+                time.sleep(latency_s)
+                return source.read(n)
+        return write_atomic(self, SlowSource(), file_path, entry)
+    return write
+
+
+async def _inline_save_upload_stream(
+    self, source, filename, event_slug="onlocation", booth_id=None, session_id=None, upload_id=None
+):
+    """save_upload_stream with the write on the event loop; nothing else differs."""
+    file_path = self._build_upload_path(filename, event_slug, booth_id, session_id)
+    write = self._write_content_addressed if self.content_addressed else self._write_atomic
+    entry = None
+    if self.journaled:
+        entry = {"event_slug": event_slug, "session_id": session_id, "original_size": None}
+    return write(source, file_path, entry)
+
+
+async def _run(uploads: int, concurrency: int, payload: bytes) -> float:
+    session = session_service.create_session("onlocation")
+    semaphore = asyncio.Semaphore(concurrency)
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        async def one(i: int):
+            async with semaphore:
+                response = await client.post(
+                    "/api/v1/photos/upload",
+                    files={"file": (f"p{i}.jpg", payload, "image/jpeg")},
+                    data={"session_id": session["id"]},
+                )
+                response.raise_for_status()
+
+        start = time.perf_counter()
+        await asyncio.gather(*(one(i) for i in range(uploads)))
+        return time.perf_counter() - start
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--uploads", type=int, default=24)
+    parser.add_argument("--concurrency", type=int, default=6)
+    parser.add_argument("--size-mb", type=float, default=4)
+    parser.add_argument("--chunk-latency-ms", type=float, default=20)
+    args = parser.parse_args()
+
+    payload = b"\xff\xd8" + os.urandom(int(args.size_mb * 1024 * 1024))
+    # Background image work would decode the random payload, fail, and be timed along with the writes
+    settings.NORMALIZE_UPLOADS = False
+    settings.DERIVATIVES_ENABLED = False
+    settings.COMPOSITE_ENABLED = False
+    settings.UPLOAD_MAX_CONCURRENT = max(settings.UPLOAD_MAX_CONCURRENT, args.concurrency)
+    results = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        database.DB_PATH = Path(tmp) / "bench.db"
+        settings_store.SETTINGS_FILE = Path(tmp) / "settings.json"
+        settings_store.SETTINGS_FILE.write_text(json.dumps({"media_root": str(Path(tmp) / "media")}))
+        StorageService._write_atomic = _slow_disk(StorageService._write_atomic, args.chunk_latency_ms / 1000)
+
+        threaded = StorageService.save_upload_stream
+        StorageService.save_upload_stream = _inline_save_upload_stream
+        results["before"] = asyncio.run(_run(args.uploads, args.concurrency, payload))
+        StorageService.save_upload_stream = threaded
+        results["after"] = asyncio.run(_run(args.uploads, args.concurrency, payload))
+        database.close_db()
+
+    total_mb = args.uploads * args.size_mb
+    for label, elapsed in results.items():
+        print(f"{label:<8} {elapsed:6.2f} s   {args.uploads / elapsed:6.1f} uploads/s   {total_mb / elapsed:6.1f} MB/s")
+    print(f"speedup  {results['before'] / results['after']:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,343 @@
+"""
+End-to-end load test: simulated booths running the real capture and gallery flow.
+
+Each booth repeatedly serves guests: create session, upload 3 photos, open the
+gallery page, fetch the photos as a phone would (?size=medium), while an admin
+client keeps listing the event's sessions. The database is seeded with
+thousands of sessions first so listings have realistic size.
+
+Runs offline against the ASGI app in-process (default, isolated temp storage)
+or against a running server (--target http://127.0.0.1:8000). Reports p50/p95/p99
+latency per step, throughput and server RSS, writes JSON results, and can
+compare them against a previous run.
+
+    python -m benchmarks.loadtest [--booths 4] [--guests 10] [--seed-sessions 5000]
+        [--flow single|batch] [--target URL --server-pid PID]
+        [--output results.json] [--baseline baseline.json --max-regression 20]
+"""
+import argparse
+import asyncio
+import io
+import json
+import math
+import os
+import platform
+import random
+import subprocess
+import sys
+import tempfile
+import time
+from contextlib import AsyncExitStack
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Dict, List, Optional
+
+import httpx
+
+PHOTO_COUNT = 3
+EVENT_SLUG = "loadtest"
+
+
+# Statistics ---------------------------------------------------------------
+
+def percentile(sorted_values: List[float], pct: float) -> float:
+    """Nearest-rank percentile of an already sorted list."""
+    if not sorted_values:
+        return 0.0
+    rank = math.ceil(pct / 100 * len(sorted_values))
+    return sorted_values[min(max(rank, 1), len(sorted_values)) - 1]
+
+
+def summarize(samples: Dict[str, List[float]], errors: Dict[str, int]) -> Dict[str, dict]:
+    """Per-step latency summary in milliseconds."""
+    steps = {}
+    for name in sorted(set(samples) | set(errors)):
+        values = sorted(samples.get(name, []))
+        steps[name] = {
+            "count": len(values),
+            "errors": errors.get(name, 0),
+            "mean_ms": round(sum(values) / len(values) * 1000, 2) if values else 0.0,
+            "p50_ms": round(percentile(values, 50) * 1000, 2),
+            "p95_ms": round(percentile(values, 95) * 1000, 2),
+            "p99_ms": round(percentile(values, 99) * 1000, 2),
+        }
+    return steps
+
+
+def compare(results: dict, baseline: dict, max_regression_pct: float) -> List[str]:
+    """
+    Lines describing regressions beyond max_regression_pct: p95 latency per step
+    and overall requests/s. Empty when the run is within budget.
+    """
+    regressions = []
+    for name, step in results["steps"].items():
+        base = baseline.get("steps", {}).get(name)
+        if not base or not base["p95_ms"]:
+            continue
+        change = (step["p95_ms"] - base["p95_ms"]) / base["p95_ms"] * 100
+        if change > max_regression_pct:
+            regressions.append(f"{name}: p95 {base['p95_ms']}ms -> {step['p95_ms']}ms (+{change:.0f}%)")
+    base_rps = baseline.get("throughput", {}).get("requests_per_s")
+    if base_rps:
+        rps = results["throughput"]["requests_per_s"]
+        change = (base_rps - rps) / base_rps * 100
+        if change > max_regression_pct:
+            regressions.append(f"throughput: {base_rps} -> {rps} req/s (-{change:.0f}%)")
+    return regressions
+
+
+# Measurement --------------------------------------------------------------
+
+class Recorder:
+    def __init__(self):
+        self.samples: Dict[str, List[float]] = {}
+        self.errors: Dict[str, int] = {}
+        self.requests = 0
+
+    async def call(self, step: str, send) -> Optional[httpx.Response]:
+        start = time.perf_counter()
+        try:
+            response = await send()
+            response.raise_for_status()
+        except httpx.HTTPError:
+            self.errors[step] = self.errors.get(step, 0) + 1
+            return None
+        finally:
+            self.requests += 1
+        self.samples.setdefault(step, []).append(time.perf_counter() - start)
+        return response
+
+
+def rss_mb(pid: int) -> Optional[float]:
+    """Resident set size of a process from /proc (Linux), or None if unavailable."""
+    try:
+        with open(f"/proc/{pid}/status", encoding="ascii") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return round(int(line.split()[1]) / 1024, 1)
+    except OSError:
+        return None
+    return None
+
+
+async def _sample_rss(pid: int, readings: List[float], stop: asyncio.Event) -> None:
+    while not stop.is_set():
+        value = rss_mb(pid)
+        if value is not None:
+            readings.append(value)
+        try:
+            await asyncio.wait_for(stop.wait(), 0.5)
+        except asyncio.TimeoutError:
+            pass
+
+
+def make_photo(kb: int, seed: int = 0) -> bytes:
+    """A JPEG of roughly `kb` kilobytes (real image if Pillow is installed)."""
+    try:
+        from PIL import Image
+    except ImportError:
+        return b"\xff\xd8\xff\xe0" + random.Random(seed).randbytes(kb * 1024) + b"\xff\xd9"
+    side = 256
+    while True:
+        noise = random.Random(seed).randbytes(side * side * 3)
+        buffer = io.BytesIO()
+        Image.frombytes("RGB", (side, side), noise).save(buffer, "JPEG", quality=85)
+        if buffer.tell() >= kb * 1024 or side >= 4096:
+            return buffer.getvalue()
+        side *= 2
+
+
+# Flows --------------------------------------------------------------------
+
+async def _seed(client: httpx.AsyncClient, count: int, concurrency: int = 32) -> None:
+    remaining = iter(range(count))
+
+    async def worker():
+        for _ in remaining:
+            response = await client.post("/api/v1/sessions", json={"event_slug": EVENT_SLUG})
+            response.raise_for_status()
+
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+
+
+async def _guest(client: httpx.AsyncClient, rec: Recorder, photos: List[bytes], flow: str) -> None:
+    if flow == "batch":
+        files = [("files", (f"p{i}.jpg", data, "image/jpeg")) for i, data in enumerate(photos)]
+        response = await rec.call("create_session_with_photos", lambda: client.post(
+            "/api/v1/sessions/with-photos", files=files, data={"event_slug": EVENT_SLUG}
+        ))
+        if response is None:
+            return
+        session = response.json()
+    else:
+        response = await rec.call("create_session", lambda: client.post(
+            "/api/v1/sessions", json={"event_slug": EVENT_SLUG}
+        ))
+        if response is None:
+            return
+        session = response.json()
+        for i, data in enumerate(photos):
+            await rec.call("upload_photo", lambda: client.post(
+                "/api/v1/photos/upload",
+                files={"file": (f"p{i}.jpg", data, "image/jpeg")},
+                data={"session_id": session["id"]},
+            ))
+
+    gallery = f"/gallery/{session['id']}"
+    page = await rec.call("gallery_page", lambda: client.get(
+        gallery, params={"token": session["token"]}, headers={"Accept-Encoding": "gzip"}
+    ))
+    if page is None:
+        return
+    detail = await rec.call("get_session", lambda: client.get(
+        f"/api/v1/sessions/{session['id']}", params={"token": session["token"]}
+    ))
+    for url in (detail.json()["photo_urls"] if detail is not None else []):
+        await rec.call("media_medium", lambda: client.get(url, params={"size": "medium"}))
+
+
+async def _booth(client, rec, photos, flow, guests: int) -> None:
+    for _ in range(guests):
+        await _guest(client, rec, photos, flow)
+
+
+async def _admin(client: httpx.AsyncClient, rec: Recorder, stop: asyncio.Event, interval: float) -> None:
+    while not stop.is_set():
+        await rec.call("admin_list_sessions", lambda: client.get(
+            f"/api/v1/settings/events/{EVENT_SLUG}/sessions"
+        ))
+        try:
+            await asyncio.wait_for(stop.wait(), interval)
+        except asyncio.TimeoutError:
+            pass
+
+
+async def run(args) -> dict:
+    async with AsyncExitStack() as stack:
+        if args.target:
+            transport = None
+            base_url = args.target.rstrip("/")
+            pid = args.server_pid
+        else:
+            # In-process: isolated storage, app lifespan as under uvicorn
+            from app.main import app
+            from app.services import database, settings_store
+
+            tmp = Path(stack.enter_context(tempfile.TemporaryDirectory()))
+            database.DB_PATH = tmp / "loadtest.db"
+            settings_store.SETTINGS_FILE = tmp / "settings.json"
+            settings_store.SETTINGS_FILE.write_text(json.dumps({"media_root": str(tmp / "media")}))
+            settings_store.invalidate_cache()
+            await stack.enter_async_context(app.router.lifespan_context(app))
+            transport = httpx.ASGITransport(app=app)
+            base_url = "http://loadtest"
+            pid = os.getpid()
+
+        client = await stack.enter_async_context(
+            httpx.AsyncClient(transport=transport, base_url=base_url, timeout=60)
+        )
+        seed_start = time.perf_counter()
+        await _seed(client, args.seed_sessions)
+        seed_seconds = time.perf_counter() - seed_start
+
+        photos = [make_photo(args.photo_kb, seed=i) for i in range(PHOTO_COUNT)]
+        rec = Recorder()
+        stop = asyncio.Event()
+        rss: List[float] = []
+        rss_start = rss_mb(pid) if pid else None
+        background = [asyncio.create_task(_admin(client, rec, stop, args.admin_interval))]
+        if pid:
+            background.append(asyncio.create_task(_sample_rss(pid, rss, stop)))
+
+        start = time.perf_counter()
+        await asyncio.gather(*(_booth(client, rec, photos, args.flow, args.guests) for _ in range(args.booths)))
+        elapsed = time.perf_counter() - start
+        stop.set()
+        await asyncio.gather(*background)
+
+    guests = args.booths * args.guests
+    return {
+        "meta": {
+            "timestamp": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+            "commit": _git_commit(),
+            "python": sys.version.split()[0],
+            "platform": platform.platform(),
+            "target": args.target or "in-process",
+            "flow": args.flow,
+            "booths": args.booths,
+            "guests_per_booth": args.guests,
+            "seed_sessions": args.seed_sessions,
+            "photo_bytes": len(photos[0]),
+            "seed_seconds": round(seed_seconds, 2),
+        },
+        "steps": summarize(rec.samples, rec.errors),
+        "throughput": {
+            "elapsed_s": round(elapsed, 3),
+            "requests": rec.requests,
+            "requests_per_s": round(rec.requests / elapsed, 1),
+            "guests_per_min": round(guests / elapsed * 60, 1),
+        },
+        "rss_mb": {
+            "start": rss_start,
+            "peak": max(rss) if rss else None,
+            "end": rss[-1] if rss else None,
+        },
+    }
+
+
+def _git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def _report(results: dict) -> None:
+    print(f"{'step':<28}{'count':>7}{'err':>5}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}")
+    for name, step in results["steps"].items():
+        print(f"{name:<28}{step['count']:>7}{step['errors']:>5}"
+              f"{step['p50_ms']:>10}{step['p95_ms']:>10}{step['p99_ms']:>10}")
+    t = results["throughput"]
+    print(f"\n{t['requests']} requests in {t['elapsed_s']}s: "
+          f"{t['requests_per_s']} req/s, {t['guests_per_min']} guests/min")
+    rss = results["rss_mb"]
+    if rss["peak"] is not None:
+        print(f"RSS: start {rss['start']} MB, peak {rss['peak']} MB, end {rss['end']} MB")
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--booths", type=int, default=4, help="concurrent booths")
+    parser.add_argument("--guests", type=int, default=10, help="guests per booth")
+    parser.add_argument("--seed-sessions", type=int, default=5000)
+    parser.add_argument("--photo-kb", type=int, default=400)
+    parser.add_argument("--flow", choices=("single", "batch"), default="single",
+                        help="single: create + 3 uploads; batch: one create-with-photos request")
+    parser.add_argument("--admin-interval", type=float, default=1.0, help="seconds between admin listings")
+    parser.add_argument("--target", help="base URL of a running server (default: in-process ASGI)")
+    parser.add_argument("--server-pid", type=int, help="server PID for RSS sampling with --target")
+    parser.add_argument("--output", type=Path, help="write JSON results here")
+    parser.add_argument("--baseline", type=Path, help="compare against a previous JSON result")
+    parser.add_argument("--max-regression", type=float, default=20.0, help="allowed slowdown in percent")
+    args = parser.parse_args(argv)
+
+    results = asyncio.run(run(args))
+    _report(results)
+    if args.output:
+        args.output.write_text(json.dumps(results, indent=2), encoding="utf-8")
+        print(f"\nResults written to {args.output}")
+    if args.baseline:
+        regressions = compare(results, json.loads(args.baseline.read_text(encoding="utf-8")), args.max_regression)
+        if regressions:
+            print(f"\nRegressions beyond {args.max_regression}% against {args.baseline}:")
+            for line in regressions:
+                print(f"  {line}")
+            return 1
+        print(f"\nWithin {args.max_regression}% of {args.baseline}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,28 @@
+"""
+Shared fixtures: every test gets its own database, settings file and media root.
+"""
+import json
+
+import pytest
+
+from app.config import settings
+from app.services import database, settings_store, upload_journal
+from app.utils import process_pool
+
+
+@pytest.fixture(autouse=True)
+def isolated_storage(tmp_path, monkeypatch):
+    """Point the database, settings file and media root at a temp directory."""
+    media_root = tmp_path / "media"
+    settings_file = tmp_path / "settings.json"
+    settings_file.write_text(json.dumps({"media_root": str(media_root)}), encoding="utf-8")
+    monkeypatch.setattr(database, "DB_PATH", tmp_path / "photobooth.db")
+    monkeypatch.setattr(settings_store, "SETTINGS_FILE", settings_file)
+    # Tests that exercise the process pool opt back in explicitly
+    monkeypatch.setattr(settings, "DERIVATIVES_ENABLED", False)
+    monkeypatch.setattr(settings, "COMPOSITE_ENABLED", False)
+    monkeypatch.setattr(settings, "COMPOSITE_TEMPLATES_DIR", str(tmp_path / "templates"))
+    yield tmp_path
+    process_pool.shutdown_all()
+    upload_journal.journal.shutdown()
+    database.close_db()
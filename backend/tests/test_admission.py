@@ -0,0 +1,91 @@
+"""
+Tests for upload admission control: size caps, the in-flight budget and 503 backpressure.
+"""
+import asyncio
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app.config import settings
+from app.main import app
+from app.services.admission_service import MB, UploadAdmission, upload_admission
+from app.services.metrics import UPLOAD_REJECTIONS
+
+client = TestClient(app)
+
+
+def _upload(data: bytes):
+    return client.post("/api/v1/photos/upload", files={"file": ("p.jpg", data, "image/jpeg")})
+
+
+def test_declared_body_over_the_cap_is_refused_up_front(monkeypatch):
+    monkeypatch.setattr(settings, "UPLOAD_MAX_REQUEST_MB", 1)
+    before = UPLOAD_REJECTIONS.value(reason="too_large")
+    assert _upload(b"x" * (MB + 1)).status_code == 413
+    assert UPLOAD_REJECTIONS.value(reason="too_large") == before + 1
+    assert _upload(b"x" * 1000).status_code == 200
+
+
+def test_streamed_body_is_cut_off_at_the_cap(monkeypatch):
+    monkeypatch.setattr(settings, "UPLOAD_MAX_REQUEST_MB", 1)
+    created = client.post("/api/v1/photos/uploads", headers={"Upload-Length": str(3 * MB)})
+    location = created.headers["location"]
+
+    def chunks():
+        for _ in range(8):
+            yield b"x" * (256 * 1024)
+
+    # A generator body goes out chunked, with no Content-Length to check up front
+    response = client.patch(
+        location,
+        content=chunks(),
+        headers={"Upload-Offset": "0", "Content-Type": "application/offset+octet-stream"},
+    )
+    assert response.status_code == 413
+    assert upload_admission.in_flight == 0
+
+
+def test_uploads_get_503_with_retry_after_when_the_budget_is_spent(monkeypatch):
+    monkeypatch.setattr(settings, "UPLOAD_MAX_CONCURRENT", 1)
+    monkeypatch.setattr(settings, "UPLOAD_QUEUE_TIMEOUT_SECONDS", 0)
+    assert asyncio.run(upload_admission.acquire(10)) is None
+    try:
+        response = _upload(b"x" * 1000)
+        assert response.status_code == 503
+        assert response.headers["retry-after"] == str(settings.UPLOAD_RETRY_AFTER_SECONDS)
+        assert "photobooth_upload_inflight{resource=\"requests\"} 1" in client.get("/metrics").text
+    finally:
+        upload_admission.release(10)
+    assert _upload(b"x" * 1000).status_code == 200
+
+
+@pytest.mark.asyncio
+async def test_queued_uploads_are_admitted_in_order_within_the_byte_budget(monkeypatch):
+    monkeypatch.setattr(settings, "UPLOAD_MAX_CONCURRENT", 4)
+    monkeypatch.setattr(settings, "UPLOAD_MAX_INFLIGHT_MB", 10)
+    monkeypatch.setattr(settings, "UPLOAD_QUEUE_MAX", 2)
+    monkeypatch.setattr(settings, "UPLOAD_QUEUE_TIMEOUT_SECONDS", 1)
+    admission = UploadAdmission()
+    assert await admission.acquire(8 * MB) is None
+
+    large = asyncio.create_task(admission.acquire(5 * MB))
+    small = asyncio.create_task(admission.acquire(1 * MB))
+    await asyncio.sleep(0)
+    assert admission.queued == 2
+    assert await admission.acquire(1 * MB) == "queue_full"
+    # FIFO: the small upload fits now but waits behind the large one
+    assert not small.done()
+
+    admission.release(8 * MB)
+    assert await large is None and await small is None
+    assert (admission.in_flight, admission.bytes_in_flight, admission.queued) == (2, 6 * MB, 0)
+
+
+@pytest.mark.asyncio
+async def test_queued_upload_times_out(monkeypatch):
+    monkeypatch.setattr(settings, "UPLOAD_MAX_CONCURRENT", 1)
+    monkeypatch.setattr(settings, "UPLOAD_QUEUE_TIMEOUT_SECONDS", 0.01)
+    admission = UploadAdmission()
+    assert await admission.acquire(1) is None
+    assert await admission.acquire(1) == "timeout"
+    assert admission.queued == 0 and admission.in_flight == 1
@@ -0,0 +1,90 @@
+"""
+Tests for batched photo upload and the combined session+upload endpoint.
+"""
+from pathlib import Path
+
+from fastapi.testclient import TestClient
+
+from app.main import app
+from app.services import photo_index, session_service
+from app.services.metrics import DB_QUERY_SECONDS
+from app.services.settings_store import get_settings
+
+client = TestClient(app)
+
+
+def _files(*payloads: bytes):
+    return [("files", (f"photo_{i}.jpg", data, "image/jpeg")) for i, data in enumerate(payloads)]
+
+
+def test_batch_attaches_photos_in_order_in_one_transaction():
+    session = session_service.create_session("onlocation")
+    before = DB_QUERY_SECONDS.count(operation="add_photos_to_session")
+    response = client.post(
+        f"/api/v1/sessions/{session['id']}/photos:batch",
+        files=_files(b"\xff\xd8one", b"\xff\xd8two", b"\xff\xd8three"),
+    )
+    assert response.status_code == 200
+    urls = response.json()["photo_urls"]
+    assert len(urls) == 3
+    assert DB_QUERY_SECONDS.count(operation="add_photos_to_session") == before + 1
+
+    media_root = Path(get_settings()["media_root"])
+    contents = [(media_root / url.removeprefix("/media/")).read_bytes() for url in urls]
+    assert contents == [b"\xff\xd8one", b"\xff\xd8two", b"\xff\xd8three"]
+    assert len(photo_index.list_event_photos("onlocation")["photos"]) == 3
+
+
+def test_batch_unknown_session_is_404():
+    response = client.post("/api/v1/sessions/missing/photos:batch", files=_files(b"\xff\xd8x"))
+    assert response.status_code == 404
+
+
+def test_batch_with_empty_file_writes_nothing():
+    session = session_service.create_session("onlocation")
+    response = client.post(
+        f"/api/v1/sessions/{session['id']}/photos:batch",
+        files=_files(b"\xff\xd8ok", b""),
+    )
+    assert response.status_code == 400
+    media_root = Path(get_settings()["media_root"])
+    assert not [p for p in media_root.rglob("*") if p.is_file()]
+    assert session_service.get_session(session["id"])["photo_urls"] == []
+
+
+def test_create_session_with_photos():
+    response = client.post(
+        "/api/v1/sessions/with-photos",
+        files=_files(b"\xff\xd8a", b"\xff\xd8b"),
+        data={"event_slug": "wedding"},
+    )
+    assert response.status_code == 200
+    body = response.json()
+    assert body["event_slug"] == "wedding"
+    assert len(body["photo_urls"]) == 2
+    assert all("/events/wedding/" in url for url in body["photo_urls"])
+    assert session_service.get_session(body["id"], body["token"])["photo_urls"] == body["photo_urls"]
+
+
+def test_failed_create_session_with_photos_stores_no_session():
+    response = client.post("/api/v1/sessions/with-photos", files=_files(b"\xff\xd8ok", b""))
+    assert response.status_code == 400
+    assert session_service.list_sessions_for_event("onlocation") == []
+    media_root = Path(get_settings()["media_root"])
+    assert not [p for p in media_root.rglob("*") if p.is_file()]
+
+
+def test_create_session_with_photos_is_idempotent_on_its_key():
+    headers = {"Idempotency-Key": "capture-1"}
+    first = client.post("/api/v1/sessions/with-photos", files=_files(b"\xff\xd8a"), headers=headers).json()
+    # The response was lost: the retry, and a fallback to a plain session, both get the stored session
+    retried = client.post("/api/v1/sessions/with-photos", files=_files(b"\xff\xd8a"), headers=headers).json()
+    fallback = client.post("/api/v1/sessions", json={}, headers=headers).json()
+    assert retried["id"] == fallback["id"] == first["id"]
+    assert retried["photo_urls"] == fallback["photo_urls"] == first["photo_urls"]
+    assert len(session_service.list_sessions_for_event("onlocation")) == 1
+    media_root = Path(get_settings()["media_root"])
+    assert len([p for p in (media_root / "events").rglob("*") if p.is_file()]) == 1
+
+    session_service.delete_session(first["id"])
+    assert client.post("/api/v1/sessions", json={}, headers=headers).status_code == 409
@@ -0,0 +1,135 @@
+"""
+Tests for photo strip / collage compositing and its template lookup.
+"""
+import io
+import json
+import time
+from pathlib import Path
+
+import pytest
+from fastapi.testclient import TestClient
+from PIL import Image
+
+from app.config import settings
+from app.main import app
+from app.services import composite_service, quota_service, session_service
+from app.services.settings_store import get_settings
+
+COLOURS = [(200, 30, 30), (30, 200, 30), (30, 30, 200)]
+
+
+def _jpeg(colour, width: int = 1200, height: int = 900) -> bytes:
+    buf = io.BytesIO()
+    Image.new("RGB", (width, height), colour).save(buf, "JPEG")
+    return buf.getvalue()
+
+
+def _session_with_photos(count: int) -> dict:
+    media_root = Path(get_settings()["media_root"])
+    session = session_service.create_session("onlocation")
+    photos = []
+    for i in range(count):
+        rel = f"events/onlocation/{session['id']}/{i}.jpg"
+        (media_root / rel).parent.mkdir(parents=True, exist_ok=True)
+        (media_root / rel).write_bytes(_jpeg(COLOURS[i % len(COLOURS)]))
+        photos.append({"url": f"/media/{rel}"})
+    return session_service.add_photos_to_session(session["id"], photos)
+
+
+def _near(pixel, colour) -> bool:
+    return all(abs(a - b) <= 12 for a, b in zip(pixel, colour))
+
+
+@pytest.mark.asyncio
+async def test_strip_fills_every_slot_under_the_event_overlay():
+    templates = Path(settings.COMPOSITE_TEMPLATES_DIR) / "onlocation"
+    templates.mkdir(parents=True)
+    overlay = Image.new("RGBA", (600, 1800), (0, 0, 0, 0))
+    overlay.paste((250, 200, 0, 255), (0, 1400, 600, 1800))
+    overlay.save(templates / "strip.png")
+    session = _session_with_photos(3)
+
+    url = await composite_service.render_session(session)
+    assert url.startswith("/media/composites/") and f"{session['id']}_strip_" in url
+    path = Path(get_settings()["media_root"]) / url.removeprefix("/media/")
+    with Image.open(path) as im:
+        assert im.size == (600, 1800)
+        for colour, (x, y, w, h) in zip(COLOURS, composite_service.TEMPLATES["strip"]["slots"]):
+            assert _near(im.getpixel((x + w // 2, y + h // 2)), colour)
+        assert _near(im.getpixel((5, 5)), (255, 255, 255))
+        assert _near(im.getpixel((300, 1600)), (250, 200, 0))
+
+    assert session_service.get_session(session["id"])["composite_url"] == url
+    # Rendered once: a second render is not recorded and leaves no file behind
+    assert await composite_service.render_session(session) is None
+    assert len(list(path.parent.iterdir())) == 1
+
+    response = TestClient(app).get(f"/gallery/{session['id']}", params={"token": session["token"]})
+    assert f'<img src="{url}"' in response.text
+
+    # Nothing re-renders a composite, so freeing space must not take it
+    quota_service.evict_regenerable(Path(get_settings()["media_root"]), 10 ** 12)
+    assert path.exists()
+
+    session_service.delete_session(session["id"])
+    assert not path.exists()
+
+
+@pytest.mark.asyncio
+async def test_json_layouts_and_unknown_templates():
+    templates = Path(settings.COMPOSITE_TEMPLATES_DIR)
+    templates.mkdir()
+    (templates / "duo.json").write_text(json.dumps({
+        "size": [400, 200], "background": "#000000", "slots": [[0, 0, 200, 200], [200, 0, 200, 200]],
+    }))
+    (templates / "broken.json").write_text(json.dumps({"size": [100, 100], "slots": [[50, 50, 100, 100]]}))
+
+    assert await composite_service.render_session(_session_with_photos(1), "duo") is None
+    url = await composite_service.render_session(_session_with_photos(2), "duo")
+    with Image.open(Path(get_settings()["media_root"]) / url.removeprefix("/media/")) as im:
+        assert im.size == (400, 200)
+        assert _near(im.getpixel((300, 100)), COLOURS[1])
+
+    with pytest.raises(ValueError):
+        await composite_service.render_session(_session_with_photos(1), "broken")
+    with pytest.raises(ValueError):
+        await composite_service.render_session(_session_with_photos(1), "nope")
+
+
+def test_relative_templates_dir_is_resolved_against_the_backend_folder(monkeypatch):
+    monkeypatch.setattr(settings, "COMPOSITE_TEMPLATES_DIR", "./templates")
+    assert composite_service._templates_dir() == composite_service.APP_ROOT / "templates"
+    assert (composite_service.APP_ROOT / "app" / "main.py").is_file()
+
+
+def test_templates_are_decoded_once_per_process(tmp_path):
+    session = _session_with_photos(3)
+    media_root = Path(get_settings()["media_root"])
+    paths = [str(media_root / url.removeprefix("/media/")) for url in session["photo_urls"]]
+    overlay = tmp_path / "frame.png"
+    Image.new("RGBA", (600, 1800), (0, 0, 0, 0)).save(overlay)
+    template = {**composite_service.TEMPLATES["strip"], "overlay": [str(overlay), overlay.stat().st_mtime_ns]}
+    composite_service._load_overlay.cache_clear()
+
+    started = time.perf_counter()
+    for _ in range(3):
+        composite_service._composite(paths, template, 90)
+    assert (time.perf_counter() - started) / 3 < 1.0
+    info = composite_service._load_overlay.cache_info()
+    assert (info.misses, info.hits) == (1, 2)
+
+
+def test_last_upload_renders_the_composite(monkeypatch):
+    monkeypatch.setattr(settings, "COMPOSITE_ENABLED", True)
+    files = [("files", (f"{i}.jpg", _jpeg(colour), "image/jpeg")) for i, colour in enumerate(COLOURS)]
+    # The context manager keeps one event loop alive for the background render
+    with TestClient(app) as client:
+        session = client.post("/api/v1/sessions/with-photos", files=files).json()
+        deadline = time.monotonic() + 60
+        while time.monotonic() < deadline:
+            session = client.get(f"/api/v1/sessions/{session['id']}", params={"token": session["token"]}).json()
+            if session["composite_url"]:
+                break
+            time.sleep(0.05)
+        assert f"{session['id']}_strip_" in session["composite_url"]
+        assert client.get(session["composite_url"]).headers["content-type"] == "image/jpeg"
@@ -0,0 +1,116 @@
+"""
+Tests for content-addressed storage: dedup via hardlinked blobs and refcounted deletion.
+"""
+import hashlib
+from pathlib import Path
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app.config import settings
+from app.main import app
+from app.services import session_service
+from app.services.metrics import STORAGE_BYTES_DEDUPLICATED
+from app.services.settings_store import get_settings
+from app.services.storage_service import blob_path
+
+client = TestClient(app)
+
+FRAME = b"\xff\xd8" + b"frame" * 2000
+CHECKSUM = hashlib.sha256(FRAME).hexdigest()
+
+
+@pytest.fixture(autouse=True)
+def content_addressed(monkeypatch):
+    monkeypatch.setattr(settings, "CONTENT_ADDRESSED_STORAGE", True)
+
+
+def _upload(session_id: str):
+    response = client.post(
+        "/api/v1/photos/upload",
+        files={"file": ("photo.jpg", FRAME, "image/jpeg")},
+        data={"session_id": session_id},
+    )
+    assert response.status_code == 200
+    return Path(response.json()["path"])
+
+
+def test_identical_uploads_share_one_blob():
+    media_root = Path(get_settings()["media_root"])
+    first = session_service.create_session("onlocation")
+    second = session_service.create_session("onlocation")
+    before = STORAGE_BYTES_DEDUPLICATED.value()
+
+    a = _upload(first["id"])
+    b = _upload(second["id"])
+    blob = blob_path(media_root, CHECKSUM, ".jpg")
+    assert a.name == b.name == f"{CHECKSUM}.jpg"
+    assert a.stat().st_ino == b.stat().st_ino == blob.stat().st_ino
+    assert blob.stat().st_nlink == 3
+    assert STORAGE_BYTES_DEDUPLICATED.value() == before + len(FRAME)
+
+
+def test_retried_upload_is_attached_once():
+    session = session_service.create_session("onlocation")
+    _upload(session["id"])
+    _upload(session["id"])
+    assert len(session_service.get_session(session["id"])["photo_urls"]) == 1
+
+
+def test_delete_session_releases_blob_with_last_reference():
+    media_root = Path(get_settings()["media_root"])
+    first = session_service.create_session("onlocation")
+    second = session_service.create_session("onlocation")
+    _upload(first["id"])
+    _upload(second["id"])
+    blob = blob_path(media_root, CHECKSUM, ".jpg")
+
+    assert session_service.delete_session(first["id"])
+    assert blob.exists() and blob.stat().st_nlink == 2
+    assert session_service.delete_session(second["id"])
+    assert not blob.exists()
+
+
+def test_content_addressed_urls_are_cached_immutably():
+    session = session_service.create_session("onlocation")
+    _upload(session["id"])
+    [url] = session_service.get_session(session["id"])["photo_urls"]
+    response = client.get(url)
+    assert response.status_code == 200
+    assert "immutable" in response.headers["cache-control"]
+
+
+def test_storage_usage_counts_a_shared_blob_once():
+    first = session_service.create_session("onlocation")
+    second = session_service.create_session("onlocation")
+    _upload(first["id"])
+    _upload(second["id"])
+
+    def usage():
+        events = client.get("/api/v1/settings/storage").json()["events"]
+        return [(e["bytes"], e["files"]) for e in events]
+
+    assert usage() == [(len(FRAME), 2)]
+    session_service.delete_session(first["id"])
+    assert usage() == [(len(FRAME), 1)]
+    session_service.delete_session(second["id"])
+    assert usage() == []
+
+
+def test_event_stats_count_a_shared_blob_once():
+    first = session_service.create_session("onlocation")
+    second = session_service.create_session("onlocation")
+    _upload(first["id"])
+    _upload(second["id"])
+
+    def event_bytes():
+        events = client.get("/api/v1/settings/events").json()["events"]
+        stats = next(e["stats"] for e in events if e["slug"] == "onlocation")
+        return stats["photos"], stats["bytes"]
+
+    storage = client.get("/api/v1/settings/storage").json()["events"]
+    assert event_bytes() == (2, len(FRAME)) and storage[0]["bytes"] == len(FRAME)
+    session_service.delete_session(first["id"])
+    assert event_bytes() == (1, len(FRAME))
+    session_service.delete_session(second["id"])
+    assert event_bytes() == (0, 0)
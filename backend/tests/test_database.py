@@ -0,0 +1,34 @@
+"""
+Tests for the shared SQLite connection pool.
+"""
+from app.services import database, event_service, session_service
+
+
+def test_schema_created_once_and_versioned():
+    with database.get_connection() as conn:
+        version = conn.execute("PRAGMA user_version").fetchone()[0]
+        tables = {r["name"] for r in conn.execute("SELECT name FROM sqlite_master WHERE type = 'table'")}
+    assert version == len(database.MIGRATIONS)
+    assert {"events", "sessions"} <= tables
+
+
+def test_connections_use_wal_and_are_reused():
+    with database.get_connection() as conn:
+        first = conn
+        assert conn.execute("PRAGMA journal_mode").fetchone()[0] == "wal"
+    with database.get_connection() as conn:
+        assert conn is first
+
+
+def test_uncommitted_work_is_rolled_back_on_return():
+    with database.get_connection() as conn:
+        conn.execute(
+            "INSERT INTO events (name, slug, created_at) VALUES ('X', 'x', datetime('now'))"
+        )
+    assert event_service.get_event_by_slug("x") is None
+
+
+def test_services_share_the_pool():
+    assert event_service.get_event_by_slug("onlocation")["name"] == "On Location"
+    session = session_service.create_session("onlocation")
+    assert session_service.get_session(session["id"], session["token"])["id"] == session["id"]
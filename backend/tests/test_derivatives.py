@@ -0,0 +1,59 @@
+"""
+Tests for resized photo derivatives and their media route.
+"""
+import io
+from pathlib import Path
+
+import pytest
+from fastapi.testclient import TestClient
+from PIL import Image
+
+from app.config import settings
+from app.main import app
+from app.services import derivative_service
+from app.services.settings_store import get_settings
+from app.services.storage_service import StorageService
+
+client = TestClient(app)
+
+
+def _jpeg(width: int, height: int) -> bytes:
+    buf = io.BytesIO()
+    Image.new("RGB", (width, height), (200, 30, 30)).save(buf, "JPEG")
+    return buf.getvalue()
+
+
+@pytest.mark.asyncio
+async def test_upload_schedules_thumb_and_medium(monkeypatch):
+    monkeypatch.setattr(settings, "DERIVATIVES_ENABLED", True)
+    futures = []
+    schedule = derivative_service.schedule
+    monkeypatch.setattr(derivative_service, "schedule", lambda *a: futures.append(schedule(*a)))
+    media_root = Path(get_settings()["media_root"]).resolve()
+    storage = StorageService(media_root=str(media_root))
+    path = await storage.save_upload(_jpeg(3000, 4000), "p.jpg", booth_id="b1", session_id="s1")
+
+    futures[0].result(timeout=60)
+    rel = Path(path).resolve().relative_to(media_root).as_posix()
+
+    for size, edge in derivative_service.SIZES.items():
+        with Image.open(derivative_service.derivative_path(media_root, rel, size)) as im:
+            assert max(im.size) == edge
+            assert im.format == "WEBP"
+
+
+def test_media_route_serves_derivative_or_falls_back_to_original():
+    media_root = Path(get_settings()["media_root"]).resolve()
+    original = media_root / "events" / "onlocation" / "p.jpg"
+    original.parent.mkdir(parents=True)
+    original.write_bytes(_jpeg(64, 64))
+
+    response = client.get("/media/events/onlocation/p.jpg?size=thumb")
+    assert response.status_code == 200
+    assert response.content == original.read_bytes()
+
+    thumb = derivative_service.derivative_path(media_root, "events/onlocation/p.jpg", "thumb")
+    thumb.parent.mkdir(parents=True)
+    thumb.write_bytes(b"thumb-bytes")
+    assert client.get("/media/events/onlocation/p.jpg?size=thumb").content == b"thumb-bytes"
+    assert client.get("/media/events/onlocation/p.jpg?size=huge").status_code == 400
@@ -0,0 +1,87 @@
+"""
+Tests for the per-event statistics kept current by the database.
+"""
+import os
+from datetime import datetime, timedelta
+from pathlib import Path
+
+from fastapi.testclient import TestClient
+
+from app.main import app
+from app.services import database, photo_index, session_service
+from app.services.settings_store import get_settings
+
+client = TestClient(app)
+
+HOUR_NS = 3600 * 10**9
+
+
+def _stats(slug: str = "onlocation") -> dict:
+    events = client.get("/api/v1/settings/events").json()["events"]
+    return next(e["stats"] for e in events if e["slug"] == slug)
+
+
+def _upload(session_id: str, data: bytes) -> Path:
+    response = client.post(
+        "/api/v1/photos/upload",
+        files={"file": ("p.jpg", data, "image/jpeg")},
+        data={"session_id": session_id},
+    )
+    assert response.status_code == 200
+    return Path(response.json()["path"])
+
+
+def _ground_truth(slug: str = "onlocation") -> dict:
+    with database.get_connection() as conn:
+        sessions = conn.execute(
+            "SELECT COUNT(*) FROM sessions WHERE event_slug = ? AND deleted_at IS NULL", (slug,)
+        ).fetchone()[0]
+        photos, size = conn.execute(
+            "SELECT COUNT(*), COALESCE(SUM(file_size), 0) FROM photos WHERE event_slug = ?", (slug,)
+        ).fetchone()
+    return {"sessions": sessions, "photos": photos, "bytes": size}
+
+
+def test_uploads_deletes_and_purges_keep_stats_current():
+    assert _stats() == {"sessions": 0, "photos": 0, "bytes": 0, "hourly": []}
+    kept = session_service.create_session("onlocation")
+    deleted = session_service.create_session("onlocation")
+    purged = session_service.create_session("onlocation")
+    _upload(kept["id"], b"a" * 100)
+    _upload(kept["id"], b"b" * 200)
+    _upload(deleted["id"], b"c" * 300)
+    _upload(purged["id"], b"d" * 400)
+
+    stats = _stats()
+    assert {k: stats[k] for k in ("sessions", "photos", "bytes")} == {"sessions": 3, "photos": 4, "bytes": 1000}
+    assert sum(h["photos"] for h in stats["hourly"]) == 4
+
+    session_service.delete_session(deleted["id"])
+    with database.get_connection() as conn:
+        old = (datetime.utcnow() - timedelta(days=90)).isoformat()
+        conn.execute("UPDATE sessions SET created_at = ? WHERE id = ?", (old, purged["id"]))
+        conn.commit()
+    session_service.purge_expired_sessions(datetime.utcnow() - timedelta(days=30))
+
+    stats = _stats()
+    assert {k: stats[k] for k in ("sessions", "photos", "bytes")} == _ground_truth()
+    assert {k: stats[k] for k in ("sessions", "photos", "bytes")} == {"sessions": 1, "photos": 2, "bytes": 300}
+
+
+def test_hourly_histogram_follows_capture_time():
+    session = session_service.create_session("onlocation")
+    media_root = Path(get_settings()["media_root"]).resolve()
+    base = 1_760_000_000 * 10**9 - (1_760_000_000 * 10**9) % HOUR_NS
+    paths = [_upload(session["id"], bytes([i]) * 10) for i in range(3)]
+    for path, offset in zip(paths, (0, HOUR_NS // 2, HOUR_NS)):
+        os.utime(path, ns=(base + offset, base + offset))
+        photo_index.record_photo(media_root, path, "onlocation", session["id"])
+
+    hour = datetime.utcfromtimestamp(base // 10**9)
+    assert _stats()["hourly"] == [
+        {"hour": f"{hour:%Y-%m-%dT%H}:00:00Z", "photos": 2},
+        {"hour": f"{hour + timedelta(hours=1):%Y-%m-%dT%H}:00:00Z", "photos": 1},
+    ]
+
+    session_service.delete_session(session["id"])
+    assert _stats()["hourly"] == []
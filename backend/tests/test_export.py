@@ -0,0 +1,99 @@
+"""
+Tests for the streaming event ZIP export.
+"""
+import io
+import json
+import os
+import zipfile
+from datetime import date, datetime, timedelta
+from pathlib import Path
+
+from fastapi.testclient import TestClient
+
+from app.main import app
+from app.services import session_service
+from app.services.settings_store import get_settings
+from app.utils.zipstream import ZipArchive, ZipEntry
+
+client = TestClient(app)
+
+EXPORT_URL = "/api/v1/settings/events/wedding/export.zip"
+
+
+def _capture(n: int = 2) -> dict:
+    files = [("files", (f"p{i}.jpg", b"\xff\xd8" + bytes([i]) * 5000, "image/jpeg")) for i in range(n)]
+    response = client.post("/api/v1/sessions/with-photos", files=files, data={"event_slug": "wedding"})
+    assert response.status_code == 200
+    return response.json()
+
+
+def test_export_streams_valid_zip_with_manifest():
+    session = _capture()
+    response = client.get(EXPORT_URL)
+    assert response.status_code == 200
+    assert response.headers["content-type"] == "application/zip"
+    assert int(response.headers["content-length"]) == len(response.content)
+
+    with zipfile.ZipFile(io.BytesIO(response.content)) as zf:
+        assert zf.testzip() is None
+        names = zf.namelist()
+        assert names[0] == "wedding/manifest.json"
+        manifest = json.loads(zf.read("wedding/manifest.json"))
+    assert manifest["photo_count"] == 2
+    [group] = manifest["sessions"]
+    assert group["session_id"] == session["id"]
+    assert [p["name"] for p in group["photos"]] == names[1:]
+    assert all(f"/{session['id']}/" in name for name in names[1:])
+
+
+def test_export_range_resume_matches_full_download():
+    _capture(3)
+    full = client.get(EXPORT_URL)
+    etag = full.headers["etag"]
+    split = len(full.content) // 2 + 7  # somewhere inside a member's data
+    first = client.get(EXPORT_URL, headers={"Range": f"bytes=0-{split - 1}"})
+    rest = client.get(EXPORT_URL, headers={"Range": f"bytes={split}-", "If-Range": etag})
+    assert first.status_code == rest.status_code == 206
+    assert rest.headers["content-range"] == f"bytes {split}-{len(full.content) - 1}/{len(full.content)}"
+    assert first.content + rest.content == full.content
+
+    stale = client.get(EXPORT_URL, headers={"Range": f"bytes={split}-", "If-Range": '"other"'})
+    assert stale.status_code == 200
+    unsatisfiable = client.get(EXPORT_URL, headers={"Range": f"bytes={len(full.content)}-"})
+    assert unsatisfiable.status_code == 416
+
+
+def test_export_date_range_filters_by_modification_time():
+    session = _capture(2)
+    old = Path(session_service.get_session(session["id"])["photo_urls"][0].removeprefix("/media/"))
+    old_path = Path(get_settings()["media_root"]) / old
+    stamp = (datetime.now() - timedelta(days=10)).timestamp()
+    os.utime(old_path, (stamp, stamp))
+
+    today = date.today().isoformat()
+    response = client.get(EXPORT_URL, params={"since": today, "until": today})
+    with zipfile.ZipFile(io.BytesIO(response.content)) as zf:
+        names = zf.namelist()
+    assert len(names) == 2  # manifest + the recent photo
+    assert old_path.name not in "".join(names)
+    assert response.headers["content-disposition"] == f'attachment; filename="wedding_{today}_{today}.zip"'
+
+
+def test_export_rejects_path_like_slug():
+    assert client.get("/api/v1/settings/events/../export.zip").status_code in (400, 404)
+    assert client.get("/api/v1/settings/events/a.b/export.zip").status_code == 400
+
+
+def test_zip64_archive_is_readable(tmp_path):
+    path = tmp_path / "photo.jpg"
+    path.write_bytes(b"z" * 70000)
+    archive = ZipArchive(
+        [ZipEntry.from_file("photo.jpg", path), ZipEntry.from_bytes("note.txt", b"hello", 0)],
+        force_zip64=True,
+    )
+    body = b"".join(archive.iter_bytes())
+    assert len(body) == archive.size
+    with zipfile.ZipFile(io.BytesIO(body)) as zf:
+        assert zf.testzip() is None
+        assert zf.read("photo.jpg") == path.read_bytes()
+        assert zf.read("note.txt") == b"hello"
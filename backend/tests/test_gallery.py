@@ -0,0 +1,63 @@
+"""
+Tests for the cached gallery page.
+"""
+from fastapi.testclient import TestClient
+
+from app.main import app
+from app.services import session_service
+from app.services.gallery_cache import gallery_cache
+
+client = TestClient(app)
+
+
+def _gallery(session, **headers):
+    return client.get(f"/gallery/{session['id']}", params={"token": session["token"]}, headers=headers)
+
+
+def test_gallery_is_cached_and_supports_conditional_get():
+    session = session_service.create_session("onlocation")
+    session_service.add_photo_to_session(session["id"], "/media/events/onlocation/a.jpg")
+
+    first = _gallery(session, **{"Accept-Encoding": "identity"})
+    assert first.status_code == 200
+    assert "/media/events/onlocation/a.jpg?size=medium" in first.text
+    hits = gallery_cache.hits
+    second = _gallery(session, **{"If-None-Match": first.headers["etag"]})
+    assert second.status_code == 304
+    assert gallery_cache.hits == hits + 1
+
+
+def test_gzip_body_is_served_when_accepted():
+    session = session_service.create_session("onlocation")
+    response = client.get(
+        f"/gallery/{session['id']}",
+        params={"token": session["token"]},
+        headers={"Accept-Encoding": "gzip"},
+    )
+    assert response.headers["content-encoding"] == "gzip"
+    assert response.headers["vary"] == "Accept-Encoding"
+    assert "Your Photobooth Photos" in response.text  # httpx decodes gzip
+
+
+def test_cache_is_invalidated_by_session_changes():
+    session = session_service.create_session("onlocation")
+    etag = _gallery(session).headers["etag"]
+
+    session_service.add_photo_to_session(session["id"], "/media/events/onlocation/new.jpg")
+    refreshed = _gallery(session, **{"If-None-Match": etag})
+    assert refreshed.status_code == 200
+    assert "new.jpg" in refreshed.text
+
+    regenerated = session_service.regenerate_session_token(session["id"])
+    assert _gallery(session).status_code == 404
+    assert _gallery(regenerated).status_code == 200
+
+    session_service.delete_session(session["id"])
+    assert _gallery(regenerated).status_code == 404
+
+
+def test_wrong_token_is_not_served_from_cache():
+    session = session_service.create_session("onlocation")
+    _gallery(session)
+    response = client.get(f"/gallery/{session['id']}", params={"token": "wrong"})
+    assert response.status_code == 404
@@ -0,0 +1,94 @@
+"""
+Tests for signed gallery tokens and the revocation cache.
+"""
+from datetime import datetime, timedelta
+
+import pytest
+
+from app.services import gallery_tokens, session_service, settings_store
+from app.services.metrics import GALLERY_TOKEN_REJECTIONS
+
+
+@pytest.fixture(autouse=True)
+def empty_revocations():
+    gallery_tokens.revocations.clear()
+    yield
+    gallery_tokens.revocations.clear()
+
+
+def test_issue_and_verify_round_trip():
+    expires = datetime.utcnow().replace(microsecond=0) + timedelta(hours=1)
+    token = gallery_tokens.issue("abc", 3, expires)
+    claims = gallery_tokens.verify("abc", token)
+    assert claims == gallery_tokens.TokenClaims("abc", 3, expires)
+
+    assert gallery_tokens.verify("other", token) is None
+    assert gallery_tokens.verify("abc", token[:-1] + ("A" if token[-1] != "A" else "B")) is None
+    assert gallery_tokens.verify("abc", "not-a-token") is None
+    past = gallery_tokens.issue("abc", 3, datetime.utcnow() - timedelta(seconds=1))
+    assert gallery_tokens.verify("abc", past) is None
+
+
+def test_bad_links_are_rejected_without_database(monkeypatch):
+    session = session_service.create_session("onlocation")
+    forged = gallery_tokens.issue(session["id"], 1, datetime.utcnow() + timedelta(hours=1))[:-2] + "xx"
+
+    def no_db():
+        raise AssertionError("database queried")
+
+    monkeypatch.setattr(session_service, "_get_connection", no_db)
+    before = GALLERY_TOKEN_REJECTIONS.value(reason="signature")
+    assert session_service.get_session(session["id"], forged) is None
+    assert GALLERY_TOKEN_REJECTIONS.value(reason="signature") == before + 1
+
+
+def test_legacy_unsigned_tokens_fall_back_to_the_session_row():
+    session = session_service.create_session("onlocation")
+    with session_service._get_connection() as conn:
+        conn.execute("UPDATE sessions SET token = 'legacy_Token-123' WHERE id = ?", (session["id"],))
+        conn.commit()
+    assert not gallery_tokens.is_signed("legacy_Token-123")
+    assert session_service.get_session(session["id"], "legacy_Token-123")["id"] == session["id"]
+    assert session_service.get_session(session["id"], "legacy_Token-124") is None
+    assert session_service.get_session(session["id"], session["token"]) is None
+
+
+def test_unsigned_tokens_for_signed_sessions_are_rejected_without_database(monkeypatch):
+    legacy = session_service.create_session("onlocation")
+    with session_service._get_connection() as conn:
+        conn.execute("UPDATE sessions SET token = 'legacy' WHERE id = ?", (legacy["id"],))
+        conn.commit()
+    assert session_service.get_session(legacy["id"], "legacy") is not None  # loads the legacy set
+    session = session_service.create_session("onlocation")
+
+    def no_db():
+        raise AssertionError("database queried")
+
+    monkeypatch.setattr(session_service, "_get_connection", no_db)
+    before = GALLERY_TOKEN_REJECTIONS.value(reason="unsigned")
+    for token in ("x", session["token"].replace(".", ""), "legacy"):
+        assert session_service.get_session(session["id"], token) is None
+    assert GALLERY_TOKEN_REJECTIONS.value(reason="unsigned") == before + 3
+
+
+def test_regenerate_revokes_previous_token_in_memory():
+    session = session_service.create_session("onlocation")
+    updated = session_service.regenerate_session_token(session["id"])
+    assert gallery_tokens.verify(session["id"], session["token"]) is None
+    assert gallery_tokens.verify(session["id"], updated["token"]).version == 2
+    assert session_service.get_session(session["id"], updated["token"]) is not None
+    assert session_service.get_session(session["id"], session["token"]) is None
+
+
+def test_delete_revokes_all_versions():
+    session = session_service.create_session("onlocation")
+    session_service.delete_session(session["id"])
+    assert gallery_tokens.verify(session["id"], session["token"]) is None
+
+
+def test_signing_key_is_persisted_and_kept_by_save_settings():
+    key = settings_store.get_token_secret()
+    settings_store.save_settings(default_event_slug="wedding")
+    settings_store.invalidate_cache()
+    assert settings_store.get_token_secret() == key
+    assert "gallery_token_secret" not in settings_store.get_settings()
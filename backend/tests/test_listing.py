@@ -0,0 +1,97 @@
+"""
+Tests for the keyset-paginated session and event listings.
+"""
+from fastapi.testclient import TestClient
+
+from app.main import app
+from app.services import database, event_service, session_service
+
+client = TestClient(app)
+
+
+def _set_created_at(session_id: str, created_at: str) -> None:
+    with database.get_connection() as conn:
+        conn.execute("UPDATE sessions SET created_at = ? WHERE id = ?", (created_at, session_id))
+        conn.commit()
+
+
+def _pages(url: str, **params) -> list:
+    pages, cursor = [], None
+    while True:
+        query = {**params, **({"cursor": cursor} if cursor else {})}
+        body = client.get(url, params=query).json()
+        pages.append(body)
+        cursor = body["next_cursor"]
+        if not cursor:
+            return pages
+
+
+def test_session_summaries_page_newest_first_without_gaps_on_ties():
+    ids = []
+    for i in range(7):
+        session = session_service.create_session("onlocation")
+        # Pairs share a timestamp, so pages must break ties on id
+        _set_created_at(session["id"], f"2026-01-01T10:00:0{i // 2}")
+        ids.append(session["id"])
+    session_service.add_photos_to_session(ids[0], [{"url": "/media/a.jpg"}, {"url": "/media/b.jpg"}])
+
+    pages = _pages("/api/v1/settings/events/onlocation/sessions", limit=3)
+    assert [len(p["sessions"]) for p in pages] == [3, 3, 1]
+    listed = [s for p in pages for s in p["sessions"]]
+    assert sorted(s["id"] for s in listed) == sorted(ids)
+    assert [(s["created_at"], s["id"]) for s in listed] == sorted(
+        ((s["created_at"], s["id"]) for s in listed), reverse=True
+    )
+    first = next(s for s in listed if s["id"] == ids[0])
+    assert first == {
+        "id": ids[0],
+        "created_at": "2026-01-01T10:00:00",
+        "photo_count": 2,
+        "cover_url": "/media/a.jpg?size=thumb",
+    }
+
+
+def test_session_summaries_filter_by_time_window_and_skip_deleted():
+    times = ["2026-01-01T09:00:00", "2026-01-01T10:30:00", "2026-01-01T12:00:00"]
+    ids = []
+    for created_at in times:
+        session = session_service.create_session("onlocation")
+        _set_created_at(session["id"], created_at)
+        ids.append(session["id"])
+    deleted = session_service.create_session("onlocation")
+    _set_created_at(deleted["id"], "2026-01-01T11:00:00")
+    session_service.delete_session(deleted["id"])
+
+    body = client.get(
+        "/api/v1/settings/events/onlocation/sessions",
+        params={"since": "2026-01-01T10:00:00", "until": "2026-01-01T13:00:00+01:00"},
+    ).json()
+    assert [s["id"] for s in body["sessions"]] == [ids[1]]
+
+
+def test_session_listing_rejects_bad_cursor():
+    response = client.get("/api/v1/settings/events/onlocation/sessions", params={"cursor": "nope"})
+    assert response.status_code == 400
+
+
+def test_session_page_query_uses_the_keyset_index():
+    with database.get_connection() as conn:
+        plan = " ".join(
+            row["detail"] for row in conn.execute(
+                "EXPLAIN QUERY PLAN SELECT id FROM sessions s "
+                "WHERE s.event_slug = ? AND s.deleted_at IS NULL AND (s.created_at, s.id) < (?, ?) "
+                "ORDER BY s.created_at DESC, s.id DESC LIMIT 10",
+                ("onlocation", "2026", "x"),
+            )
+        )
+    assert "idx_sessions_event_keyset" in plan
+    assert "TEMP B-TREE" not in plan
+
+
+def test_events_page_by_name():
+    for name in ["Zed", "Alpha", "Mid", "Alpha"]:
+        event_service.create_event(name)
+    pages = _pages("/api/v1/settings/events", limit=2)
+    names = [e["name"] for p in pages for e in p["events"]]
+    assert names == ["Alpha", "Alpha", "Mid", "On Location", "Zed"]
+    assert client.get("/api/v1/settings/events", params={"cursor": "x"}).status_code == 400
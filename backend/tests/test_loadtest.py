@@ -0,0 +1,37 @@
+"""
+Tests for the load-test harness statistics and a tiny in-process run.
+"""
+import json
+
+from benchmarks import loadtest
+
+
+def test_percentiles_and_baseline_comparison():
+    values = sorted(i / 1000 for i in range(1, 101))
+    assert loadtest.percentile(values, 50) == 0.05
+    assert loadtest.percentile(values, 99) == 0.099
+    steps = loadtest.summarize({"upload_photo": values}, {"upload_photo": 2})
+    assert steps["upload_photo"]["p95_ms"] == 95.0
+    assert steps["upload_photo"]["errors"] == 2
+
+    baseline = {"steps": steps, "throughput": {"requests_per_s": 100.0}}
+    slower = {
+        "steps": {"upload_photo": {**steps["upload_photo"], "p95_ms": 130.0}},
+        "throughput": {"requests_per_s": 95.0},
+    }
+    assert loadtest.compare(baseline, baseline, 20) == []
+    [regression] = loadtest.compare(slower, baseline, 20)
+    assert regression.startswith("upload_photo: p95")
+
+
+def test_in_process_run_writes_results(tmp_path):
+    output = tmp_path / "results.json"
+    code = loadtest.main([
+        "--booths", "1", "--guests", "1", "--seed-sessions", "5",
+        "--photo-kb", "8", "--output", str(output),
+    ])
+    assert code == 0
+    results = json.loads(output.read_text())
+    assert results["steps"]["upload_photo"]["count"] == 3
+    assert results["steps"]["media_medium"]["errors"] == 0
+    assert results["throughput"]["requests"] >= 7
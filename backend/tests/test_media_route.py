@@ -0,0 +1,68 @@
+"""
+Tests for media serving: ETags, conditional GET, ranges and the hot-file cache.
+"""
+from pathlib import Path
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app.main import app
+from app.services.media_cache import media_cache
+from app.services.settings_store import get_settings
+
+client = TestClient(app)
+
+PHOTO = "events/onlocation/booth-1/s1/booth-1_20260101_120000_000001_deadbeef.jpg"
+
+
+@pytest.fixture
+def photo():
+    media_cache.clear()
+    path = Path(get_settings()["media_root"]) / PHOTO
+    path.parent.mkdir(parents=True)
+    path.write_bytes(bytes(range(256)) * 4)
+    return path
+
+
+def test_upload_names_are_served_immutable_with_strong_etag(photo):
+    response = client.get(f"/media/{PHOTO}")
+    assert response.status_code == 200
+    assert response.content == photo.read_bytes()
+    assert "immutable" in response.headers["cache-control"]
+    assert response.headers["etag"].startswith('"')
+
+
+def test_if_none_match_and_if_modified_since_return_304(photo):
+    first = client.get(f"/media/{PHOTO}")
+    etag = first.headers["etag"]
+    assert client.get(f"/media/{PHOTO}", headers={"If-None-Match": etag}).status_code == 304
+    since = first.headers["last-modified"]
+    assert client.get(f"/media/{PHOTO}", headers={"If-Modified-Since": since}).status_code == 304
+    assert client.get(f"/media/{PHOTO}", headers={"If-None-Match": '"other"'}).status_code == 200
+
+
+def test_range_requests(photo):
+    response = client.get(f"/media/{PHOTO}", headers={"Range": "bytes=10-19"})
+    assert response.status_code == 206
+    assert response.content == photo.read_bytes()[10:20]
+    assert response.headers["content-range"] == "bytes 10-19/1024"
+    assert client.get(f"/media/{PHOTO}", headers={"Range": "bytes=5000-"}).status_code == 416
+
+
+def test_repeat_requests_hit_memory_and_see_changes(photo):
+    client.get(f"/media/{PHOTO}")
+    hits = media_cache.hits
+    client.get(f"/media/{PHOTO}")
+    assert media_cache.hits == hits + 1
+
+    media_cache.clear()
+    photo.write_bytes(b"new bytes")
+    assert client.get(f"/media/{PHOTO}").content == b"new bytes"
+
+
+def test_other_files_revalidate_and_traversal_is_rejected(photo):
+    other = photo.parent / "notes.txt"
+    other.write_text("hi")
+    assert client.get(f"/media/{PHOTO.rsplit('/', 1)[0]}/notes.txt").headers["cache-control"] == "no-cache"
+    assert client.get("/media/%2E%2E/settings.json").status_code == 403
+    assert client.get("/media/events/missing.jpg").status_code == 404
@@ -0,0 +1,50 @@
+"""
+Tests for /metrics and the /health readiness check.
+"""
+from fastapi.testclient import TestClient
+
+from app.config import settings
+from app.main import app
+from app.services import session_service
+from app.services.metrics import DB_QUERY_SECONDS, HTTP_REQUEST_SECONDS, STORAGE_BYTES_WRITTEN
+
+client = TestClient(app)
+
+
+def test_requests_are_recorded_per_route_template():
+    session = session_service.create_session("onlocation")
+    before = HTTP_REQUEST_SECONDS.count(route="/gallery/{session_id}", method="GET", status=200)
+    client.get(f"/gallery/{session['id']}", params={"token": session["token"]})
+    assert HTTP_REQUEST_SECONDS.count(route="/gallery/{session_id}", method="GET", status=200) == before + 1
+
+
+def test_metrics_exposition_covers_db_storage_and_caches():
+    session = session_service.create_session("onlocation")
+    written = STORAGE_BYTES_WRITTEN.value()
+    client.post(
+        "/api/v1/photos/upload",
+        files={"file": ("p.jpg", b"\xff\xd8" + b"x" * 98, "image/jpeg")},
+        data={"session_id": session["id"]},
+    )
+    assert STORAGE_BYTES_WRITTEN.value() == written + 100
+    assert DB_QUERY_SECONDS.count(operation="add_photo_to_session") >= 1
+
+    body = client.get("/metrics").text
+    assert "# TYPE photobooth_http_request_duration_seconds histogram" in body
+    assert 'photobooth_http_request_duration_seconds_bucket{route="/api/v1/photos/upload",method="POST",status="200",le="+Inf"}' in body
+    assert 'photobooth_db_operation_duration_seconds_count{operation="create_session"}' in body
+    assert 'photobooth_cache_requests_total{cache="media",result="hit"}' in body
+    assert 'photobooth_media_root_bytes{kind="free"}' in body
+
+
+def test_health_reports_each_check():
+    body = client.get("/health").json()
+    assert body["status"] == "healthy"
+    assert set(body["checks"]) == {"database", "media_root_writable", "free_space"}
+
+
+def test_health_is_unavailable_when_disk_is_nearly_full(monkeypatch):
+    monkeypatch.setattr(settings, "HEALTH_MIN_FREE_MB", 10**12)
+    response = client.get("/health")
+    assert response.status_code == 503
+    assert response.json()["checks"]["free_space"]["ok"] is False
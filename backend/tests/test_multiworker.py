@@ -0,0 +1,131 @@
+"""
+Tests for running several worker processes against one database and settings file.
+"""
+import json
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timedelta
+
+import pytest
+
+from app.services import cache_sync, database, gallery_tokens, session_service, settings_store
+from app.services.cache_sync import CachePoller
+from app.services.gallery_cache import gallery_cache
+from app.services.retention_service import RetentionReaper
+from app.utils.file_lock import file_lock
+
+WORKERS = 4
+
+
+def _worker_init(db_path, settings_file):
+    # A forked child must not reuse the parent's SQLite connections
+    database._pool = None
+    database.DB_PATH = db_path
+    settings_store.SETTINGS_FILE = settings_file
+    settings_store.invalidate_cache()
+
+
+def _worker_identity(_):
+    return settings_store.get_settings()["booth_id"], settings_store.get_token_secret()
+
+
+def _worker_upload(args):
+    session_id, worker = args
+    for i in range(10):
+        session_service.add_photo_to_session(session_id, f"/media/w{worker}-{i}.jpg")
+
+
+def _pool():
+    return ProcessPoolExecutor(
+        WORKERS,
+        mp_context=multiprocessing.get_context("fork"),
+        initializer=_worker_init,
+        initargs=(database.DB_PATH, settings_store.SETTINGS_FILE),
+    )
+
+
+def test_file_lock_excludes_a_second_holder(tmp_path):
+    path = tmp_path / ".test.lock"
+    with file_lock(path) as held:
+        assert held
+        with file_lock(path, blocking=False) as other:
+            assert not other
+    with file_lock(path, blocking=False) as held:
+        assert held
+
+
+def test_workers_agree_on_booth_id_and_signing_key():
+    with _pool() as pool:
+        identities = set(pool.map(_worker_identity, range(WORKERS * 2)))
+    assert len(identities) == 1
+    booth_id, secret = identities.pop()
+    settings_store.invalidate_cache()
+    assert settings_store.get_settings()["booth_id"] == booth_id
+    assert settings_store.get_token_secret() == secret
+
+
+def test_concurrent_uploads_from_workers_lose_nothing():
+    session = session_service.create_session("onlocation")
+    database.close_db()
+    with _pool() as pool:
+        list(pool.map(_worker_upload, [(session["id"], w) for w in range(WORKERS)]))
+    photos = session_service.get_session(session["id"])["photo_urls"]
+    assert len(photos) == WORKERS * 10
+    assert len(set(photos)) == WORKERS * 10
+
+
+def test_changes_from_other_workers_reach_local_caches(monkeypatch):
+    session = session_service.create_session("onlocation")
+    poller = CachePoller()
+    assert poller.poll_once() == 0  # starts from the current end of the log
+
+    # Our own changes were applied at commit time and are skipped by the poller
+    session_service.add_photo_to_session(session["id"], "/media/a.jpg")
+    assert poller.poll_once() == 0
+
+    with monkeypatch.context() as m:
+        m.setattr(cache_sync, "ORIGIN", "another-worker")
+        session_service.regenerate_session_token(session["id"])
+    gallery_tokens.revocations.clear()
+    epoch = gallery_cache.epoch
+
+    assert poller.poll_once() == 1
+    assert gallery_cache.epoch > epoch
+    assert gallery_tokens.verify(session["id"], session["token"]) is None
+
+
+def test_changes_are_logged_without_any_worker_configuration():
+    # Another process on the same database may be running; nothing tells this one
+    session = session_service.create_session("onlocation")
+    session_service.add_photo_to_session(session["id"], "/media/a.jpg")
+    session_service.delete_session(session["id"])
+    with database.get_connection() as conn:
+        assert conn.execute("SELECT COUNT(*) FROM cache_events").fetchone()[0] == 2
+
+
+def test_old_cache_events_are_pruned(monkeypatch):
+    session = session_service.create_session("onlocation")
+    session_service.add_photo_to_session(session["id"], "/media/a.jpg")
+    monkeypatch.setattr(cache_sync, "EVENT_RETENTION_SECONDS", -1)
+    poller = CachePoller()
+    poller.poll_once()
+    poller.poll_once()
+    with database.get_connection() as conn:
+        assert conn.execute("SELECT COUNT(*) FROM cache_events").fetchone()[0] == 0
+
+
+@pytest.mark.asyncio
+async def test_only_one_worker_sweeps_at_a_time():
+    reaper = RetentionReaper(retention_days=30)
+    with file_lock(database.lock_path(database.DB_PATH, "reaper")):
+        assert not await reaper.run_if_leader()
+    assert reaper.stats["skipped_locked"] == 1 and reaper.stats["runs"] == 0
+    assert await reaper.run_if_leader()
+    assert reaper.stats["runs"] == 1
+
+
+def test_revocations_survive_the_sync_payload_round_trip():
+    expires = datetime.utcnow() + timedelta(hours=1)
+    change = {"revoke": [gallery_tokens.ALL_VERSIONS, expires.isoformat()]}
+    cache_sync.apply("s1", json.loads(json.dumps(change)))
+    assert gallery_tokens.revocations.is_revoked("s1", 10**9)
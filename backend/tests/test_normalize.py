@@ -0,0 +1,127 @@
+"""
+Tests for the upload normalization stage (orientation, metadata stripping, re-encoding).
+"""
+import io
+import os
+from concurrent.futures import Future
+from pathlib import Path
+
+import pytest
+from fastapi.testclient import TestClient
+from PIL import Image
+
+from app.config import settings
+from app.main import app
+from app.services import database, normalize_service
+from app.services.settings_store import get_settings
+
+client = TestClient(app)
+
+ORIENTATION = 0x0112
+GPS_IFD = 0x8825
+
+
+def _photo(width: int = 400, height: int = 300, orientation: int = 1, noisy: bool = False) -> bytes:
+    """A camera-style JPEG: EXIF orientation and a GPS position, saved at quality 100."""
+    if noisy:
+        im = Image.frombytes("RGB", (width, height), os.urandom(width * height * 3))
+    else:
+        im = Image.linear_gradient("L").resize((width, height)).convert("RGB")
+    exif = Image.Exif()
+    exif[ORIENTATION] = orientation
+    exif.get_ifd(GPS_IFD)[2] = (52.0, 22.0, 12.5)  # GPSLatitude
+    buf = io.BytesIO()
+    im.save(buf, "JPEG", quality=100, exif=exif)
+    return buf.getvalue()
+
+
+def _file(tmp_path, data: bytes) -> str:
+    path = tmp_path / "upload"
+    path.write_bytes(data)
+    return str(path)
+
+
+def test_rotates_upright_and_strips_exif(tmp_path):
+    original = _photo(400, 300, orientation=6)
+    out = normalize_service._normalize(_file(tmp_path, original), "JPEG", 85, 0, 0)
+    with Image.open(io.BytesIO(out)) as im:
+        assert im.size == (300, 400)
+        assert not im.getexif()
+        assert "exif" not in im.info
+        assert im.info.get("progressive")
+    assert len(out) < len(original)
+
+
+def test_size_budget_steps_quality_down(tmp_path):
+    path = _file(tmp_path, _photo(600, 600, noisy=True))
+    unconstrained = normalize_service._normalize(path, "JPEG", 95, 0, 0)
+    budget = int(len(unconstrained) * 0.8)
+    out = normalize_service._normalize(path, "JPEG", 95, 0, budget)
+    assert len(out) <= budget
+
+
+def test_max_edge_and_alpha_flattening(tmp_path):
+    im = Image.new("RGBA", (2000, 1000), (0, 0, 0, 0))
+    buf = io.BytesIO()
+    im.save(buf, "PNG")
+    out = normalize_service._normalize(_file(tmp_path, buf.getvalue()), "JPEG", 85, 500, 0)
+    with Image.open(io.BytesIO(out)) as result:
+        assert result.size == (500, 250)
+        assert result.mode == "RGB"
+        assert result.getpixel((10, 10)) == (255, 255, 255)
+
+
+def test_upload_is_normalized_and_sizes_are_recorded(monkeypatch):
+    monkeypatch.setattr(settings, "NORMALIZE_UPLOADS", True)
+    original = _photo(800, 600, orientation=8)
+    response = client.post(
+        "/api/v1/photos/upload",
+        files={"file": ("capture.jpeg", original, "image/jpeg")},
+    )
+    assert response.status_code == 200
+    url = response.json()["url"]
+    assert url.endswith(".jpg")
+
+    stored = Path(get_settings()["media_root"]).resolve() / url.removeprefix("/media/")
+    with Image.open(stored) as im:
+        assert im.size == (600, 800)
+        assert not im.getexif()
+    with database.get_connection() as conn:
+        row = conn.execute("SELECT file_size, original_size FROM photos").fetchone()
+    assert row["original_size"] == len(original)
+    assert row["file_size"] == stored.stat().st_size < len(original)
+
+
+def test_undecodable_upload_is_stored_as_received(monkeypatch):
+    monkeypatch.setattr(settings, "NORMALIZE_UPLOADS", True)
+    response = client.post(
+        "/api/v1/photos/upload",
+        files={"file": ("broken.png", b"not really a png", "image/png")},
+    )
+    assert response.status_code == 200
+    url = response.json()["url"]
+    assert url.endswith(".png")
+    stored = Path(get_settings()["media_root"]).resolve() / url.removeprefix("/media/")
+    assert stored.read_bytes() == b"not really a png"
+
+
+def _done(result) -> Future:
+    future = Future()
+    future.set_result(result)
+    return future
+
+
+@pytest.mark.asyncio
+async def test_pool_reads_uploads_from_disk(tmp_path, monkeypatch):
+    submitted = []
+    monkeypatch.setattr(normalize_service.pool, "submit", lambda fn, *args: submitted.append(args[0]) or _done(b"x"))
+    # A file with a path of its own (a resumable upload's data) is handed over as is
+    path = _file(tmp_path, _photo())
+    with open(path, "rb") as source:
+        out, _, original_size = await normalize_service.normalize(source, "a.jpg")
+    assert submitted == [path] and out.read() == b"x" and original_size == len(_photo())
+
+    # Anything else is streamed to a temp file, removed once the encode is done
+    out, _, original_size = await normalize_service.normalize(io.BytesIO(_photo()), "a.jpg")
+    assert submitted[1] != path and not os.path.exists(submitted[1])
+    assert original_size == len(_photo())
@@ -0,0 +1,84 @@
+"""
+Tests for the indexed event photo listing.
+"""
+import os
+import sqlite3
+from pathlib import Path
+
+from fastapi.testclient import TestClient
+
+from app.main import app
+from app.services import database, photo_index
+from app.services.settings_store import get_settings
+
+client = TestClient(app)
+
+
+def _media_root() -> Path:
+    return Path(get_settings()["media_root"])
+
+
+def test_uploads_are_listed_newest_first_with_cursor_pages():
+    urls = []
+    for i in range(5):
+        response = client.post(
+            "/api/v1/photos/upload",
+            files={"file": (f"p{i}.jpg", b"\xff\xd8" + bytes([i]) * 10, "image/jpeg")},
+        )
+        path = Path(response.json()["path"])
+        os.utime(path, ns=(i * 10**9, i * 10**9))
+        photo_index.record_photo(_media_root(), path, "onlocation")
+        urls.append(response.json()["url"])
+
+    first = client.get("/api/v1/settings/events/onlocation/photos?limit=2").json()
+    assert first["photos"] == [urls[4], urls[3]]
+    second = client.get(f"/api/v1/settings/events/onlocation/photos?limit=2&cursor={first['next_cursor']}").json()
+    assert second["photos"] == [urls[2], urls[1]]
+    third = client.get(f"/api/v1/settings/events/onlocation/photos?limit=2&cursor={second['next_cursor']}").json()
+    assert third == {"photos": [urls[0]], "next_cursor": None}
+
+
+def test_invalid_cursor_is_rejected():
+    assert client.get("/api/v1/settings/events/onlocation/photos?cursor=nope").status_code == 400
+
+
+def test_reconcile_picks_up_out_of_band_changes():
+    event_dir = _media_root() / "events" / "party" / "booth-1" / "s1"
+    event_dir.mkdir(parents=True)
+    (event_dir / "copied.jpg").write_bytes(b"x")
+    (event_dir / ".pending.jpg.part").write_bytes(b"x")
+
+    assert client.post("/api/v1/settings/events/party/photos/reconcile").json() == {"added": 1, "removed": 0}
+    assert client.get("/api/v1/settings/events/party/photos").json()["photos"] == [
+        "/media/events/party/booth-1/s1/copied.jpg"
+    ]
+
+    (event_dir / "copied.jpg").unlink()
+    assert photo_index.reconcile_event(_media_root(), "party") == {"added": 0, "removed": 1}
+    assert client.get("/api/v1/settings/events/party/photos").json()["photos"] == []
+
+
+def test_reconcile_does_not_hold_the_write_lock_while_scanning(monkeypatch):
+    event_dir = _media_root() / "events" / "party" / "booth-1" / "s1"
+    event_dir.mkdir(parents=True)
+    for i in range(5):
+        (event_dir / f"{i}.jpg").write_bytes(b"x" * (i + 1))
+    monkeypatch.setattr(photo_index, "RECONCILE_BATCH_SIZE", 2)
+    read_dimensions = photo_index.read_dimensions
+    writes = []
+
+    def write_from_another_connection(path):
+        # timeout=0: fail at once instead of waiting out a held lock
+        other = sqlite3.connect(str(database.DB_PATH), timeout=0)
+        try:
+            other.execute("BEGIN IMMEDIATE")
+            other.execute("INSERT INTO events (slug, name, created_at) VALUES (?, ?, datetime('now'))", (path.name, "x"))
+            other.commit()
+            writes.append(path.name)
+        finally:
+            other.close()
+        return read_dimensions(path)
+
+    monkeypatch.setattr(photo_index, "read_dimensions", write_from_another_connection)
+    assert photo_index.reconcile_event(_media_root(), "party") == {"added": 5, "removed": 0}
+    assert len(writes) == 5
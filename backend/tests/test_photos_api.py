@@ -0,0 +1,48 @@
+"""
+Tests for the photo upload API.
+"""
+from pathlib import Path
+
+from fastapi.testclient import TestClient
+
+from app.main import app
+from app.services import session_service
+from app.services.settings_store import get_settings
+
+client = TestClient(app)
+
+
+def _upload(data: bytes, session_id: str = None):
+    form = {"session_id": session_id} if session_id else {}
+    return client.post(
+        "/api/v1/photos/upload",
+        files={"file": ("photo.jpg", data, "image/jpeg")},
+        data=form,
+    )
+
+
+def test_upload_streams_file_and_attaches_to_session():
+    session = session_service.create_session("onlocation")
+    data = b"\xff\xd8" + b"x" * (3 * 1024 * 1024)
+    response = _upload(data, session["id"])
+    assert response.status_code == 200
+    saved = Path(response.json()["path"])
+    assert saved.read_bytes() == data
+    assert not list(saved.parent.glob(".*.part"))
+    photos = session_service.get_session(session["id"])["photo_urls"]
+    assert photos == [response.json()["url"]]
+
+
+def test_upload_rejects_empty_file():
+    response = _upload(b"")
+    assert response.status_code == 400
+    media_root = Path(get_settings()["media_root"])
+    assert not [p for p in media_root.rglob("*") if p.is_file()]
+
+
+def test_upload_rejects_unsupported_type():
+    response = client.post(
+        "/api/v1/photos/upload",
+        files={"file": ("notes.txt", b"hello", "text/plain")},
+    )
+    assert response.status_code == 400
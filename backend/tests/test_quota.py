@@ -0,0 +1,119 @@
+"""
+Tests for storage accounting, upload quotas and the free-space watchdog.
+"""
+import os
+import shutil
+import time
+from datetime import datetime, timedelta
+from pathlib import Path
+
+from fastapi.testclient import TestClient
+
+from app.config import settings
+from app.main import app
+from app.services import database, quota_service, session_service
+from app.services.quota_service import MB, StorageWatchdog
+from app.services.settings_store import get_settings
+
+client = TestClient(app)
+
+
+def _media_root() -> Path:
+    return Path(get_settings()["media_root"]).resolve()
+
+
+def _upload(session_id: str, data: bytes):
+    return client.post(
+        "/api/v1/photos/upload",
+        files={"file": ("p.jpg", data, "image/jpeg")},
+        data={"session_id": session_id},
+    )
+
+
+def _file(rel: str, size: int, age_days: float = 0) -> Path:
+    path = _media_root() / rel
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_bytes(b"x" * size)
+    if age_days:
+        old = time.time() - age_days * 86400
+        os.utime(path, (old, old))
+    return path
+
+
+def _disk(free: int):
+    return lambda path: shutil._ntuple_diskusage(100 * MB, 100 * MB - free, free)
+
+
+def test_usage_is_tracked_per_event_and_booth_at_write_and_delete():
+    session = session_service.create_session("onlocation")
+    assert _upload(session["id"], b"a" * 1000).status_code == 200
+    assert _upload(session["id"], b"b" * 500).status_code == 200
+
+    usage = client.get("/api/v1/settings/storage").json()
+    [event] = usage["events"]
+    assert (event["event_slug"], event["bytes"], event["files"]) == ("onlocation", 1500, 2)
+    assert event["booths"] == [{"booth_id": get_settings()["booth_id"], "bytes": 1500, "files": 2}]
+    assert usage["disk"]["free_bytes"] > 0
+
+    session_service.delete_session(session["id"])
+    assert client.get("/api/v1/settings/storage").json()["events"] == []
+
+
+def test_event_quota_refuses_uploads_with_507(monkeypatch):
+    monkeypatch.setattr(settings, "STORAGE_EVENT_QUOTA_MB", 1)
+    session = session_service.create_session("onlocation")
+    assert _upload(session["id"], b"a" * (MB // 2)).status_code == 200
+    response = _upload(session["id"], b"b" * (MB // 2 + 1))
+    assert response.status_code == 507
+    assert "onlocation" in response.json()["detail"]
+    assert len(session_service.get_session(session["id"])["photo_urls"]) == 1
+
+
+def test_low_free_space_refuses_uploads(monkeypatch):
+    monkeypatch.setattr(quota_service, "disk_usage", _disk(settings.STORAGE_MIN_FREE_MB * MB))
+    session = session_service.create_session("onlocation")
+    assert _upload(session["id"], b"a" * 10).status_code == 507
+
+
+def test_regenerable_files_are_evicted_oldest_first():
+    oldest = _file("derivatives/thumb/events/e/b/s/1.webp", 100, age_days=3)
+    middle = _file("processed/strip.jpg", 100, age_days=2)
+    newest = _file("derivatives/medium/events/e/b/s/1.webp", 100, age_days=1)
+    assert quota_service.evict_regenerable(_media_root(), 150) == (2, 200)
+    assert not oldest.exists() and not middle.exists() and newest.exists()
+
+
+def test_watchdog_evicts_derivatives_then_expired_sessions(monkeypatch):
+    derivative = _file("derivatives/thumb/events/onlocation/b/x/1.webp", 1000)
+
+    expired = session_service.create_session("onlocation")
+    recently_expired = session_service.create_session("onlocation")
+    live = session_service.create_session("onlocation")
+    for session in (expired, recently_expired, live):
+        assert _upload(session["id"], b"p" * 1000).status_code == 200
+    grace = timedelta(hours=settings.STORAGE_EVICT_GRACE_HOURS)
+    with database.get_connection() as conn:
+        for session, expired_at in ((expired, datetime.utcnow() - grace - timedelta(hours=1)),
+                                    (recently_expired, datetime.utcnow() - timedelta(hours=1))):
+            conn.execute("UPDATE sessions SET expires_at = ? WHERE id = ?", (expired_at.isoformat(), session["id"]))
+        conn.commit()
+
+    monkeypatch.setattr(quota_service, "disk_usage", _disk(0))
+    monkeypatch.setattr(settings, "STORAGE_HIGH_WATERMARK_MB", 1)
+    stats = StorageWatchdog().check_once()
+    assert not derivative.exists()
+    assert stats["files_evicted"] == 1
+    assert stats["sessions_evicted"] == 1
+    assert stats["bytes_evicted"] == 2000
+    assert session_service.get_session(expired["id"]) is None
+    # Within the grace period the link has expired but the photos are kept
+    with database.get_connection() as conn:
+        assert conn.execute("SELECT 1 FROM sessions WHERE id = ?", (recently_expired["id"],)).fetchone()
+    assert session_service.get_session(live["id"])["photo_urls"]
+
+
+def test_watchdog_leaves_data_alone_above_the_watermark():
+    derivative = _file("derivatives/thumb/events/onlocation/b/x/1.webp", 1000)
+    stats = StorageWatchdog().check_once()
+    assert stats["checks"] == 1 and stats["evictions"] == 0
+    assert derivative.exists()
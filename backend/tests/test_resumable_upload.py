@@ -0,0 +1,131 @@
+"""
+Tests for resumable (tus-like) photo uploads.
+"""
+import base64
+from pathlib import Path
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app.config import settings
+from app.main import app
+from app.services import session_service, upload_service
+from app.services.quota_service import MB
+from app.services.settings_store import get_settings
+
+client = TestClient(app)
+
+DATA = b"\xff\xd8" + b"r" * 300_000
+
+
+def _b64(value: str) -> str:
+    return base64.b64encode(value.encode()).decode()
+
+
+def _create(length: int = len(DATA), session_id: str = None) -> str:
+    metadata = f"filename {_b64('photo.jpg')},filetype {_b64('image/jpeg')}"
+    if session_id:
+        metadata += f",session_id {_b64(session_id)}"
+    response = client.post(
+        "/api/v1/photos/uploads",
+        headers={"Upload-Length": str(length), "Upload-Metadata": metadata},
+    )
+    assert response.status_code == 201
+    assert response.headers["upload-offset"] == "0"
+    return response.headers["location"]
+
+
+def _patch(location: str, offset: int, chunk: bytes):
+    return client.patch(
+        location,
+        content=chunk,
+        headers={"Upload-Offset": str(offset), "Content-Type": "application/offset+octet-stream"},
+    )
+
+
+def test_resume_after_partial_upload_and_attach_to_session():
+    session = session_service.create_session("onlocation")
+    location = _create(session_id=session["id"])
+
+    first = _patch(location, 0, DATA[:100_000])
+    assert first.status_code == 204
+    assert first.headers["upload-offset"] == "100000"
+
+    # A retried chunk from a stale offset is refused; HEAD says where to resume
+    assert _patch(location, 0, DATA[:100_000]).status_code == 409
+    status = client.head(location)
+    assert status.headers["upload-offset"] == "100000"
+    assert status.headers["upload-length"] == str(len(DATA))
+
+    assert client.post(f"{location}/complete").status_code == 409
+    assert _patch(location, 100_000, DATA[100_000:]).status_code == 204
+
+    done = client.post(f"{location}/complete")
+    assert done.status_code == 200
+    assert Path(done.json()["path"]).read_bytes() == DATA
+    assert session_service.get_session(session["id"])["photo_urls"] == [done.json()["url"]]
+    # A retried complete (e.g. the response was lost) returns the same photo
+    assert client.post(f"{location}/complete").json() == done.json()
+
+
+def test_complete_cut_off_before_recording_its_result_is_not_stored_twice(monkeypatch):
+    session = session_service.create_session("onlocation")
+    location = _create(session_id=session["id"])
+    _patch(location, 0, DATA)
+
+    def crash(*args):
+        raise RuntimeError("worker died")
+
+    finish = upload_service.mark_finished
+    monkeypatch.setattr(upload_service, "mark_finished", crash)
+    with pytest.raises(RuntimeError):
+        client.post(f"{location}/complete")
+    monkeypatch.setattr(upload_service, "mark_finished", finish)
+
+    [url] = session_service.get_session(session["id"])["photo_urls"]
+    retried = client.post(f"{location}/complete")
+    assert retried.status_code == 200
+    assert retried.json()["url"] == url
+    assert session_service.get_session(session["id"])["photo_urls"] == [url]
+
+
+def test_complete_is_checked_against_quotas(monkeypatch):
+    monkeypatch.setattr(settings, "STORAGE_EVENT_QUOTA_MB", 1)
+    data = b"\xff\xd8" + b"q" * MB
+    location = _create(len(data))
+    assert _patch(location, 0, data).status_code == 204
+    response = client.post(f"{location}/complete")
+    assert response.status_code == 507
+    assert client.head(location).headers["upload-offset"] == str(len(data))
+
+
+def test_upload_state_is_not_served_as_media():
+    location = _create()
+    _patch(location, 0, DATA[:5000])
+    upload_id = location.rsplit("/", 1)[-1]
+    assert client.get(f"/media/.uploads/{upload_id}/info.json").status_code == 404
+    assert client.get(f"/media/.uploads/{upload_id}/data.part").status_code == 404
+
+
+def test_partial_state_lives_on_disk():
+    location = _create()
+    _patch(location, 0, DATA[:5000])
+    upload_id = location.rsplit("/", 1)[-1]
+    media_root = Path(get_settings()["media_root"])
+    # A fresh process only has what is on disk
+    assert upload_service.get_upload(media_root, upload_id)["offset"] == 5000
+
+
+def test_rejects_overlong_chunk_and_unknown_upload():
+    location = _create(length=10)
+    assert _patch(location, 0, b"x" * 11).status_code == 413
+    assert client.head("/api/v1/photos/uploads/unknownuploadid0000").status_code == 404
+    assert client.delete(location).status_code == 204
+    assert client.head(location).status_code == 404
+
+
+def test_cleanup_stale_uploads():
+    _create()
+    media_root = Path(get_settings()["media_root"])
+    assert upload_service.cleanup_stale(media_root, max_age_seconds=3600) == 0
+    assert upload_service.cleanup_stale(media_root, max_age_seconds=-1) == 1
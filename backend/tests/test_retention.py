@@ -0,0 +1,80 @@
+"""
+Tests for the background retention reaper.
+"""
+import os
+import time
+from datetime import datetime, timedelta
+from pathlib import Path
+
+import pytest
+
+from app.services import database, photo_index, session_service
+from app.services.retention_service import RetentionReaper
+from app.services.settings_store import get_settings
+
+
+def _media_root() -> Path:
+    return Path(get_settings()["media_root"]).resolve()
+
+
+def _photo(rel: str, age_days: float = 0) -> str:
+    path = _media_root() / rel
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_bytes(b"photo")
+    if age_days:
+        old = time.time() - age_days * 86400
+        os.utime(path, (old, old))
+    return f"/media/{rel}"
+
+
+@pytest.mark.asyncio
+async def test_orphans_are_marked_by_the_reaper_not_the_listing():
+    kept = session_service.create_session("onlocation")
+    session_service.add_photo_to_session(kept["id"], _photo("events/onlocation/b/s1/a.jpg"))
+    orphan = session_service.create_session("onlocation")
+    session_service.add_photo_to_session(orphan["id"], "/media/events/onlocation/b/s2/gone.jpg")
+
+    assert len(session_service.list_sessions_for_event("onlocation")) == 2
+
+    stats = await RetentionReaper(retention_days=30).run_once()
+    assert stats["sessions_orphaned"] == 1
+    assert [s["id"] for s in session_service.list_sessions_for_event("onlocation")] == [kept["id"]]
+
+
+@pytest.mark.asyncio
+async def test_expired_sessions_and_files_are_hard_deleted():
+    old = session_service.create_session("onlocation")
+    url = _photo("events/onlocation/b/old/a.jpg", age_days=40)
+    session_service.add_photo_to_session(old["id"], url)
+    with database.get_connection() as conn:
+        created = (datetime.utcnow() - timedelta(days=40)).isoformat()
+        conn.execute("UPDATE sessions SET created_at = ? WHERE id = ?", (created, old["id"]))
+        conn.commit()
+    stale = _media_root() / "uploads" / "stale.jpg"
+    _photo("uploads/stale.jpg", age_days=40)
+    fresh = _media_root() / "uploads" / "fresh.jpg"
+    _photo("uploads/fresh.jpg")
+
+    stats = await RetentionReaper(retention_days=30, batch_size=1).run_once()
+
+    assert stats["sessions_purged"] == 1
+    assert stats["files_deleted"] == 1
+    assert not (_media_root() / "events/onlocation/b/old/a.jpg").exists()
+    assert not stale.exists() and fresh.exists()
+    with database.get_connection() as conn:
+        assert conn.execute("SELECT COUNT(*) FROM sessions").fetchone()[0] == 0
+        assert conn.execute("SELECT COUNT(*) FROM session_photos").fetchone()[0] == 0
+
+
+@pytest.mark.asyncio
+async def test_swept_files_leave_the_photo_index():
+    # A loose photo, indexed but in no session, outlives the retention period
+    _photo("events/onlocation/b/loose/a.jpg", age_days=40)
+    photo_index.record_photo(_media_root(), _media_root() / "events/onlocation/b/loose/a.jpg", "onlocation")
+
+    stats = await RetentionReaper(retention_days=30).run_once()
+
+    assert stats["files_deleted"] == 1
+    with database.get_connection() as conn:
+        assert conn.execute("SELECT COUNT(*) FROM photos").fetchone()[0] == 0
+        assert conn.execute("SELECT COALESCE(SUM(bytes), 0) FROM storage_usage").fetchone()[0] == 0
@@ -0,0 +1,70 @@
+"""
+Tests for live session updates (in-process pub/sub and the SSE stream).
+"""
+import asyncio
+import json
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app.api.gallery import session_event_response
+from app.main import app
+from app.services import session_service
+from app.services.session_events import session_events
+
+client = TestClient(app)
+
+
+def _parse(chunk: str) -> dict:
+    data = [line for line in chunk.splitlines() if line.startswith("data: ")][-1]
+    return json.loads(data[len("data: "):])
+
+
+@pytest.mark.asyncio
+async def test_stream_pushes_photos_as_they_land_then_closes_on_delete():
+    session = session_service.create_session("onlocation")
+    session_service.add_photo_to_session(session["id"], "/media/a.jpg")
+
+    response = await session_event_response(session["id"], session["token"])
+    stream = response.body_iterator
+    assert _parse(await anext(stream))["photo_urls"] == ["/media/a.jpg"]
+    assert session_events.subscriber_count == 1
+
+    # Uploads commit from worker threads
+    await asyncio.to_thread(session_service.add_photo_to_session, session["id"], "/media/b.jpg")
+    assert _parse(await anext(stream))["photo_urls"] == ["/media/a.jpg", "/media/b.jpg"]
+
+    await asyncio.to_thread(session_service.delete_session, session["id"])
+    assert "event: deleted" in await anext(stream)
+    with pytest.raises(StopAsyncIteration):
+        await anext(stream)
+    assert session_events.subscriber_count == 0
+
+
+@pytest.mark.asyncio
+async def test_slow_subscriber_keeps_only_recent_snapshots():
+    subscription = session_events.subscribe("s1")
+    try:
+        for i in range(20):
+            session_events.publish("s1", {"type": "photos", "photo_urls": [str(i)]})
+        await asyncio.sleep(0)
+        events = []
+        while (event := await subscription.get(0.01)) is not None:
+            events.append(event)
+        assert len(events) <= 4
+        assert events[-1]["photo_urls"] == ["19"]
+    finally:
+        session_events.unsubscribe(subscription)
+
+
+def test_gallery_events_requires_valid_token():
+    session = session_service.create_session("onlocation")
+    response = client.get(f"/gallery/{session['id']}/events", params={"token": "wrong"})
+    assert response.status_code == 404
+    assert session_events.subscriber_count == 0
+
+
+def test_gallery_page_subscribes_to_live_updates():
+    session = session_service.create_session("onlocation")
+    page = client.get(f"/gallery/{session['id']}", params={"token": session["token"]})
+    assert "new EventSource" in page.text
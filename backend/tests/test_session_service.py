@@ -0,0 +1,54 @@
+"""
+Tests for session persistence in the session_photos child table.
+"""
+import json
+import sqlite3
+import threading
+
+from app.services import database, session_service
+
+
+def test_photos_are_returned_in_upload_order():
+    session = session_service.create_session("onlocation")
+    for i in range(3):
+        session_service.add_photo_to_session(session["id"], f"/media/p{i}.jpg", file_size=10, checksum="x")
+    fetched = session_service.get_session(session["id"], session["token"])
+    assert fetched["photo_urls"] == ["/media/p0.jpg", "/media/p1.jpg", "/media/p2.jpg"]
+
+
+def test_add_photo_to_unknown_session_returns_none():
+    assert session_service.add_photo_to_session("missing", "/media/p.jpg") is None
+
+
+def test_concurrent_appends_do_not_lose_photos():
+    session = session_service.create_session("onlocation")
+    threads = [
+        threading.Thread(target=session_service.add_photo_to_session, args=(session["id"], f"/media/{i}.jpg"))
+        for i in range(8)
+    ]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    urls = session_service.get_session(session["id"])["photo_urls"]
+    assert sorted(urls) == sorted(f"/media/{i}.jpg" for i in range(8))
+
+
+def test_migration_converts_legacy_photo_urls():
+    conn = sqlite3.connect(str(database.DB_PATH))
+    conn.row_factory = sqlite3.Row
+    database.MIGRATIONS[0](conn)
+    conn.execute(
+        "INSERT INTO sessions (id, event_slug, token, created_at, expires_at, photo_urls) "
+        "VALUES ('legacy', 'onlocation', 't', '2099-01-01T00:00:00', '2099-01-01T01:00:00', ?)",
+        (json.dumps(["/media/a.jpg", "/media/b.jpg"]),),
+    )
+    conn.execute("PRAGMA user_version = 1")
+    conn.commit()
+    conn.close()
+
+    assert session_service.get_session("legacy", "t")["photo_urls"] == ["/media/a.jpg", "/media/b.jpg"]
+    # Left intact for an older build after a rollback
+    with database.get_connection() as conn:
+        row = conn.execute("SELECT photo_urls FROM sessions WHERE id = 'legacy'").fetchone()
+    assert json.loads(row["photo_urls"]) == ["/media/a.jpg", "/media/b.jpg"]
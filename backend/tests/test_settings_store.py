@@ -0,0 +1,43 @@
+"""
+Tests for the cached settings store.
+"""
+import json
+import timeit
+
+from app.services import settings_store
+
+
+def test_booth_id_is_minted_once_and_persisted():
+    first = settings_store.get_settings()["booth_id"]
+    settings_store.invalidate_cache()
+    assert settings_store.get_settings()["booth_id"] == first
+    assert json.loads(settings_store.SETTINGS_FILE.read_text())["booth_id"] == first
+
+
+def test_save_settings_updates_cache_and_writes_atomically():
+    settings_store.get_settings()
+    settings_store.save_settings(default_event_slug="wedding")
+    assert settings_store.get_settings()["default_event_slug"] == "wedding"
+    assert json.loads(settings_store.SETTINGS_FILE.read_text())["default_event_slug"] == "wedding"
+    assert not list(settings_store.SETTINGS_FILE.parent.glob(".*.tmp"))
+
+
+def test_change_password_refreshes_cache():
+    assert settings_store.change_password("1234", "s3cret")
+    assert settings_store.verify_password("s3cret")
+    assert not settings_store.verify_password("1234")
+
+
+def test_external_edit_is_picked_up_after_stat_interval(monkeypatch):
+    monkeypatch.setattr(settings_store, "STAT_INTERVAL_SECONDS", 0)
+    settings_store.get_settings()
+    raw = json.loads(settings_store.SETTINGS_FILE.read_text())
+    raw["default_event_slug"] = "edited-by-hand"
+    settings_store.SETTINGS_FILE.write_text(json.dumps(raw) + "\n")
+    assert settings_store.get_settings()["default_event_slug"] == "edited-by-hand"
+
+
+def test_cached_reads_are_sub_microsecond():
+    settings_store.get_settings()
+    per_call = min(timeit.repeat(settings_store.get_settings, number=10000, repeat=5)) / 10000
+    assert per_call < 1e-6
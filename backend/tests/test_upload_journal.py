@@ -0,0 +1,115 @@
+"""
+Tests for the upload journal: crash recovery and group-committed fsync.
+"""
+import asyncio
+import io
+import threading
+from pathlib import Path
+
+from fastapi.testclient import TestClient
+
+from app.config import settings
+from app.main import app
+from app.services import database, session_service, upload_journal
+from app.services.settings_store import get_settings
+from app.services.storage_service import StorageService
+from app.services.upload_journal import UploadJournal, journal
+from app.utils.file_lock import file_lock
+
+client = TestClient(app)
+
+
+def _store(session_id=None, data: bytes = b"\xff\xd8photo") -> dict:
+    """Write an upload through the journal without committing it to the database."""
+    storage = StorageService(media_root=get_settings()["media_root"], journaled=True)
+    return asyncio.run(storage.save_upload_stream(io.BytesIO(data), "p.jpg", session_id=session_id))
+
+
+def _crash() -> None:
+    """Drop this worker's log as a power cut would: open records stay in it, the lock is released."""
+    journal.shutdown()
+
+
+def _indexed(path: str) -> bool:
+    rel = Path(path).relative_to(Path(get_settings()["media_root"]).resolve()).as_posix()
+    with database.get_connection() as conn:
+        return conn.execute("SELECT 1 FROM photos WHERE rel_path = ?", (rel,)).fetchone() is not None
+
+
+def test_committed_uploads_leave_nothing_to_recover():
+    session = session_service.create_session("onlocation")
+    response = client.post(
+        "/api/v1/photos/upload",
+        files={"file": ("p.jpg", b"\xff\xd8photo", "image/jpeg")},
+        data={"session_id": session["id"]},
+    )
+    assert response.status_code == 200
+    assert journal._open == {}
+    _crash()
+    assert upload_journal.recover() == {"committed": 0, "finished": 0, "rolled_back": 0, "failed": 0}
+
+
+def test_recovery_finishes_intact_uploads_and_rolls_back_the_rest():
+    session = session_service.create_session("onlocation")
+    gone = session_service.create_session("onlocation")
+    renamed = _store(session["id"], b"\xff\xd8renamed")
+    unrenamed = _store(session["id"], b"\xff\xd8unrenamed")
+    truncated = _store(session["id"], b"\xff\xd8truncated")
+    orphaned = _store(gone["id"], b"\xff\xd8orphaned")
+    loose = _store(None, b"\xff\xd8loose")
+    session_service.delete_session(gone["id"])
+    _crash()
+
+    # The rename of one upload never reached the disk, and another was cut short
+    final = Path(unrenamed["path"])
+    final.rename(final.with_name(f".{final.name}.part"))
+    Path(truncated["path"]).write_bytes(b"\xff\xd8tru")
+
+    totals = upload_journal.recover()
+    assert totals == {"committed": 0, "finished": 3, "rolled_back": 2, "failed": 0}
+    photo_urls = session_service.get_session(session["id"])["photo_urls"]
+    assert [u.rsplit("/", 1)[1] for u in photo_urls] == [
+        Path(renamed["path"]).name, Path(unrenamed["path"]).name
+    ]
+    assert Path(unrenamed["path"]).read_bytes() == b"\xff\xd8unrenamed"
+    assert not Path(truncated["path"]).exists()
+    assert not Path(orphaned["path"]).exists()
+    assert _indexed(loose["path"])
+    assert list(upload_journal.journal_dir().glob("*.log")) == []
+
+
+def test_recovery_skips_logs_of_running_workers():
+    _store(None)
+    log_path = journal._log_path
+    # This worker still holds its log's lock, so recovery (as another worker would run it) skips it
+    assert upload_journal.recover()["finished"] == 0
+    assert log_path.exists()
+    _crash()
+    with file_lock(log_path.with_suffix(".lock"), blocking=False) as held:
+        assert held
+    assert upload_journal.recover()["finished"] == 1
+
+
+def test_group_commit_shares_one_flush(monkeypatch, tmp_path):
+    monkeypatch.setattr(settings, "UPLOAD_FSYNC", "group")
+    monkeypatch.setattr(settings, "UPLOAD_FSYNC_WINDOW_MS", 100)
+    batches = []
+    flush = UploadJournal._flush
+    monkeypatch.setattr(UploadJournal, "_flush", lambda self, batch: (batches.append(len(batch)), flush(self, batch)))
+
+    group = UploadJournal()
+    barrier = threading.Barrier(4)
+
+    def begin(i: int):
+        data = tmp_path / f"{i}.part"
+        data.write_bytes(b"x")
+        barrier.wait()
+        group.begin({"path": str(tmp_path / f"{i}.jpg")}, data)
+
+    threads = [threading.Thread(target=begin, args=(i,)) for i in range(4)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert sum(batches) == 4 and len(batches) < 4
+    group.shutdown()
@@ -0,0 +1,29 @@
+/**
+ * Capture API client.
+ * Saves the frames of one capture as a session, however flaky the connection.
+ */
+import { uploadPhotoResumable } from './photoApi.js'
+import { createSession, createSessionWithPhotos, newIdempotencyKey } from './sessionApi.js'
+
+/**
+ * Create a session holding a capture's photos. Tries the single combined
+ * request first and falls back to chunked uploads that resume where they dropped.
+ * @param {Blob[]} blobs - Image blobs, in capture order
+ * @param {string} [idempotencyKey] - One key for the whole capture (generated when omitted)
+ * @returns {Promise<{id: string, gallery_url: string, token: string, photo_urls: string[]}>}
+ */
+export async function saveCapture(blobs, idempotencyKey = newIdempotencyKey()) {
+  // Event defaults to the configured default event on the backend.
+  // If the combined request committed and only its response was lost, the
+  // fallback gets that session (photos included) back through the same key.
+  try {
+    return await createSessionWithPhotos(blobs, null, idempotencyKey)
+  } catch {
+    const session = await createSession(null, idempotencyKey)
+    // The combined request stores all photos or none
+    for (const blob of blobs.slice(session.photo_urls.length)) {
+      session.photo_urls.push(await uploadPhotoResumable(blob, session.id))
+    }
+    return session
+  }
+}
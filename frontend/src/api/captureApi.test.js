@@ -0,0 +1,72 @@
+/**
+ * Tests for saving a capture: run with `npm test` (node --test, no browser needed).
+ * fetch is replaced by a script of responses per request, in order.
+ */
+import { afterEach, test } from 'node:test'
+import assert from 'node:assert/strict'
+import { saveCapture } from './captureApi.js'
+
+const realFetch = globalThis.fetch
+afterEach(() => {
+  globalThis.fetch = realFetch
+})
+
+const busy = () => new Response('{"detail":"busy"}', { status: 503, headers: { 'Retry-After': '0' } })
+const json = (body, status = 200) => new Response(JSON.stringify(body), { status })
+const session = (photoUrls) => ({ id: 's1', gallery_url: '/gallery/s1', token: 't', photo_urls: photoUrls })
+
+/** Serve each "METHOD path" from its queue of responses, recording every request. */
+function mockFetch(routes) {
+  const calls = []
+  globalThis.fetch = async (url, init = {}) => {
+    const key = `${init.method || 'GET'} ${url}`
+    calls.push({ key, headers: new Headers(init.headers) })
+    const queue = routes[key]
+    if (!queue || queue.length === 0) throw new Error(`Unexpected request: ${key}`)
+    const next = queue.shift()
+    if (next instanceof Error) throw next
+    return next()
+  }
+  return calls
+}
+
+const frames = () => [new Blob(['one'], { type: 'image/jpeg' }), new Blob(['two'], { type: 'image/jpeg' })]
+
+test('the combined request waits out a busy server', async () => {
+  const calls = mockFetch({
+    'POST /api/v1/sessions/with-photos': [busy, busy, () => json(session(['/media/a.jpg', '/media/b.jpg']))],
+  })
+  const saved = await saveCapture(frames(), 'key-1')
+  assert.deepEqual(saved.photo_urls, ['/media/a.jpg', '/media/b.jpg'])
+  assert.equal(calls.length, 3)
+  assert.ok(calls.every((c) => c.headers.get('Idempotency-Key') === 'key-1'))
+})
+
+test('the resumable fallback waits out a busy server at every step', async () => {
+  const upload = '/api/v1/photos/uploads/u1'
+  const created = () => new Response(null, { status: 201, headers: { Location: upload } })
+  const chunk = (offset) => () => new Response(null, { status: 204, headers: { 'Upload-Offset': String(offset) } })
+  const calls = mockFetch({
+    'POST /api/v1/sessions/with-photos': [new TypeError('network down')],
+    'POST /api/v1/sessions': [() => json(session([]))],
+    'POST /api/v1/photos/uploads': [busy, created, busy, created],
+    [`PATCH ${upload}`]: [busy, chunk(3), busy, chunk(3)],
+    [`POST ${upload}/complete`]: [busy, () => json({ url: '/media/a.jpg' }), busy, () => json({ url: '/media/b.jpg' })],
+  })
+  const saved = await saveCapture(frames(), 'key-2')
+  assert.deepEqual(saved.photo_urls, ['/media/a.jpg', '/media/b.jpg'])
+  const create = calls.find((c) => c.key === 'POST /api/v1/sessions')
+  assert.equal(create.headers.get('Idempotency-Key'), 'key-2')
+  assert.equal(calls.filter((c) => c.key.startsWith('PATCH')).length, 4)
+})
+
+test('a combined request that committed is not uploaded again', async () => {
+  // The photos were stored but the response was lost; the key returns that session
+  const calls = mockFetch({
+    'POST /api/v1/sessions/with-photos': [new TypeError('connection reset')],
+    'POST /api/v1/sessions': [() => json(session(['/media/a.jpg', '/media/b.jpg']))],
+  })
+  const saved = await saveCapture(frames(), 'key-3')
+  assert.deepEqual(saved.photo_urls, ['/media/a.jpg', '/media/b.jpg'])
+  assert.equal(calls.length, 2)
+})
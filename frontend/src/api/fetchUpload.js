@@ -0,0 +1,27 @@
+/**
+ * fetch() for requests that carry photos.
+ * The backend answers 503 with Retry-After when its upload budget is spent;
+ * these requests wait that long and try again instead of failing the capture.
+ */
+
+const BUSY_RETRIES = 3
+
+function retryAfterSeconds(res) {
+  const header = res.headers.get('Retry-After')
+  const seconds = header === null ? NaN : Number(header)
+  return Number.isFinite(seconds) && seconds >= 0 ? seconds : 1
+}
+
+/**
+ * fetch() that waits out 503 responses, honouring Retry-After, before giving up.
+ * @param {string} url
+ * @param {RequestInit} init
+ * @returns {Promise<Response>} - The first non-503 response, or the last 503
+ */
+export async function fetchUpload(url, init) {
+  for (let attempt = 0; ; attempt++) {
+    const res = await fetch(url, init)
+    if (res.status !== 503 || attempt >= BUSY_RETRIES) return res
+    await new Promise((r) => setTimeout(r, retryAfterSeconds(res) * 1000))
+  }
+}
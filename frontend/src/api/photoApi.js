@@ -3,6 +3,8 @@
  * Handles communication with the backend for photo storage.
  */
 
+import { fetchUpload } from './fetchUpload.js'
+
 const API_BASE = '' // Vite proxy: /api -> backend
 
 /**
@@ -17,7 +19,7 @@ export async function uploadPhoto(blob, sessionId = null) {
   if (sessionId) {
     formData.append('session_id', sessionId)
   }
-  const res = await fetch(`${API_BASE}/api/v1/photos/upload`, {
+  const res = await fetchUpload(`${API_BASE}/api/v1/photos/upload`, {
     method: 'POST',
     body: formData,
   })
@@ -25,3 +27,91 @@ export async function uploadPhoto(blob, sessionId = null) {
   const data = await res.json()
   return data.url
 }
+
+/**
+ * Upload several photo blobs to a session in one request.
+ * @param {string} sessionId - Session to attach the photos to
+ * @param {Blob[]} blobs - Image blobs, in capture order
+ * @returns {Promise<object>} - Updated session (photo_urls in capture order)
+ */
+export async function uploadPhotoBatch(sessionId, blobs) {
+  const formData = new FormData()
+  blobs.forEach((blob, i) => formData.append('files', blob, `photo_${Date.now()}_${i}.jpg`))
+  const res = await fetchUpload(`${API_BASE}/api/v1/sessions/${encodeURIComponent(sessionId)}/photos:batch`, {
+    method: 'POST',
+    body: formData,
+  })
+  if (!res.ok) throw new Error('Upload failed')
+  return res.json()
+}
+
+const RESUMABLE_CHUNK_SIZE = 256 * 1024
+const RESUMABLE_RETRIES = 5
+
+function b64(value) {
+  return btoa(unescape(encodeURIComponent(value)))
+}
+
+async function uploadOffset(location) {
+  const res = await fetch(location, { method: 'HEAD' })
+  if (!res.ok) throw new Error('Upload lost')
+  return Number(res.headers.get('Upload-Offset'))
+}
+
+/**
+ * Upload a photo blob in chunks, resuming from the server's offset after a
+ * dropped connection instead of starting over.
+ * @param {Blob} blob - Image blob
+ * @param {string} [sessionId] - Optional session ID to associate the photo with
+ * @returns {Promise<string>} - URL to display the uploaded photo
+ */
+export async function uploadPhotoResumable(blob, sessionId = null) {
+  const metadata = [`filename ${b64(`photo_${Date.now()}.jpg`)}`, `filetype ${b64(blob.type || 'image/jpeg')}`]
+  if (sessionId) metadata.push(`session_id ${b64(sessionId)}`)
+  const created = await fetchUpload(`${API_BASE}/api/v1/photos/uploads`, {
+    method: 'POST',
+    headers: { 'Upload-Length': String(blob.size), 'Upload-Metadata': metadata.join(',') },
+  })
+  if (!created.ok) throw new Error('Upload failed')
+  const location = created.headers.get('Location')
+
+  let offset = 0
+  let failures = 0
+  while (offset < blob.size) {
+    try {
+      const res = await fetchUpload(location, {
+        method: 'PATCH',
+        headers: {
+          'Upload-Offset': String(offset),
+          'Content-Type': 'application/offset+octet-stream',
+        },
+        body: blob.slice(offset, offset + RESUMABLE_CHUNK_SIZE),
+      })
+      if (res.status === 409) {
+        offset = await uploadOffset(location)
+        continue
+      }
+      if (!res.ok) throw new Error('Upload failed')
+      offset = Number(res.headers.get('Upload-Offset'))
+      failures = 0
+    } catch (e) {
+      failures += 1
+      if (failures > RESUMABLE_RETRIES) throw e
+      await new Promise((r) => setTimeout(r, 500 * 2 ** failures))
+      offset = await uploadOffset(location).catch(() => offset)
+    }
+  }
+
+  for (let attempt = 0; ; attempt++) {
+    try {
+      const res = await fetchUpload(`${location}/complete`, { method: 'POST' })
+      if (!res.ok) throw new Error('Upload failed')
+      const data = await res.json()
+      return data.url
+    } catch (e) {
+      // Completing is idempotent, so a lost response is safe to retry
+      if (attempt >= RESUMABLE_RETRIES) throw e
+      await new Promise((r) => setTimeout(r, 500 * 2 ** attempt))
+    }
+  }
+}
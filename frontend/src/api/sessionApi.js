@@ -3,19 +3,59 @@
  * Creates and retrieves photobooth sessions.
  */
 
+import { fetchUpload } from './fetchUpload.js'
+
 const API_BASE = '' // Vite proxy: /api -> backend
 
+/**
+ * Random key identifying one capture across retries. Sent as Idempotency-Key,
+ * the backend returns the session an earlier attempt stored instead of a new one.
+ * (crypto.randomUUID needs a secure context; kiosks may load the app over plain http.)
+ * @returns {string}
+ */
+export function newIdempotencyKey() {
+  const bytes = crypto.getRandomValues(new Uint8Array(16))
+  return Array.from(bytes, (b) => b.toString(16).padStart(2, '0')).join('')
+}
+
+function keyHeaders(idempotencyKey) {
+  return idempotencyKey ? { 'Idempotency-Key': idempotencyKey } : {}
+}
+
 /**
  * Create a new session for a capture.
- * @param {string} [eventSlug='onlocation'] - Event identifier
- * @returns {Promise<{id: string, gallery_url: string, token: string}>}
+ * @param {string} [eventSlug='onlocation'] - Event identifier; pass null for the backend default event
+ * @param {string} [idempotencyKey] - Returns the session already stored under this key, if any
+ * @returns {Promise<{id: string, gallery_url: string, token: string, photo_urls: string[]}>}
  */
-export async function createSession(eventSlug = 'onlocation') {
+export async function createSession(eventSlug = 'onlocation', idempotencyKey = null) {
   const res = await fetch(`${API_BASE}/api/v1/sessions`, {
     method: 'POST',
-    headers: { 'Content-Type': 'application/json' },
-    body: JSON.stringify({ event_slug: eventSlug || 'onlocation' }),
+    headers: { 'Content-Type': 'application/json', ...keyHeaders(idempotencyKey) },
+    body: JSON.stringify({ event_slug: eventSlug || null }),
   })
   if (!res.ok) throw new Error('Failed to create session')
   return res.json()
 }
+
+/**
+ * Create a session and upload its photos in a single request.
+ * @param {Blob[]} blobs - Image blobs, in capture order
+ * @param {string} [eventSlug] - Event identifier; the backend default event when omitted
+ * @param {string} [idempotencyKey] - Makes the request safe to retry (see newIdempotencyKey)
+ * @returns {Promise<{id: string, gallery_url: string, token: string, photo_urls: string[]}>}
+ */
+export async function createSessionWithPhotos(blobs, eventSlug = null, idempotencyKey = null) {
+  const formData = new FormData()
+  blobs.forEach((blob, i) => formData.append('files', blob, `photo_${Date.now()}_${i}.jpg`))
+  if (eventSlug) {
+    formData.append('event_slug', eventSlug)
+  }
+  const res = await fetchUpload(`${API_BASE}/api/v1/sessions/with-photos`, {
+    method: 'POST',
+    headers: keyHeaders(idempotencyKey),
+    body: formData,
+  })
+  if (!res.ok) throw new Error('Failed to save photos')
+  return res.json()
+}
@@ -53,12 +53,30 @@ export async function browseFolder() {
   return res.json()
 }
 
-export async function listEvents() {
-  const res = await fetch(`${API_BASE}/api/v1/settings/events`)
+export async function listEvents({ cursor, limit } = {}) {
+  const params = new URLSearchParams()
+  if (cursor) params.set('cursor', cursor)
+  if (limit) params.set('limit', String(limit))
+  const query = params.toString() ? `?${params}` : ''
+  const res = await fetch(`${API_BASE}/api/v1/settings/events${query}`)
   if (!res.ok) throw new Error('Failed to fetch events')
   return res.json()
 }
 
+/**
+ * Every event, following next_cursor page by page (for the event picker).
+ */
+export async function listAllEvents() {
+  const events = []
+  let cursor = null
+  do {
+    const page = await listEvents({ cursor })
+    events.push(...page.events)
+    cursor = page.next_cursor
+  } while (cursor)
+  return events
+}
+
 export async function createEvent(name) {
   const res = await fetch(`${API_BASE}/api/v1/settings/events`, {
     method: 'POST',
@@ -69,14 +87,55 @@ export async function createEvent(name) {
   return res.json()
 }
 
-export async function listEventPhotos(slug) {
-  const res = await fetch(`${API_BASE}/api/v1/settings/events/${encodeURIComponent(slug)}/photos`)
+/**
+ * Free disk space, quotas and stored bytes per event and booth.
+ */
+export async function getStorageUsage() {
+  const res = await fetch(`${API_BASE}/api/v1/settings/storage`)
+  if (!res.ok) throw new Error('Failed to fetch storage usage')
+  return res.json()
+}
+
+export async function listEventPhotos(slug, { cursor, limit } = {}) {
+  const params = new URLSearchParams()
+  if (cursor) params.set('cursor', cursor)
+  if (limit) params.set('limit', String(limit))
+  const query = params.toString() ? `?${params}` : ''
+  const res = await fetch(`${API_BASE}/api/v1/settings/events/${encodeURIComponent(slug)}/photos${query}`)
   if (!res.ok) throw new Error('Failed to fetch photos')
   return res.json()
 }
 
-export async function listEventSessions(slug) {
-  const res = await fetch(`${API_BASE}/api/v1/settings/events/${encodeURIComponent(slug)}/sessions`)
+/**
+ * URL of an event's ZIP export. Used as a plain download link so the browser
+ * streams it to disk (and can resume) instead of buffering it in memory.
+ */
+export function eventExportUrl(slug, { since, until } = {}) {
+  const params = new URLSearchParams()
+  if (since) params.set('since', since)
+  if (until) params.set('until', until)
+  const query = params.toString() ? `?${params}` : ''
+  return `${API_BASE}/api/v1/settings/events/${encodeURIComponent(slug)}/export.zip${query}`
+}
+
+/**
+ * Server-Sent Events URL streaming a session's photo list as new photos land.
+ */
+export function sessionEventsUrl(sessionId) {
+  return `${API_BASE}/api/v1/settings/sessions/${encodeURIComponent(sessionId)}/events`
+}
+
+/**
+ * One page of session summaries ({ id, created_at, photo_count, cover_url }), newest first.
+ */
+export async function listEventSessions(slug, { cursor, limit, since, until } = {}) {
+  const params = new URLSearchParams()
+  if (cursor) params.set('cursor', cursor)
+  if (limit) params.set('limit', String(limit))
+  if (since) params.set('since', since)
+  if (until) params.set('until', until)
+  const query = params.toString() ? `?${params}` : ''
+  const res = await fetch(`${API_BASE}/api/v1/settings/events/${encodeURIComponent(slug)}/sessions${query}`)
   if (!res.ok) throw new Error('Failed to fetch sessions')
   return res.json()
 }
@@ -1,6 +1,7 @@
 /**
  * EventImagePreview - Modular preview of photos for an event.
  * Groups by session (photo sets) and allows clicking to view in detail.
+ * Sessions are loaded a page of summaries at a time.
  */
 import { useState, useEffect } from 'react'
 import { listEventSessions } from '../api/settingsApi'
@@ -24,10 +25,13 @@ export function EventImagePreview({ eventSlug, className = '' }) {
   const [loading, setLoading] = useState(false)
   const [error, setError] = useState(null)
   const [selectedSession, setSelectedSession] = useState(null)
+  const [nextCursor, setNextCursor] = useState(null)
+  const [loadingMore, setLoadingMore] = useState(false)
 
   useEffect(() => {
     if (!eventSlug) {
       setSessions([])
+      setNextCursor(null)
       return
     }
     let cancelled = false
@@ -35,7 +39,9 @@ export function EventImagePreview({ eventSlug, className = '' }) {
     setError(null)
     listEventSessions(eventSlug)
       .then((data) => {
-        if (!cancelled) setSessions(data.sessions || [])
+        if (cancelled) return
+        setSessions(data.sessions || [])
+        setNextCursor(data.next_cursor)
       })
       .catch((e) => {
         if (!cancelled) setError(e.message)
@@ -46,6 +52,19 @@ export function EventImagePreview({ eventSlug, className = '' }) {
     return () => { cancelled = true }
   }, [eventSlug])
 
+  async function loadMore() {
+    setLoadingMore(true)
+    try {
+      const data = await listEventSessions(eventSlug, { cursor: nextCursor })
+      setSessions((prev) => [...prev, ...data.sessions])
+      setNextCursor(data.next_cursor)
+    } catch (e) {
+      setError(e.message)
+    } finally {
+      setLoadingMore(false)
+    }
+  }
+
   if (!eventSlug) {
     return (
       <div className={`event-image-preview ${className}`}>
@@ -82,8 +101,7 @@ export function EventImagePreview({ eventSlug, className = '' }) {
     <div className={`event-image-preview ${className}`}>
       <div className="session-sets-grid">
         {sessions.map((session) => {
-          const urls = session.photo_urls || []
-          if (urls.length === 0) return null
+          if (!session.photo_count) return null
           return (
             <button
               key={session.id}
@@ -92,18 +110,24 @@ export function EventImagePreview({ eventSlug, className = '' }) {
               onClick={() => setSelectedSession(session)}
             >
               <div className="session-set-thumbs">
-                {urls.slice(0, 3).map((url, i) => (
-                  <div key={i} className="session-set-thumb">
-                    <img src={url} alt={`Photo ${i + 1}`} loading="lazy" />
-                  </div>
-                ))}
+                <div className="session-set-thumb">
+                  <img src={session.cover_url} alt="Cover photo" loading="lazy" />
+                </div>
               </div>
-              <p className="session-set-date">{formatSessionDate(session.created_at)}</p>
+              <p className="session-set-date">
+                {formatSessionDate(session.created_at)} · {session.photo_count} photo{session.photo_count === 1 ? '' : 's'}
+              </p>
             </button>
           )
         })}
       </div>
 
+      {nextCursor && (
+        <button type="button" className="btn-modal-secondary btn-load-more" onClick={loadMore} disabled={loadingMore}>
+          {loadingMore ? 'Loading…' : 'Load more'}
+        </button>
+      )}
+
       {selectedSession && (
         <SessionDetailModal
           session={selectedSession}
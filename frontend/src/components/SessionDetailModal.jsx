@@ -1,17 +1,26 @@
 /**
  * SessionDetailModal - View a photo set in detail with QR code.
  * A fresh short-lived QR is generated each time the modal opens.
+ * Photos still uploading appear live via the session's event stream.
  */
 import { useState, useEffect } from 'react'
 import { QRCodeSVG } from 'qrcode.react'
-import { regenerateSessionToken, deleteSession } from '../api/settingsApi'
+import { regenerateSessionToken, deleteSession, sessionEventsUrl } from '../api/settingsApi'
 
 export function SessionDetailModal({ session, onClose, onDeleted }) {
   const [galleryUrl, setGalleryUrl] = useState(null)
   const [loading, setLoading] = useState(true)
   const [deleting, setDeleting] = useState(false)
+  const [photos, setPhotos] = useState(session?.photo_urls || [])
 
-  const photos = session?.photo_urls || []
+  useEffect(() => {
+    setPhotos(session?.photo_urls || [])
+    if (!session?.id || !window.EventSource) return
+    const source = new EventSource(sessionEventsUrl(session.id))
+    source.addEventListener('photos', (e) => setPhotos(JSON.parse(e.data).photo_urls))
+    source.addEventListener('deleted', () => source.close())
+    return () => source.close()
+  }, [session?.id])
 
   useEffect(() => {
     if (!session?.id) {
@@ -19,7 +28,11 @@ export function SessionDetailModal({ session, onClose, onDeleted }) {
       return
     }
     regenerateSessionToken(session.id)
-      .then((updated) => setGalleryUrl(updated.gallery_url))
+      .then((updated) => {
+        setGalleryUrl(updated.gallery_url)
+        // Listings only carry summaries; the full photo list comes with the session
+        setPhotos((prev) => (prev.length ? prev : updated.photo_urls || []))
+      })
       .catch(() => setGalleryUrl(null))
       .finally(() => setLoading(false))
   }, [session?.id])
@@ -57,7 +70,7 @@ export function SessionDetailModal({ session, onClose, onDeleted }) {
         <div className="session-detail-photos">
           {photos.map((url, i) => (
             <div key={i} className="session-detail-photo-frame">
-              <img src={url} alt={`Photo ${i + 1}`} />
+              <img src={`${url}?size=medium`} alt={`Photo ${i + 1}`} />
             </div>
           ))}
         </div>
@@ -2,11 +2,41 @@
  * SettingsMenu - Customization menu for storage path and events.
  */
 import { useState, useEffect } from 'react'
-import { getSettings, updateSettings, listEvents, createEvent, changePassword } from '../api/settingsApi'
+import {
+  getSettings,
+  updateSettings,
+  listAllEvents,
+  createEvent,
+  changePassword,
+  eventExportUrl,
+  getStorageUsage,
+} from '../api/settingsApi'
 import { StoragePathPicker } from './StoragePathPicker'
 import { EventImagePreview } from './EventImagePreview'
 import { PasswordInput } from './PasswordInput'
 
+function formatBytes(bytes) {
+  if (bytes >= 1024 ** 3) return `${(bytes / 1024 ** 3).toFixed(1)} GB`
+  return `${Math.round(bytes / 1024 ** 2)} MB`
+}
+
+function CaptureHistogram({ hourly }) {
+  if (!hourly?.length) return null
+  const peak = Math.max(...hourly.map((h) => h.photos))
+  return (
+    <div className="capture-histogram" aria-label="Photos per hour">
+      {hourly.map((h) => (
+        <div
+          key={h.hour}
+          className="capture-histogram-bar"
+          style={{ height: `${(h.photos / peak) * 100}%` }}
+          title={`${new Date(h.hour).toLocaleString(undefined, { dateStyle: 'short', timeStyle: 'short' })}: ${h.photos} photos`}
+        />
+      ))}
+    </div>
+  )
+}
+
 export function SettingsMenu({ onClose, currentPassword = '' }) {
   const [mediaRoot, setMediaRoot] = useState('')
   const [defaultEventSlug, setDefaultEventSlug] = useState('')
@@ -17,6 +47,7 @@ export function SettingsMenu({ onClose, currentPassword = '' }) {
   const [message, setMessage] = useState('')
   const [newPassword, setNewPassword] = useState('')
   const [passwordMessage, setPasswordMessage] = useState('')
+  const [storage, setStorage] = useState(null)
 
   useEffect(() => {
     load()
@@ -25,10 +56,12 @@ export function SettingsMenu({ onClose, currentPassword = '' }) {
   async function load() {
     setLoading(true)
     try {
-      const [settings, eventsList] = await Promise.all([getSettings(), listEvents()])
+      const [settings, eventsList] = await Promise.all([getSettings(), listAllEvents()])
       setMediaRoot(settings.media_root || '')
       setDefaultEventSlug(settings.default_event_slug || 'onlocation')
       setEvents(eventsList || [])
+      // Usage is informational; the menu still works without it
+      getStorageUsage().then(setStorage).catch(() => setStorage(null))
     } catch (e) {
       setMessage('Failed to load settings')
     } finally {
@@ -91,6 +124,9 @@ export function SettingsMenu({ onClose, currentPassword = '' }) {
     }
   }
 
+  const eventUsage = storage?.events.find((ev) => ev.event_slug === defaultEventSlug)
+  const eventStats = events.find((ev) => ev.slug === defaultEventSlug)?.stats
+
   if (loading) {
     return (
       <div className="modal-overlay" onClick={onClose}>
@@ -151,6 +187,12 @@ export function SettingsMenu({ onClose, currentPassword = '' }) {
             onChange={setMediaRoot}
             disabled={saving}
           />
+          {storage && (
+            <p className="settings-hint">
+              {formatBytes(storage.disk.free_bytes)} free of {formatBytes(storage.disk.total_bytes)}
+              {eventUsage && ` · this event: ${formatBytes(eventUsage.bytes)} in ${eventUsage.files} photos`}
+            </p>
+          )}
         </section>
 
         <section className="settings-section">
@@ -168,6 +210,14 @@ export function SettingsMenu({ onClose, currentPassword = '' }) {
               </option>
             ))}
           </select>
+          {eventStats && (
+            <>
+              <p className="settings-hint">
+                {eventStats.sessions} sessions · {eventStats.photos} photos · {formatBytes(eventStats.bytes)}
+              </p>
+              <CaptureHistogram hourly={eventStats.hourly} />
+            </>
+          )}
           <div className="create-event-row">
             <input
               type="text"
@@ -189,6 +239,11 @@ export function SettingsMenu({ onClose, currentPassword = '' }) {
           <div className="event-preview-section">
             <h3 className="settings-section-title">Photo preview</h3>
             <EventImagePreview eventSlug={defaultEventSlug} className="preview-in-settings" />
+            {defaultEventSlug && (
+              <a className="btn-modal-secondary" href={eventExportUrl(defaultEventSlug)} download>
+                Download all photos (ZIP)
+              </a>
+            )}
           </div>
         </section>
 
@@ -3,13 +3,9 @@
  * Manages stage, countdown, photo collection, upload, and session.
  */
 import { useState, useCallback } from 'react'
-import { uploadPhoto } from '../api/photoApi'
-import { createSession } from '../api/sessionApi'
-import { getSettings } from '../api/settingsApi'
+import { saveCapture } from '../api/captureApi'
 import { COUNTDOWN_SECONDS, PHOTO_COUNT, CAPTURE_DELAY_MS } from '../constants/photoBooth'
 
-const DEFAULT_EVENT = 'onlocation'
-
 export function usePhotoCapture(camera, setStage) {
   const {
     stream,
@@ -59,20 +55,8 @@ export function usePhotoCapture(camera, setStage) {
       }
     }
 
-    let sessionId = null
-    try {
-      const settings = await getSettings().catch(() => ({}))
-      const eventSlug = settings.default_event_slug || DEFAULT_EVENT
-      const session = await createSession(eventSlug)
-      sessionId = session.id
-      setGalleryUrl(session.gallery_url)
-    } catch (e) {
-      setError('Failed to create session')
-      setStage('greeting')
-      return
-    }
-
-    const collected = []
+    // Frames are kept locally and uploaded together with the session in one request
+    const blobs = []
     for (let i = 0; i < PHOTO_COUNT; i++) {
       setCaptureIndex(i + 1)
       await runCountdown()
@@ -84,16 +68,18 @@ export function usePhotoCapture(camera, setStage) {
         setStage('greeting')
         return
       }
-      try {
-        const url = await uploadPhoto(blob, sessionId)
-        collected.push(url)
-        setPhotos([...collected])
-      } catch (e) {
-        setError('Failed to save photo')
-        stopCamera()
-        setStage('greeting')
-        return
-      }
+      blobs.push(blob)
+    }
+
+    try {
+      const session = await saveCapture(blobs)
+      setGalleryUrl(session.gallery_url)
+      setPhotos(session.photo_urls)
+    } catch (e) {
+      setError('Failed to save photos')
+      stopCamera()
+      setStage('greeting')
+      return
     }
 
     stopCamera()